@@ -1,12 +1,85 @@
+import os
 from flask import Flask
+import config
 from controllers.book_controller import book_bp
 from controllers.message_controller import message_bp
+from controllers.metrics_controller import metrics_bp, start_timer, record_request
+from controllers.admission import WriteAdmission
+from controllers.idempotency import Idempotency
+from controllers.consistency import require_change_seq, report_change_seq
+from controllers.profiler import start_profile, finish_profile
+from controllers.responses import compress_response
+from controllers.http_cache import ResponseCache
+from services.container import Services
 
-app = Flask(__name__)
 
+def create_app(settings=None):
+    """
+    Build the Flask app. 'settings' overrides the defaults from config,
+    e.g. {'DATA_DIR': '/srv/data', 'SERVICE_LOADING': 'eager'}; data files
+    not given a path of their own move with DATA_DIR.
 
-app.register_blueprint(book_bp)
-app.register_blueprint(message_bp)
+    Building the app does no I/O unless SERVICE_LOADING asks for it: the
+    services load their data on first use (see services.container).
+    The keys in config.PROCESS_SETTINGS can only be set through the
+    environment; a different value here raises ValueError.
+    """
+    settings = dict(settings or {})
+    for key in config.PROCESS_SETTINGS:
+        if key in settings and settings[key] != getattr(config, key):
+            raise ValueError(f"{key} applies to the whole process; set it in the environment instead")
+    app = Flask(__name__)
+    app.config.from_object(config)
+    if 'DATA_DIR' in settings:
+        for key, name in config.DATA_FILES.items():
+            settings.setdefault(key, os.path.join(settings['DATA_DIR'], name))
+    app.config.update(settings)
+
+    services = Services(app.config)
+    app.extensions['services'] = services
+    app.extensions['response_cache'] = ResponseCache(app.config['RESPONSE_CACHE_SIZE'])
+
+    app.register_blueprint(book_bp)
+    app.register_blueprint(message_bp)
+    app.register_blueprint(metrics_bp)
+    # after_request hooks run in reverse order of registration: the profiler
+    # swaps the body first, compression next, and the metrics see the result
+    if app.config['METRICS_ENABLED']:
+        app.before_request(start_timer)
+        app.after_request(record_request)
+    app.after_request(compress_response)
+    if app.config['PROFILING_ENABLED']:
+        app.before_request(start_profile)
+        app.after_request(finish_profile)
+    # Retries with a known Idempotency-Key are answered before admission,
+    # so replays use no write tokens; the response is recorded first of
+    # all the after_request hooks, before compression or profiling
+    idempotency = Idempotency(app.config)
+    app.before_request(idempotency.check)
+    # Writes are admitted (or turned away) after the timer starts, so
+    # refusals show up in the request metrics too
+    admission = WriteAdmission(app.config)
+    app.before_request(admission.admit)
+    app.teardown_request(admission.release)
+    if app.config['CHANGE_LOG']:
+        # Stored idempotent responses leave the seq out; replays get a current one
+        app.before_request(require_change_seq)
+        app.after_request(report_change_seq)
+    app.after_request(idempotency.record)
+    app.teardown_request(idempotency.release)
+
+    loading = app.config['SERVICE_LOADING']
+    if loading == 'eager':
+        services.warm()
+    elif loading == 'background':
+        services.warm_in_background()
+    elif loading != 'lazy':
+        raise ValueError(f"Unknown SERVICE_LOADING: {loading}")
+    return app
+
+
+# For 'gunicorn app:app', asgi.py and the benchmarks
+app = create_app()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
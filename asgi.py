@@ -0,0 +1,169 @@
+# asgi.py
+"""
+ASGI entry point: serves the same Flask app (book_bp / message_bp) from
+an asyncio server such as uvicorn.
+
+    uvicorn asgi:app --workers 4
+
+The event loop owns the sockets: it accepts connections and reads
+request bodies without tying up a thread, so slow clients and large
+uploads cost nothing while they trickle in. Each request is then handed
+to the Flask app on the bounded I/O executor (config.IO_WORKERS
+threads), where blocking file and SQLite work happens; concurrent
+writes meet in the services' group commit and share one disk write.
+
+Streamed responses (the /messages/stream event stream) are pulled on a
+separate pool sized by the app's STREAM_MAX_CLIENTS: each open stream
+blocks a thread while it waits for events, and must not take one from
+the request handlers.
+"""
+import sys
+import asyncio
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from app import app as flask_app
+from services.async_service import run_blocking
+
+# Request bodies up to this size stay in memory; larger ones (bulk
+# imports) are spooled to a temporary file
+_SPOOL_MAX = 1024 * 1024
+
+# Threads are started on demand, so an idle pool costs nothing
+_stream_executor = ThreadPoolExecutor(max_workers=flask_app.config['STREAM_MAX_CLIENTS'],
+                                      thread_name_prefix='stream')
+
+
+class AsgiAdapter:
+    """
+    Minimal ASGI -> WSGI bridge running the WSGI app on the I/O executor.
+    Unlike asgiref's WsgiToAsgi it does not funnel every request through
+    one thread.
+    """
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+        body = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX)
+        more_body = True
+        while more_body:
+            event = await receive()
+            if event['type'] == 'http.disconnect':
+                body.close()
+                return
+            body.write(event.get('body', b''))
+            more_body = event.get('more_body', False)
+        body.seek(0)
+
+        try:
+            status, headers, chunks = await run_blocking(self._run, scope, body)
+            await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+            if isinstance(chunks, (list, tuple)):
+                await send({'type': 'http.response.body', 'body': b''.join(chunks)})
+                return
+            # Streamed response: pull each chunk on the stream pool. The
+            # server may drop sends after a disconnect, so watch for it
+            # and stop pulling (an event stream would otherwise run forever)
+            loop = asyncio.get_running_loop()
+            disconnected = asyncio.ensure_future(self._wait_disconnect(receive))
+            iterator = iter(chunks)
+            try:
+                while not disconnected.done():
+                    chunk = await loop.run_in_executor(_stream_executor, next, iterator, None)
+                    if chunk is None:
+                        await send({'type': 'http.response.body', 'body': b''})
+                        break
+                    if chunk:
+                        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            finally:
+                disconnected.cancel()
+                close = getattr(chunks, 'close', None)
+                if close is not None:
+                    await loop.run_in_executor(_stream_executor, close)
+        finally:
+            body.close()
+
+    def _run(self, scope, body):
+        """
+        Call the WSGI app (on an executor thread). Non-streamed bodies are
+        collected here so the common case needs a single executor hop.
+        """
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1'))
+                                   for k, v in headers]
+            return lambda data: response.setdefault('written', []).append(data)
+
+        result = self.wsgi_app(self._environ(scope, body), start_response)
+        # Responses with a Content-Length are complete in memory; anything
+        # else (a generator) is streamed chunk by chunk
+        if any(name == b'content-length' for name, _ in response['headers']):
+            try:
+                chunks = response.pop('written', []) + list(result)
+            finally:
+                close = getattr(result, 'close', None)
+                if close is not None:
+                    close()
+            return response['status'], response['headers'], chunks
+        return response['status'], response['headers'], result
+
+    @staticmethod
+    def _environ(scope, body):
+        server = scope.get('server') or ('localhost', 80)
+        client = scope.get('client') or ('', 0)
+        environ = {
+            'REQUEST_METHOD': scope['method'],
+            'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+            'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+            'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+            'SERVER_NAME': server[0],
+            'SERVER_PORT': str(server[1]) if server[1] is not None else '80',
+            'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+            'REMOTE_ADDR': client[0],
+            'REMOTE_PORT': str(client[1]),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': scope.get('scheme', 'http'),
+            'wsgi.input': body,
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+        }
+        for name, value in scope.get('headers', ()):
+            name = name.decode('latin-1')
+            value = value.decode('latin-1')
+            if name == 'content-type':
+                key = 'CONTENT_TYPE'
+            elif name == 'content-length':
+                key = 'CONTENT_LENGTH'
+            else:
+                key = 'HTTP_' + name.upper().replace('-', '_')
+            if key in environ:
+                value = environ[key] + ',' + value
+            environ[key] = value
+        return environ
+
+    @staticmethod
+    async def _wait_disconnect(receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    @staticmethod
+    async def _lifespan(receive, send):
+        while True:
+            event = await receive()
+            if event['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif event['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+app = AsgiAdapter(flask_app)
@@ -0,0 +1,106 @@
+# bench_cold_start.py
+"""
+Cold start: time from spawning a server process to its first served
+request, as a serverless platform starting a fresh worker would see it.
+
+For each SERVICE_LOADING mode the server is started --runs times on the
+same dataset. Each run records when the port accepts connections and
+when the first response (GET /books?page=1&limit=20 by default) has
+arrived. Reports the median of each.
+
+    python benchmarks/bench_cold_start.py [--books 10000] [--messages 10000] [--runs 5]
+    python benchmarks/bench_cold_start.py --modes lazy --path '/messages?page=1&limit=20'
+
+Also prints the slowest imports of 'import app' (python -X importtime),
+the floor under every mode.
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import statistics
+import http.client
+from http_load import ROOT, WSGI_SERVER, free_port
+import datasets
+
+
+def cold_start(server, work_dir, mode, path):
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=ROOT, SERVICE_LOADING=mode)
+    if server == 'wsgi':
+        cmd = [sys.executable, '-c', WSGI_SERVER.format(port=port)]
+    else:
+        cmd = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port),
+               '--log-level', 'warning', '--no-access-log']
+    start = time.perf_counter()
+    proc = subprocess.Popen(cmd, cwd=work_dir, env=env)
+    try:
+        while True:
+            if proc.poll() is not None:
+                raise RuntimeError(f'server exited with code {proc.returncode}')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.002)
+        listening = time.perf_counter() - start
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        conn.request('GET', path)
+        resp = conn.getresponse()
+        resp.read()
+        first = time.perf_counter() - start
+        conn.close()
+        if resp.status >= 400:
+            raise RuntimeError(f'first request failed with {resp.status}')
+        return listening, first
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def slowest_imports(count=8):
+    out = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                         cwd=ROOT, capture_output=True, text=True).stderr
+    rows = []
+    for line in out.splitlines():
+        parts = line.split('|')
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].rstrip()))
+    total = next((us for us, name in rows if name.strip() == 'app'), 0)
+    top = sorted((r for r in rows if r[1].strip() != 'app'
+                  and r[1].startswith(' ' * 3) and not r[1].startswith(' ' * 4)),
+                 reverse=True)[:count]
+    return total, top
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi')
+    parser.add_argument('--modes', default='lazy,eager,background')
+    parser.add_argument('--path', default='/books?page=1&limit=20', help='first request')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        datasets.generate(work_dir, args.books, args.messages)
+        print(f'{args.server} server, {args.books} books, {args.messages} messages, '
+              f'first request GET {args.path}, median of {args.runs} runs')
+        for mode in args.modes.split(','):
+            runs = [cold_start(args.server, work_dir, mode, args.path) for _ in range(args.runs)]
+            listening = statistics.median(r[0] for r in runs) * 1000
+            first = statistics.median(r[1] for r in runs) * 1000
+            print(f'  {mode:<11} listening after {listening:7.1f} ms   first response after {first:7.1f} ms')
+
+    total, top = slowest_imports()
+    print(f'import app: {total / 1000:.1f} ms; slowest direct imports:')
+    for us, name in top:
+        print(f'  {us / 1000:7.1f} ms  {name.strip()}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# bench_idempotency.py
+"""
+Retry storm: every POST /books is sent --retries times, as a client on a
+flaky network would after losing the responses.
+
+  no keys    plain POSTs; every retry writes another row
+  keys       each logical create carries an Idempotency-Key; retries are
+             answered from the stored response
+
+Reports throughput, latency and how many rows the storm left behind.
+Exits with status 1 if the keyed run created any duplicate rows, so it
+can serve as a regression check.
+
+    python benchmarks/bench_idempotency.py [--books 5000] [--clients 16] [--retries 3] [--duration 5]
+"""
+import sys
+import json
+import argparse
+import tempfile
+import threading
+import http.client
+from http_load import free_port, start_server, run_load, percentile
+import datasets
+
+AUTHOR = 'retry-storm'
+
+
+def _count_rows(port):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    conn.request('GET', f'/books?author={AUTHOR}&limit=1')
+    total = json.loads(conn.getresponse().read())['total']
+    conn.close()
+    return total
+
+
+def run_setup(name, keyed, args):
+    with tempfile.TemporaryDirectory() as work_dir:
+        datasets.generate(work_dir, args.books, 0)
+        port = free_port()
+        proc = start_server(args.server, port, work_dir)
+        try:
+            counter = iter(range(10 ** 9))
+            lock = threading.Lock()
+
+            def create():
+                with lock:
+                    # Consecutive requests are the retries of one create,
+                    # so they overlap across clients like a real storm
+                    logical = next(counter) // args.retries
+                body = json.dumps({'title': f'Retried {logical}', 'author': AUTHOR, 'year': 2024})
+                headers = {'Content-Type': 'application/json'}
+                if keyed:
+                    headers['Idempotency-Key'] = f'create-{logical}'
+                return 'POST', '/books', body.encode('utf-8'), headers
+
+            latencies, errors, elapsed = run_load(port, create, args.clients, args.duration)
+            rows = _count_rows(port)
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    sent = len(latencies)
+    logical = -(-sent // args.retries)
+    result = {
+        'req_per_s': sent / elapsed,
+        'p50': percentile(latencies, 50) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'logical': logical,
+        'rows': rows,
+        'errors': errors,
+    }
+    print(f"  {name:<8} {result['req_per_s']:7.0f} req/s  p50 {result['p50']:7.2f}  p99 {result['p99']:7.2f} ms  "
+          f"{logical} creates -> {rows} rows  ({errors} retries refused as in progress)")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, default=5000)
+    parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi')
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--retries', type=int, default=3)
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f'{args.server} server, {args.books} books, {args.clients} clients, '
+          f'each create sent {args.retries} times')
+    run_setup('no keys', False, args)
+    keyed = run_setup('keys', True, args)
+    if keyed['rows'] > keyed['logical']:
+        print(f"FAIL: {keyed['rows']} rows for {keyed['logical']} keyed creates")
+        sys.exit(1)
+    print('ok: no duplicate rows with Idempotency-Key')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+# bench_memory.py
+"""
+Memory used by each in-memory representation of the datasets.
+
+For N books and N messages (default 1M each), builds every
+representation from freshly generated records and reports the bytes
+allocated (tracemalloc), including the string data:
+
+  - list of dicts    what json.load hands back
+  - __dict__ objects the models as they were before __slots__
+  - __slots__ models Book / Message as they are now
+  - columnar table   BookTable / MessageTable used by the services
+  - loaded service   BookService / MessageService loaded from a JSON
+                     file of the same records: the table plus the
+                     secondary and full-text indexes, the stream buffer
+                     and whatever else the service keeps. Also reports
+                     the peak while loading and what each module holds.
+
+    python benchmarks/bench_memory.py [--records 1000000]
+"""
+import os
+import sys
+import gc
+import json
+import argparse
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.book import Book
+from models.message import Message
+from models.columnar import BookTable, MessageTable, format_micros
+from services.book_service import BookService
+from services.message_service import MessageService
+
+AUTHORS = 5000
+USERS = 20000
+# 2026-01-01T00:00:00Z in epoch microseconds
+BASE_TS = 1767225600 * 10 ** 6
+
+
+class DictBook:
+    # The Book model before __slots__
+    def __init__(self, id, title, author, year, available=True):
+        self.id = id
+        self.title = title
+        self.author = author
+        self.year = year
+        self.available = available
+
+
+class DictMessage:
+    # The Message model before __slots__
+    def __init__(self, id, username, message, created_at):
+        self.id = id
+        self.username = username
+        self.message = message
+        self.created_at = created_at
+
+
+def book_records(n):
+    for i in range(1, n + 1):
+        yield {'id': i, 'title': f'红楼梦 第{i}卷', 'author': f'Author {i % AUTHORS}',
+               'year': 1900 + i % 120, 'available': i % 3 != 0}
+
+
+def message_records(n):
+    # One message every 1.5 s, timestamps formatted the way Message does
+    for i in range(1, n + 1):
+        yield {'id': i, 'username': f'user{i % USERS}', 'message': f'第{i}条留言 hello',
+               'created_at': format_micros(BASE_TS + i * 1500000)}
+
+
+def build_books(kind, n):
+    if kind == 'list of dicts':
+        return list(book_records(n))
+    if kind == '__dict__ objects':
+        return {r['id']: DictBook(**r) for r in book_records(n)}
+    if kind == '__slots__ models':
+        return {r['id']: Book.from_dict(r) for r in book_records(n)}
+    table = BookTable()
+    for r in book_records(n):
+        table[r['id']] = Book.from_dict(r)
+    return table
+
+
+def build_messages(kind, n):
+    if kind == 'list of dicts':
+        return list(message_records(n))
+    if kind == '__dict__ objects':
+        return [DictMessage(**r) for r in message_records(n)]
+    if kind == '__slots__ models':
+        return [Message.from_dict(r) for r in message_records(n)]
+    table = MessageTable()
+    for r in message_records(n):
+        table.insert(Message.from_dict(r), BASE_TS + r['id'] * 1500000)
+    return table
+
+
+def measure(build, kind, n):
+    gc.collect()
+    tracemalloc.start()
+    data = build(kind, n)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    gc.collect()
+    return current
+
+
+def measure_service(name, records, directory):
+    """
+    (bytes held, peak bytes, [(module, bytes), ...]) of a service loaded
+    from a JSON file of 'records'.
+    """
+    path = os.path.join(directory, f'{name}.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(list(records), f, ensure_ascii=False)
+    gc.collect()
+    tracemalloc.start()
+    if name == 'books':
+        service = BookService(json_path=path, storage='json')
+    else:
+        service = MessageService(json_path=path, storage='json')
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    by_file = tracemalloc.take_snapshot().statistics('filename')
+    tracemalloc.stop()
+    service.backend.close()
+    del service
+    gc.collect()
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+    modules = []
+    for stat in by_file[:4]:
+        filename = stat.traceback[0].filename
+        # Strings kept from the parsed file are counted where they were decoded
+        label = filename[len(root):] if filename.startswith(root) else os.path.join(
+            *filename.split(os.sep)[-2:]) + ' (stdlib)'
+        modules.append((label, stat.size))
+    return current, peak, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory benchmark for model representations.')
+    parser.add_argument('--records', type=int, default=1000000)
+    args = parser.parse_args()
+    n = args.records
+    kinds = ('list of dicts', '__dict__ objects', '__slots__ models', 'columnar table')
+    generators = {'books': book_records, 'messages': message_records}
+    for name, build in (('books', build_books), ('messages', build_messages)):
+        print(f'{n} {name}')
+        for kind in kinds:
+            size = measure(build, kind, n)
+            print(f'  {kind:<18} {size / 2 ** 20:9.1f} MiB  {size / n:6.0f} B/record')
+        with tempfile.TemporaryDirectory() as directory:
+            size, peak, modules = measure_service(name, generators[name](n), directory)
+        print(f'  {"loaded service":<18} {size / 2 ** 20:9.1f} MiB  {size / n:6.0f} B/record  '
+              f'(peak while loading {peak / 2 ** 20:.1f} MiB)')
+        for module, held in modules:
+            print(f'    {module:<30} {held / 2 ** 20:9.1f} MiB  {held / n:6.0f} B/record')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+# bench_metrics.py
+"""
+Overhead of the request metrics and of the (idle) profiler toggle.
+
+Runs the same requests through the Flask test client in three fresh
+processes: METRICS_ENABLED=0, the default (metrics on), and metrics on
+with PROFILING_ENABLED=1 but no request asking to be profiled. The
+setups alternate for several rounds and the best median per request is
+kept, which filters out most scheduling noise. Reports that time and
+the difference to the first setup.
+
+    python benchmarks/bench_metrics.py [--books 1000] [--requests 5000] [--rounds 3]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUTES = [
+    ('GET', '/books/id=1', None),
+    ('GET', '/books?page=1&limit=20', None),
+    ('GET', '/messages?page=1&limit=20', None),
+    ('POST', '/messages', {'username': 'bench', 'message': 'metrics overhead'}),
+]
+
+SETUPS = [
+    ('metrics off', {'METRICS_ENABLED': '0', 'PROFILING_ENABLED': '0'}),
+    ('metrics on', {'METRICS_ENABLED': '1', 'PROFILING_ENABLED': '0'}),
+    ('metrics on + profiler idle', {'METRICS_ENABLED': '1', 'PROFILING_ENABLED': '1'}),
+]
+
+
+def child(books, requests):
+    os.chdir(tempfile.mkdtemp(prefix='bench-metrics-'))
+    sys.path.insert(0, ROOT)
+    from app import app
+    app.extensions['services'].books.create_books([
+        {'title': f'Book {i}', 'author': f'Author {i % 50}', 'year': 1900 + i % 120}
+        for i in range(books)
+    ])
+    client = app.test_client()
+    results = {}
+    for method, path, payload in ROUTES:
+        samples = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.open(path, method=method, json=payload).get_data()
+            samples.append(time.perf_counter() - start)
+        results[f'{method} {path}'] = statistics.median(samples) * 1e6
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, default=1000)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.books, args.requests)
+        return
+
+    runs = {}
+    for _ in range(args.rounds):
+        for name, env in SETUPS:
+            out = subprocess.run(
+                [sys.executable, __file__, '--child', '--books', str(args.books), '--requests', str(args.requests)],
+                env=dict(os.environ, **env), capture_output=True, text=True, check=True).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            best = runs.setdefault(name, result)
+            for route, us in result.items():
+                best[route] = min(best[route], us)
+
+    base = runs[SETUPS[0][0]]
+    print(f'median per request, {args.requests} requests each, best of {args.rounds} rounds')
+    print(f"  {'route':<32}" + ''.join(f'{name:>30}' for name, _ in SETUPS))
+    for route in base:
+        cells = []
+        for name, _ in SETUPS:
+            us = runs[name][route]
+            diff = us - base[route]
+            cells.append(f'{us:8.1f} us' + (f' ({diff:+5.1f} us, {diff / base[route] * 100:+5.1f}%)'
+                                             if name != SETUPS[0][0] else ' ' * 20))
+        print(f'  {route:<32}' + ''.join(f'{cell:>30}' for cell in cells))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+# bench_responses.py
+"""
+Per-request cost of serializing GET /books with 10k books.
+
+Compares the previous path (to_dict() for every book, then jsonify) with
+the shared response layer, using orjson when installed and the stdlib
+encoder otherwise, plus the end-to-end request through the test client
+with the response cache disabled and optional gzip.
+
+    python benchmarks/bench_responses.py [--books 10000] [--repeat 50]
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _timeit(fn, repeat):
+    fn()  # warm up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serialization benchmark for GET /books.')
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix='bench-'))
+    # Every request must rebuild its body for a fair comparison
+    os.environ['RESPONSE_CACHE_SIZE'] = '0'
+    sys.path.insert(0, ROOT)
+    from flask import jsonify
+    from app import app
+    from controllers import responses
+
+    app.extensions['services'].books.create_books([
+        {'title': f'红楼梦 第{i}卷', 'author': f'Author {i % 500}', 'year': 1900 + i % 120}
+        for i in range(args.books)
+    ])
+    books = app.extensions['services'].books.get_all_books()
+    client = app.test_client()
+
+    def old_path():
+        data = [b.to_dict() for b in books]
+        payload = {'success': True, 'timestamp': responses.utc_timestamp(),
+                   'data': data, 'total': len(data)}
+        jsonify(payload).get_data()
+
+    def new_path():
+        payload = {'success': True, 'timestamp': responses.utc_timestamp(),
+                   'data': books, 'total': len(books)}
+        responses.json_response(payload).get_data()
+
+    results = []
+    with app.app_context():
+        results.append(('to_dict + jsonify (previous)', _timeit(old_path, args.repeat)))
+        encoder = 'orjson' if responses.orjson is not None else 'stdlib'
+        results.append((f'json_response ({encoder})', _timeit(new_path, args.repeat)))
+        if responses.orjson is not None:
+            saved, responses.orjson = responses.orjson, None
+            results.append(('json_response (stdlib)', _timeit(new_path, args.repeat)))
+            responses.orjson = saved
+
+    results.append(('GET /books end to end', _timeit(lambda: client.get('/books'), args.repeat)))
+    gz = client.get('/books', headers={'Accept-Encoding': 'gzip'})
+    results.append((f'GET /books + gzip ({len(gz.data)} bytes)',
+                    _timeit(lambda: client.get('/books', headers={'Accept-Encoding': 'gzip'}), args.repeat)))
+
+    print(f'{args.books} books, median of {args.repeat} runs')
+    for name, ms in results:
+        print(f'  {name:<40} {ms:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
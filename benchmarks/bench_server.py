@@ -0,0 +1,70 @@
+# bench_server.py
+"""
+Throughput of the sync (threaded WSGI) and async (ASGI) serving modes.
+
+Starts the server in a scratch data directory, then runs each scenario
+for a fixed time from many client threads over keep-alive connections
+and reports requests/second and latency percentiles.
+
+    python benchmarks/bench_server.py --server wsgi
+    python benchmarks/bench_server.py --server asgi --workers 1 --clients 64
+    STORAGE_BACKEND=sqlite python benchmarks/bench_server.py --server asgi
+
+Needs uvicorn for --server asgi. For every route and larger datasets
+see benchmarks/suite.py.
+"""
+import os
+import json
+import argparse
+import tempfile
+from http_load import free_port, start_server, run_load, percentile
+
+SCENARIOS = {
+    'post-message': ('POST', '/messages', {'username': 'bench', 'message': 'hello from the benchmark'}),
+    'post-book': ('POST', '/books', {'title': 'Benchmark', 'author': 'bench', 'year': 2024}),
+    'get-books': ('GET', '/books?page=1&limit=20', None),
+    'get-messages': ('GET', '/messages?page=1&limit=20', None),
+}
+
+
+def run(port, scenario, clients, duration):
+    method, path, payload = SCENARIOS[scenario]
+    body = json.dumps(payload).encode('utf-8') if payload is not None else None
+    headers = {'Content-Type': 'application/json'} if body else {}
+    latencies, errors, elapsed = run_load(port, lambda: (method, path, body, headers),
+                                          clients, duration)
+    if errors:
+        raise RuntimeError(f'{scenario}: {errors} error responses')
+    print(f'  {scenario:<14} {len(latencies) / elapsed:8.0f} req/s   '
+          f'p50 {percentile(latencies, 50) * 1000:6.1f} ms   '
+          f'p99 {percentile(latencies, 99) * 1000:6.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi')
+    parser.add_argument('--workers', type=int, default=1, help='server processes (asgi only)')
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per scenario')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.makedirs(os.path.join(data_dir, 'data'))
+        for name in ('books.json', 'messages.json'):
+            with open(os.path.join(data_dir, 'data', name), 'w') as f:
+                f.write('[]')
+        port = free_port()
+        proc = start_server(args.server, port, data_dir, workers=args.workers)
+        try:
+            print(f'{args.server} server, {args.workers} worker(s), {args.clients} clients, '
+                  f"{os.environ.get('STORAGE_BACKEND', 'json')} storage")
+            for scenario in args.scenarios.split(','):
+                run(port, scenario, args.clients, args.duration)
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+# bench_workers.py
+"""
+Several worker processes sharing one data directory, with reads spread
+over all of them while one client keeps writing.
+
+  reload        default: a worker that notices another's write reloads
+                the whole catalog from storage
+  change log    CHANGE_LOG=1: workers apply each other's writes from the
+                shared change log, record by record
+  log, polled   as above, reads look at the log at most every 0.5s
+
+Each write goes to one worker, and the new book is read right back from
+the next one, passing the write's X-Change-Seq as X-Min-Change-Seq; a
+404 there is a read-your-writes miss. Reports read throughput and
+latency over all workers, writes done and misses, then checks that
+every worker ends up with the same catalog. Exits with status 1 on any
+miss or disagreement, so it can serve as a regression check.
+
+Storage defaults to SQLite, where a write itself is cheap; with the json
+backend every write rewrites the whole file, which then dominates.
+
+    python benchmarks/bench_workers.py [--books 50000] [--workers 4] [--write-rate 20] [--duration 5]
+    python benchmarks/bench_workers.py --storage json --books 5000
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import http.client
+from http_load import free_port, start_server, run_load, percentile
+import datasets
+
+SETUPS = [
+    ('reload', {'CHANGE_LOG': '0'}),
+    ('change log', {'CHANGE_LOG': '1'}),
+    ('log, polled', {'CHANGE_LOG': '1', 'CHANGE_LOG_POLL_SECONDS': '0.5'}),
+]
+
+
+def _request(conn, method, path, payload=None, headers=None):
+    headers = dict(headers or {})
+    body = None
+    if payload is not None:
+        body = json.dumps(payload).encode('utf-8')
+        headers['Content-Type'] = 'application/json'
+    conn.request(method, path, body=body, headers=headers)
+    resp = conn.getresponse()
+    return resp.status, resp.getheader('X-Change-Seq'), json.loads(resp.read())
+
+
+def run_setup(name, env, args):
+    with tempfile.TemporaryDirectory() as work_dir:
+        datasets.generate(work_dir, args.books, 0, sqlite=args.storage == 'sqlite')
+        saved = dict(os.environ)
+        os.environ.update(env, STORAGE_BACKEND=args.storage)
+        procs = []
+        try:
+            ports = [free_port() for _ in range(args.workers)]
+            for port in ports:
+                procs.append(start_server('wsgi', port, work_dir))
+        finally:
+            os.environ.clear()
+            os.environ.update(saved)
+        try:
+            writes = {'done': 0, 'misses': 0, 'seq': None}
+            stop_at = time.perf_counter() + args.duration
+
+            def writer():
+                conns = [http.client.HTTPConnection('127.0.0.1', port, timeout=120) for port in ports]
+                i = 0
+                while time.perf_counter() < stop_at:
+                    target = i % len(conns)
+                    status, seq, body = _request(conns[target], 'POST', '/books',
+                                                 {'title': f'Written {i}', 'author': 'writer', 'year': 2024})
+                    if status == 201:
+                        writes['done'] += 1
+                        writes['seq'] = seq
+                        headers = {'X-Min-Change-Seq': seq} if seq else {}
+                        status, _, _ = _request(conns[(target + 1) % len(conns)], 'GET',
+                                                f"/books/id={body['data']['id']}", headers=headers)
+                        if status != 200:
+                            writes['misses'] += 1
+                    i += 1
+                    time.sleep(1 / args.write_rate)
+                for conn in conns:
+                    conn.close()
+
+            rng = random.Random(0)
+            ids = [rng.randint(1, args.books) for _ in range(1024)]
+            counter = iter(range(10 ** 9))
+
+            def read():
+                i = next(counter)
+                if i % 2:
+                    return 'GET', f'/books/id={ids[i % 1024]}', None, {}
+                return 'GET', f'/books?author=Author%20{i % 500}&limit=20', None, {}
+
+            results = []
+            readers = [threading.Thread(target=lambda port=port: results.append(
+                run_load(port, read, args.clients, args.duration))) for port in ports]
+            write_thread = threading.Thread(target=writer)
+            for t in readers + [write_thread]:
+                t.start()
+            for t in readers + [write_thread]:
+                t.join()
+
+            # Every worker must end up with the same catalog
+            headers = {'X-Min-Change-Seq': writes['seq']} if writes['seq'] else {}
+            totals = set()
+            for port in ports:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+                totals.add(_request(conn, 'GET', '/books?limit=1', headers=headers)[2]['total'])
+                conn.close()
+        finally:
+            for proc in procs:
+                proc.terminate()
+                proc.wait()
+
+    latencies = sorted(v for r in results for v in r[0])
+    elapsed = max(r[2] for r in results)
+    result = {
+        'req_per_s': len(latencies) / elapsed,
+        'p50': percentile(latencies, 50) * 1000,
+        'p99': percentile(latencies, 99) * 1000,
+        'writes': writes['done'],
+        'misses': writes['misses'],
+        'agree': len(totals) == 1,
+    }
+    print(f"  {name:<12} reads {result['req_per_s']:7.0f} req/s  p50 {result['p50']:7.2f}  "
+          f"p99 {result['p99']:8.2f} ms  {result['writes']} writes, {result['misses']} read-your-writes misses, "
+          f"workers {'agree' if result['agree'] else 'DISAGREE: ' + str(sorted(totals))}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, default=50000)
+    parser.add_argument('--storage', choices=('json', 'sqlite'), default='sqlite')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=4, help='reader threads per worker')
+    parser.add_argument('--write-rate', type=float, default=20, help='writes per second')
+    parser.add_argument('--duration', type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f'{args.workers} wsgi workers on {os.cpu_count()} cores, {args.storage}, {args.books} books, '
+          f'{args.clients} readers per worker, ~{args.write_rate:g} writes/s')
+    failed = False
+    for name, env in SETUPS:
+        result = run_setup(name, env, args)
+        failed = failed or result['misses'] > 0 or not result['agree']
+    if failed:
+        print('FAIL: read-your-writes miss or workers disagree')
+        sys.exit(1)
+    print('ok: every write visible on the next worker, all workers agree')
+
+
+if __name__ == '__main__':
+    main()
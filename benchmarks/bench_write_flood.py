@@ -0,0 +1,135 @@
+# bench_write_flood.py
+"""
+Read latency under a write flood, with and without admission control.
+
+Starts a server on a fresh dataset for each setup and measures
+GET /books/id= latency from a few reader clients, first alone and then
+while writer clients send POST /books and POST /messages at a fixed
+offered rate (--write-rate, all from one address), well above what the
+disk can absorb:
+
+  unprotected   RATE_LIMIT_RATE=0, MAX_INFLIGHT_WRITES=0
+  protected     per-client token bucket and a small in-flight write cap
+
+Reports reader p50/p99 and what happened to the writes. A read that
+arrives during an admitted write still waits for it, so the flooded p99
+is bounded by one write, not by the flood. Exits with status 1 if the
+protected flooded read p99 is above --max-p99-ms or above
+--max-p99-fraction of the unprotected one, so it can serve as a
+regression check.
+
+    python benchmarks/bench_write_flood.py [--books 5000] [--writers 32] [--duration 5]
+"""
+import os
+import sys
+import json
+import random
+import time
+import argparse
+import tempfile
+import threading
+from http_load import free_port, start_server, run_load, percentile
+import datasets
+
+SETUPS = [
+    ('unprotected', {'RATE_LIMIT_RATE': '0', 'MAX_INFLIGHT_WRITES': '0'}),
+    ('protected', {'RATE_LIMIT_RATE': '5', 'RATE_LIMIT_BURST': '10', 'MAX_INFLIGHT_WRITES': '4'}),
+]
+
+
+def _json(payload):
+    return json.dumps(payload).encode('utf-8'), {'Content-Type': 'application/json'}
+
+
+def run_setup(name, env, args):
+    with tempfile.TemporaryDirectory() as work_dir:
+        datasets.generate(work_dir, args.books, args.messages)
+        saved = dict(os.environ)
+        os.environ.update(env)
+        try:
+            port = free_port()
+            proc = start_server(args.server, port, work_dir)
+        finally:
+            os.environ.clear()
+            os.environ.update(saved)
+        try:
+            rng = random.Random(0)
+            ids = [rng.randint(1, args.books) for _ in range(1024)]
+            counter = iter(range(10 ** 9))
+
+            def read():
+                return 'GET', f'/books/id={ids[next(counter) % 1024]}', None, {}
+
+            # Open loop: writers keep to the offered rate whether or not
+            # the server keeps up, like a client that ignores Retry-After
+            schedule = [time.perf_counter()]
+            schedule_lock = threading.Lock()
+
+            def write():
+                with schedule_lock:
+                    # No catch-up bursts after a stall
+                    schedule[0] = max(schedule[0] + 1 / args.write_rate, time.perf_counter())
+                    due = schedule[0]
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                i = next(counter)
+                if i % 2:
+                    body, headers = _json({'title': f'Flood {i}', 'author': 'flood', 'year': 2024})
+                    return 'POST', '/books', body, headers
+                body, headers = _json({'username': f'flood{i % 8}', 'message': f'flood {i}'})
+                return 'POST', '/messages', body, headers
+
+            quiet, _, _ = run_load(port, read, args.readers, args.duration)
+
+            flood = {}
+            writer = threading.Thread(target=lambda: flood.update(
+                zip(('latencies', 'errors', 'elapsed'), run_load(port, write, args.writers, args.duration))))
+            writer.start()
+            loud, _, _ = run_load(port, read, args.readers, args.duration)
+            writer.join()
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    writes = len(flood['latencies'])
+    result = {
+        'quiet_p50': percentile(quiet, 50) * 1000,
+        'quiet_p99': percentile(quiet, 99) * 1000,
+        'flood_p50': percentile(loud, 50) * 1000,
+        'flood_p99': percentile(loud, 99) * 1000,
+        'writes_accepted_per_s': (writes - flood['errors']) / flood['elapsed'],
+        'writes_refused': flood['errors'],
+    }
+    print(f"  {name:<12} reads p50/p99 {result['quiet_p50']:6.1f}/{result['quiet_p99']:6.1f} ms alone, "
+          f"{result['flood_p50']:6.1f}/{result['flood_p99']:6.1f} ms flooded; "
+          f"writes {result['writes_accepted_per_s']:6.0f}/s accepted, {result['writes_refused']} refused")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--books', type=int, default=5000)
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi')
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('--writers', type=int, default=32)
+    parser.add_argument('--write-rate', type=float, default=300, help='offered writes per second')
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--max-p99-ms', type=float, default=150.0)
+    parser.add_argument('--max-p99-fraction', type=float, default=0.5)
+    args = parser.parse_args()
+
+    print(f'{args.server} server, {args.books} books, {args.readers} readers, '
+          f'{args.writers} writers offering {args.write_rate:g} writes/s')
+    results = {name: run_setup(name, env, args) for name, env in SETUPS}
+    protected = results['protected']
+    limit = min(args.max_p99_ms, results['unprotected']['flood_p99'] * args.max_p99_fraction)
+    if protected['flood_p99'] > limit:
+        print(f"FAIL: protected read p99 {protected['flood_p99']:.1f} ms under flood > {limit:.1f} ms")
+        sys.exit(1)
+    print(f"ok: protected read p99 under flood within {limit:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
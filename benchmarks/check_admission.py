@@ -0,0 +1,137 @@
+# check_admission.py
+"""
+Deterministic checks of write admission control, to go with the timing
+numbers of bench_write_flood.py.
+
+  buckets   GCRA arithmetic of both bucket stores with an injected clock:
+            burst, refill, Retry-After, all-or-none charging of a
+            request's keys, and the key bound of the memory store
+  app       429 and 503 through create_app(): refused writes carry
+            Retry-After, a write refused for its IP leaves its username's
+            bucket alone, and the in-flight cap turns the next write away
+
+Prints each failed check and exits with status 1 if there was one.
+
+    python benchmarks/check_admission.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.rate_limit import MemoryBuckets, SqliteBuckets, RateLimiter
+
+failures = []
+
+
+def expect(condition, message):
+    if not condition:
+        failures.append(message)
+        print(f'  FAIL {message}')
+
+
+def check_buckets(name, make):
+    # 1 token per second, bursts of 3
+    buckets = make(1.0, 3)
+    now = 1000.0
+    results = [buckets.take(['a'], now) for _ in range(4)]
+    expect(results[:3] == [0.0, 0.0, 0.0], f'{name}: burst of 3 admitted, got {results[:3]}')
+    expect(abs(results[3] - 1.0) < 1e-9, f'{name}: 4th request waits 1s, got {results[3]}')
+    expect(buckets.take(['a'], now + 0.5) > 0, f'{name}: still refused half a token later')
+    expect(buckets.take(['a'], now + 1.0) == 0.0, f'{name}: admitted once a token refilled')
+
+    # 'a' is empty: a request that also names 'b' is refused and takes nothing from 'b'
+    for _ in range(5):
+        expect(buckets.take(['a', 'b'], now + 1.0) > 0, f'{name}: refused while one key is empty')
+    results = [buckets.take(['b'], now + 1.0) for _ in range(3)]
+    expect(results == [0.0, 0.0, 0.0], f"{name}: refused requests left 'b' full, got {results}")
+
+    # Both have tokens: both are charged
+    buckets.take(['c', 'd'], now)
+    buckets.take(['c', 'd'], now)
+    expect(buckets.take(['c'], now) == 0.0, f"{name}: 'c' has its last token")
+    expect(buckets.take(['c'], now) > 0 and buckets.take(['d'], now) == 0.0,
+           f"{name}: a joint request charges every key once")
+
+
+def check_key_bound():
+    buckets = MemoryBuckets(1.0, 3, max_keys=100)
+    now = 1000.0
+    for i in range(10_000):
+        buckets.take([f'ip:{i}'], now)
+    expect(len(buckets) == 100, f'memory: table bounded at 100 keys, has {len(buckets)}')
+    # The most recently charged keys are the ones kept
+    expect(buckets.take(['ip:9999'], now) == 0.0 and buckets.take(['ip:9999'], now) == 0.0
+           and buckets.take(['ip:9999'], now) > 0, 'memory: recent key kept its state')
+
+    for _ in range(3):
+        buckets.take(['ip:x'], now)
+    size = len(buckets)
+    for i in range(1000):
+        buckets.take(['ip:x', f'username:{i}'], now)
+    expect(len(buckets) == size, f'memory: refused requests added keys ({size} -> {len(buckets)})')
+
+
+def check_app(work_dir):
+    from app import create_app
+    from controllers.admission import WriteAdmission
+
+    # A token every 1000s: nothing refills while the check runs
+    app = create_app({'DATA_DIR': os.path.join(work_dir, 'data'), 'RATE_LIMIT_RATE': 0.001,
+                      'RATE_LIMIT_BURST': 2, 'RATE_LIMIT_KEYS': ('ip', 'username'),
+                      'MAX_INFLIGHT_WRITES': 1})
+    client = app.test_client()
+
+    def post(ip, username):
+        return client.post('/messages', json={'username': username, 'message': 'hi'},
+                           environ_base={'REMOTE_ADDR': ip})
+
+    statuses = [post('10.0.0.1', 'alice').status_code for _ in range(2)]
+    expect(statuses == [201, 201], f'app: burst admitted, got {statuses}')
+    resp = post('10.0.0.1', 'carol')
+    expect(resp.status_code == 429, f'app: third write from one IP refused, got {resp.status_code}')
+    expect(resp.get_json().get('error_code') == 'RATE_LIMITED', 'app: 429 says RATE_LIMITED')
+    retry_after = int(resp.headers.get('Retry-After', 0))
+    expect(900 <= retry_after <= 1000, f'app: Retry-After about 1000s, got {retry_after}')
+    statuses = [post('10.0.0.2', 'carol').status_code for _ in range(2)]
+    expect(statuses == [201, 201], f"app: refused write left carol's bucket full, got {statuses}")
+    expect(post('10.0.0.3', 'alice').status_code == 429, "app: alice's own bucket is empty")
+    expect(client.get('/messages').status_code == 200, 'app: reads are never rate limited')
+
+    # In-flight cap: a write admitted but not finished holds the only slot
+    admission = WriteAdmission(dict(app.config, RATE_LIMIT_RATE=0))
+    with app.test_request_context('/books', method='POST', json={}):
+        expect(admission.admit() is None, 'app: first write admitted')
+        with app.test_request_context('/books', method='POST', json={}):
+            resp = admission.admit()
+            expect(resp is not None and resp.status_code == 503, 'app: second write in flight refused with 503')
+            expect(resp is not None and resp.headers.get('Retry-After') == '1', 'app: 503 has Retry-After: 1')
+            admission.release()
+        expect(admission.in_flight == 1, f'app: refused write not counted, in flight {admission.in_flight}')
+        admission.release()
+    expect(admission.in_flight == 0, 'app: slot released')
+    with app.test_request_context('/books', method='POST', json={}):
+        expect(admission.admit() is None, 'app: next write admitted after release')
+        admission.release()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as work_dir:
+        print('buckets')
+        check_buckets('memory', MemoryBuckets)
+        check_buckets('sqlite', lambda rate, burst: SqliteBuckets(rate, burst, os.path.join(work_dir, 'rl.db')))
+        check_key_bound()
+        limiter = RateLimiter(1.0, 1)
+        expect(limiter.check(iter(['ip:a', 'username:a']), 5.0) == 0.0
+               and limiter.check(['ip:a'], 5.0) > 0, 'limiter: check() takes any iterable of keys')
+        print('app')
+        check_app(work_dir)
+    if failures:
+        print(f'FAIL: {len(failures)} check(s) failed')
+        sys.exit(1)
+    print('ok: buckets, 429 and 503 behave as specified')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+# check_services.py
+"""
+Deterministic checks of service-layer edge cases that the timing
+benchmarks do not exercise.
+
+  ids       message ids stay unique across a restart once every message
+            has expired into the archive
+  batch     DELETE /books rejects ids that are not integers (lists,
+            objects) item by item with a 400, deleting nothing
+  import    a line that is not UTF-8 fails on its own, in NDJSON and
+            CSV alike; a storage failure partway still reports the
+            batches already committed
+
+Prints each failed check and exits with status 1 if there was one.
+
+    python benchmarks/check_services.py
+"""
+import os
+import sys
+import json
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from services.message_service import MessageService
+
+failures = []
+
+
+def expect(condition, message):
+    if not condition:
+        failures.append(message)
+        print(f'  FAIL {message}')
+
+
+def check_message_ids(work_dir):
+    path = os.path.join(work_dir, 'messages.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump([{'id': i, 'username': 'u', 'message': f'old {i}', 'created_at': f'2020-01-0{i}T00:00:00Z'}
+                   for i in (1, 2, 3)], f)
+    settings = dict(vars(config), MESSAGE_RETENTION_DAYS=1, MESSAGE_ARCHIVE_BATCH=1)
+    # Starting up archives all three; the restart finds the board empty
+    MessageService(json_path=path, storage='json', settings=settings)
+    service = MessageService(json_path=path, storage='json', settings=settings)
+    expect(service.get_messages()[1] == 0, 'ids: board empty after the restart')
+    expect(len(service._archive) == 3, f'ids: 3 messages archived, got {len(service._archive)}')
+    posted = service.create_message({'username': 'u', 'message': 'new'})
+    expect(posted['id'] == 4, f"ids: next post after the archived ids gets 4, got {posted['id']}")
+    older, _, _ = service.get_messages_before(posted['id'], 10)
+    expect([m.id for m in older] == [3, 2, 1], f'ids: cursor walks back into the archive, got {[m.id for m in older]}')
+
+
+def check_batch_delete(work_dir):
+    from app import create_app
+
+    app = create_app({'DATA_DIR': os.path.join(work_dir, 'data')})
+    client = app.test_client()
+    for i in range(3):
+        client.post('/books', json={'title': f'Book {i}', 'author': 'A', 'year': 2000})
+    # ids -> items that must be reported
+    cases = [([[1]], [1]), ([{}], [1]), ([1, [2], {'id': 3}, 1], [2, 3, 4])]
+    for ids, bad in cases:
+        resp = client.delete('/books', json={'ids': ids})
+        expect(resp.status_code == 400, f'batch: ids={ids} refused with 400, got {resp.status_code}')
+        items = [err['item'] for err in (resp.get_json() or {}).get('errors', [])]
+        expect(items == bad, f'batch: ids={ids} reports items {bad}, got {items}')
+    total = client.get('/books?limit=1').get_json()['total']
+    expect(total == 3, f'batch: refused deletes removed nothing, {total} books left')
+
+
+def check_import(work_dir):
+    from unittest import mock
+    from app import create_app
+
+    app = create_app({'DATA_DIR': os.path.join(work_dir, 'import')})
+    client = app.test_client()
+
+    def post(lines, mimetype, batch_size=10):
+        return client.post(f'/books/import?batch_size={batch_size}', data=b''.join(lines),
+                           headers={'Content-Type': mimetype})
+
+    rows = [json.dumps({'title': f'T{i}', 'author': 'A', 'year': 2000}).encode() + b'\n' for i in range(50)]
+    rows[25] = b'{"title": "\xff\xfe", "author": "A", "year": 2000}\n'
+    resp = post(rows, 'application/x-ndjson')
+    summary = (resp.get_json() or {}).get('data') or {}
+    expect(resp.status_code == 201 and summary.get('created') == 49 and summary.get('failed') == 1,
+           f'import: NDJSON with one bad line imports the rest, got {resp.status_code} {summary}')
+    expect([e['line'] for e in summary.get('errors', [])] == [26], f'import: bad NDJSON line reported, got {summary}')
+
+    rows = [b'title,author,year\n'] + [f'T{i},A,2000\n'.encode() for i in range(50)]
+    rows[31] = b'T\xc3,A,2000\n'
+    resp = post(rows, 'text/csv')
+    summary = (resp.get_json() or {}).get('data') or {}
+    expect(resp.status_code == 201 and summary.get('created') == 49 and summary.get('failed') == 1,
+           f'import: CSV with one bad line imports the rest, got {resp.status_code} {summary}')
+    expect([e['line'] for e in summary.get('errors', [])] == [32], f'import: bad CSV line reported, got {summary}')
+
+    # Storage fails on the second batch: the first stays and is reported
+    service = app.extensions['services'].books
+    commit, calls = service.backend.commit, []
+
+    def failing_commit(*args, **kwargs):
+        calls.append(1)
+        if len(calls) == 2:
+            raise OSError('disk full')
+        return commit(*args, **kwargs)
+
+    before = client.get('/books?limit=1').get_json()['total']
+    rows = [json.dumps({'title': f'T{i}', 'author': 'A', 'year': 2000}).encode() + b'\n' for i in range(50)]
+    with mock.patch.object(service.backend, 'commit', failing_commit):
+        resp = post(rows, 'application/x-ndjson')
+    summary = (resp.get_json() or {}).get('data') or {}
+    after = client.get('/books?limit=1').get_json()['total']
+    expect(resp.status_code == 500 and summary.get('created') == 10,
+           f'import: failure after one batch reports it, got {resp.status_code} {summary}')
+    expect(after - before == 10, f'import: the committed batch stays, {after - before} added')
+
+
+def main():
+    with tempfile.TemporaryDirectory() as work_dir:
+        print('ids')
+        check_message_ids(work_dir)
+        print('batch')
+        check_batch_delete(work_dir)
+        print('import')
+        check_import(work_dir)
+    if failures:
+        print(f'FAIL: {len(failures)} check(s) failed')
+        sys.exit(1)
+    print('ok: service edge cases behave as specified')
+
+
+if __name__ == '__main__':
+    main()
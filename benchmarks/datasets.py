@@ -0,0 +1,104 @@
+# datasets.py
+"""
+Synthetic datasets for the benchmarks.
+
+Writes data/books.json and data/messages.json under a directory, in the
+format the JSON backends read, and migrates them into data/app.db as
+well when STORAGE_BACKEND=sqlite. Output is deterministic for a given
+seed, so runs on different commits see the same data.
+
+    python benchmarks/datasets.py --books 100000 --messages 100000 --out /tmp/bench-data
+"""
+import os
+import sys
+import json
+import random
+import argparse
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TITLE_WORDS = ['红楼梦', '三国演义', '西游记', '水浒传', 'History', 'Python', 'Garden',
+               'Night', 'River', 'Empire', 'Letters', 'Journey', 'Silent', 'Atlas']
+AUTHORS = 5000
+USERS = 20000
+# Messages are spread over this span, ending at FIRST_MESSAGE + span
+FIRST_MESSAGE = datetime(2025, 1, 1)
+
+
+def book_records(count, seed=0):
+    rng = random.Random(seed)
+    for i in range(1, count + 1):
+        yield {
+            'id': i,
+            'title': f'{rng.choice(TITLE_WORDS)} {rng.choice(TITLE_WORDS)} {i}',
+            'author': f'Author {rng.randrange(AUTHORS)}',
+            'year': rng.randint(1800, 2025),
+            'available': rng.random() < 0.8,
+        }
+
+
+def message_records(count, seed=0):
+    rng = random.Random(seed + 1)
+    created = FIRST_MESSAGE
+    for i in range(1, count + 1):
+        # Timestamps in the format Message generates, oldest first
+        created += timedelta(microseconds=rng.randrange(1, 10 ** 7))
+        yield {
+            'id': i,
+            'username': f'user{rng.randrange(USERS)}',
+            'message': f'{rng.choice(TITLE_WORDS)} message {i}',
+            'created_at': created.isoformat() + 'Z',
+        }
+
+
+def _write_array(path, records):
+    # Streamed, so a million records never sit in memory as one list
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for n, record in enumerate(records):
+            f.write(',\n' if n else '\n')
+            f.write(json.dumps(record, ensure_ascii=False))
+        f.write('\n]')
+
+
+def generate(directory, books, messages, seed=0, sqlite=None):
+    """
+    Create '<directory>/data' with the given number of books and messages.
+    'sqlite' defaults to STORAGE_BACKEND == 'sqlite'.
+    """
+    data_dir = os.path.join(directory, 'data')
+    os.makedirs(data_dir, exist_ok=True)
+    books_path = os.path.join(data_dir, 'books.json')
+    messages_path = os.path.join(data_dir, 'messages.json')
+    _write_array(books_path, book_records(books, seed))
+    _write_array(messages_path, message_records(messages, seed))
+    # Leftovers from an earlier dataset in the same directory
+    for name in ('messages.journal', 'app.db', 'app.db-wal', 'app.db-shm',
+                 'idempotency.db', 'idempotency.db-wal', 'idempotency.db-shm'):
+        path = os.path.join(data_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+    if sqlite is None:
+        sqlite = os.environ.get('STORAGE_BACKEND') == 'sqlite'
+    if sqlite:
+        if ROOT not in sys.path:
+            sys.path.insert(0, ROOT)
+        from storage.migrate import migrate
+        migrate(books_path, messages_path, os.path.join(data_dir, 'app.db'))
+    return data_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate benchmark datasets.')
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', required=True, help='directory to create data/ in')
+    args = parser.parse_args()
+    data_dir = generate(args.out, args.books, args.messages, args.seed)
+    print(f'{args.books} books, {args.messages} messages -> {data_dir}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# http_load.py
+"""
+Helpers shared by the HTTP benchmarks: start a server in a data
+directory and drive it from many keep-alive client threads.
+"""
+import os
+import sys
+import time
+import socket
+import threading
+import subprocess
+import http.client
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run from the data directory so data/*.json resolve there
+WSGI_SERVER = ('import logging; from werkzeug.serving import make_server; from app import app; '
+               "logging.getLogger('werkzeug').setLevel(logging.ERROR); "
+               "make_server('127.0.0.1', {port}, app, threaded=True).serve_forever()")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(server, port, data_dir, workers=1, ready_timeout=120):
+    """
+    Start 'wsgi' (threaded werkzeug) or 'asgi' (uvicorn asgi:app) and wait
+    until it accepts connections. Large datasets take a while to load.
+    """
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    # Load before listening, so timings never include the first load
+    env.setdefault('SERVICE_LOADING', 'eager')
+    if server == 'wsgi':
+        cmd = [sys.executable, '-c', WSGI_SERVER.format(port=port)]
+    else:
+        cmd = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port),
+               '--workers', str(workers), '--log-level', 'warning', '--no-access-log']
+    proc = subprocess.Popen(cmd, cwd=data_dir, env=env)
+    deadline = time.time() + ready_timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'{server} server exited with code {proc.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f'{server} server did not start')
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * pct / 100), len(sorted_values) - 1)]
+
+
+def run_load(port, next_request, clients, duration):
+    """
+    Run 'clients' threads for 'duration' seconds. next_request() returns
+    (method, path, body bytes or None, headers) for each request, or None
+    once there is nothing left to send, which ends the run early.
+    Returns (sorted latencies in seconds, error responses, elapsed seconds).
+    """
+    latencies = []
+    errors = [0]
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+        try:
+            while time.perf_counter() < stop_at:
+                request = next_request()
+                if request is None:
+                    break
+                method, path, body, headers = request
+                start = time.perf_counter()
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                latencies.append(time.perf_counter() - start)
+                if resp.status >= 400:
+                    errors[0] += 1
+        finally:
+            conn.close()
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return latencies, errors[0], elapsed
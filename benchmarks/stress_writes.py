@@ -0,0 +1,140 @@
+# stress_writes.py
+"""
+Concurrency stress check for the write paths.
+
+Starts several server processes sharing one scratch data directory, then
+hammers POST /books (single and bulk) and POST /messages from many client
+threads spread across them. Afterwards the data is reloaded from disk and
+checked for lost records and duplicate ids.
+
+    python benchmarks/stress_writes.py --processes 4 --threads 16 --requests 50
+    STORAGE_BACKEND=sqlite python benchmarks/stress_writes.py
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import multiprocessing
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BULK_SIZE = 5
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _serve(data_dir, port):
+    # Runs in a spawned process: services resolve data/*.json from the cwd
+    os.chdir(data_dir)
+    sys.path.insert(0, ROOT)
+    import logging
+    from werkzeug.serving import make_server
+    from app import app
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    make_server('127.0.0.1', port, app, threaded=True).serve_forever()
+
+
+def _post(url, payload):
+    req = urllib.request.Request(url, data=json.dumps(payload).encode('utf-8'),
+                                 headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(req, timeout=30) as resp:
+        return json.load(resp)['data']
+
+
+def _wait_ready(port, deadline=20):
+    start = time.time()
+    while time.time() - start < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/books', timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def _client(ports, worker, count):
+    """
+    One client thread: returns the ids it was handed for books and messages.
+    """
+    book_ids, message_ids = [], []
+    for i in range(count):
+        base = f'http://127.0.0.1:{ports[(worker + i) % len(ports)]}'
+        if i % 3 == 0:
+            created = _post(base + '/books', [
+                {'title': f'bulk {worker}-{i}-{j}', 'author': 'stress', 'year': 2000}
+                for j in range(BULK_SIZE)
+            ])
+            book_ids.extend(b['id'] for b in created)
+        elif i % 3 == 1:
+            book = _post(base + '/books', {'title': f'single {worker}-{i}', 'author': 'stress', 'year': 2000})
+            book_ids.append(book['id'])
+        else:
+            msg = _post(base + '/messages', {'username': f'u{worker}', 'message': f'm{i}'})
+            message_ids.append(msg['id'])
+    return book_ids, message_ids
+
+
+def _check(name, handed_out, stored):
+    dup_handed = [i for i, n in Counter(handed_out).items() if n > 1]
+    dup_stored = [i for i, n in Counter(stored).items() if n > 1]
+    lost = set(handed_out) - set(stored)
+    ok = not dup_handed and not dup_stored and not lost and len(stored) == len(handed_out)
+    print(f'{name}: created={len(handed_out)} stored={len(stored)} '
+          f'duplicate_ids={len(dup_handed) + len(dup_stored)} lost={len(lost)} '
+          f'{"OK" if ok else "FAIL"}')
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=30, help='requests per client thread')
+    args = parser.parse_args()
+
+    data_dir = tempfile.mkdtemp(prefix='stress-')
+    os.makedirs(os.path.join(data_dir, 'data'))
+    ctx = multiprocessing.get_context('spawn')
+    ports = [_free_port() for _ in range(args.processes)]
+    servers = [ctx.Process(target=_serve, args=(data_dir, port), daemon=True) for port in ports]
+    for proc in servers:
+        proc.start()
+    try:
+        for port in ports:
+            _wait_ready(port)
+        start = time.time()
+        with ThreadPoolExecutor(args.threads) as pool:
+            results = list(pool.map(lambda w: _client(ports, w, args.requests), range(args.threads)))
+        elapsed = time.time() - start
+    finally:
+        for proc in servers:
+            proc.terminate()
+            proc.join()
+
+    book_ids = [i for books, _ in results for i in books]
+    message_ids = [i for _, msgs in results for i in msgs]
+    print(f'{args.threads} threads x {args.requests} requests over {args.processes} processes '
+          f'in {elapsed:.2f}s')
+
+    # Reload from disk in a fresh service to see what actually persisted
+    os.chdir(data_dir)
+    sys.path.insert(0, ROOT)
+    from services.book_service import BookService
+    from services.message_service import MessageService
+    stored_books = [b.id for b in BookService().get_all_books()]
+    stored_messages = [m.id for m in MessageService().get_messages(1, len(message_ids) or 1)[0]]
+    ok = _check('books', book_ids, stored_books) & _check('messages', message_ids, stored_messages)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,396 @@
+# suite.py
+"""
+Benchmark suite for every route and the hot service methods.
+
+Generates a synthetic dataset, then runs up to three groups against
+fresh copies of it:
+
+  micro   service methods called directly (get_messages, get_book_by_id,
+          create_books, ...)
+  client  every route in book_controller / message_controller through
+          the Flask test client, one request at a time
+  http    the same routes over real HTTP against a server process, with
+          concurrent keep-alive clients
+
+Each result has requests/second and p50/p95/p99 latency. The run is
+saved as JSON (benchmarks/results/<time>.json by default); pass an
+earlier file to --compare to flag regressions.
+
+    python benchmarks/suite.py --books 100000 --messages 100000
+    python benchmarks/suite.py --groups micro,client --compare benchmarks/results/base.json
+    STORAGE_BACKEND=sqlite python benchmarks/suite.py --server asgi --clients 64
+
+GET responses are served from the response cache when nothing changed
+in between; set RESPONSE_CACHE_SIZE=0 to measure the uncached path.
+"""
+import os
+import sys
+import gc
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import itertools
+import subprocess
+import tempfile
+import http.client
+from datetime import datetime
+from urllib.parse import quote
+
+from datasets import generate
+from http_load import free_port, start_server, run_load, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+GROUPS = ('micro', 'client', 'http')
+SEARCH_TERMS = ['python', '红楼', 'river night', 'history', 'journey']
+
+
+def _summary(group, name, latencies, elapsed, errors=0):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        'group': group,
+        'name': name,
+        'count': count,
+        'errors': errors,
+        'rps': count / elapsed if elapsed else 0.0,
+        'mean_ms': sum(latencies) / count * 1000 if count else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def _print(result):
+    print(f"  {result['name']:<44} {result['rps']:9.0f}/s  p50 {result['p50_ms']:8.2f}  "
+          f"p95 {result['p95_ms']:8.2f}  p99 {result['p99_ms']:8.2f} ms"
+          + (f"  errors {result['errors']}" if result['errors'] else ''))
+
+
+def _time_calls(fn, count):
+    latencies = []
+    started = time.perf_counter()
+    for i in range(count):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append(time.perf_counter() - start)
+    return latencies, time.perf_counter() - started
+
+
+# -- routes ------------------------------------------------------------------
+
+def _json(payload):
+    return json.dumps(payload, ensure_ascii=False).encode('utf-8'), {'Content-Type': 'application/json'}
+
+
+class Victims:
+    """
+    'make' of a delete route. The books it deletes are created for it
+    just before it runs (create()), so every request deletes books that
+    exist rather than timing 404s; request(ids) builds the request for
+    'per_request' of them at a time, from the highest id down. Returns
+    None once they are used up.
+    """
+    def __init__(self, per_request, request):
+        self.per_request = per_request
+        self._request = request
+        self._batches = iter(())
+
+    def create(self, send, requests):
+        """
+        Import enough books for 'requests' requests in one batch, so their
+        ids are consecutive. send(method, path, body, headers) returns the
+        response as (status, JSON body).
+        """
+        count = requests * self.per_request
+        body = ''.join(json.dumps({'title': f'Victim {n}', 'author': 'bench', 'year': 2000}) + '\n'
+                       for n in range(count)).encode('utf-8')
+        status, payload = send('POST', f'/books/import?batch_size={count}', body,
+                               {'Content-Type': 'application/x-ndjson'})
+        if status != 201:
+            raise RuntimeError(f'Creating books to delete failed with {status}: {payload}')
+        ids = list(range(payload['data']['last_id'], payload['data']['first_id'] - 1, -1))
+        self._batches = iter([ids[k:k + self.per_request] for k in range(0, len(ids), self.per_request)])
+
+    def __call__(self, i):
+        ids = next(self._batches, None)
+        return None if ids is None else self._request(ids)
+
+
+def routes(books, messages):
+    """
+    (name, is_write, make) for every route; make(i) returns the i-th
+    request as (method, path, body, headers). Deletes' make is a Victims.
+    Reads come first and deletes last, so every route sees the full
+    dataset.
+    """
+    rng = random.Random(0)
+    book_ids = [rng.randint(1, books) for _ in range(1024)] if books else [1]
+    message_ids = [rng.randint(1, messages) for _ in range(1024)] if messages else [1]
+    book_pages = max(books // 20, 1)
+    message_pages = max(messages // 20, 1)
+
+    def pick(values, i):
+        return values[i % len(values)]
+
+    def get(path):
+        return lambda i: ('GET', path(i), None, {})
+
+    def post(path, payload, method='POST'):
+        def make(i):
+            body, headers = _json(payload(i))
+            return method, path(i), body, headers
+        return make
+
+    def ndjson(i):
+        body = ''.join(json.dumps({'title': f'Imported {i}-{n}', 'author': 'bench', 'year': 2000 + n % 25},
+                                  ensure_ascii=False) + '\n' for n in range(100))
+        return 'POST', '/books/import', body.encode('utf-8'), {'Content-Type': 'application/x-ndjson'}
+
+    return [
+        ('GET /books', False, get(lambda i: '/books')),
+        ('GET /books?page=&limit=20', False, get(lambda i: f'/books?page={i % book_pages + 1}&limit=20')),
+        ('GET /books?author=&sort=-year&limit=20', False,
+         get(lambda i: f'/books?author={quote(f"Author {i % 5000}")}&sort=-year&limit=20')),
+        ('GET /books?after=&limit=20', False, get(lambda i: f'/books?after={pick(book_ids, i)}&limit=20')),
+        ('GET /books/search?q=', False, get(lambda i: f'/books/search?q={quote(pick(SEARCH_TERMS, i))}')),
+        ('GET /books/id=', False, get(lambda i: f'/books/id={pick(book_ids, i)}')),
+        ('GET /messages', False, get(lambda i: '/messages')),
+        ('GET /messages?page=&limit=20', False, get(lambda i: f'/messages?page={i % message_pages + 1}&limit=20')),
+        ('GET /messages?before=&limit=20', False, get(lambda i: f'/messages?before={pick(message_ids, i)}&limit=20')),
+        ('GET /messages/search?q=', False, get(lambda i: f'/messages/search?q={quote(pick(SEARCH_TERMS, i))}')),
+        ('POST /books', True, post(lambda i: '/books',
+                                   lambda i: {'title': f'Bench {i}', 'author': 'bench', 'year': 2024})),
+        ('POST /books (10 per request)', True, post(lambda i: '/books', lambda i: [
+            {'title': f'Bench {i}-{n}', 'author': 'bench', 'year': 2024} for n in range(10)])),
+        ('POST /books/import (100 rows)', True, ndjson),
+        ('PUT /books/id=', True, post(lambda i: f'/books/id={pick(book_ids, i)}',
+                                      lambda i: {'available': i % 2 == 0}, method='PUT')),
+        ('PATCH /books (100 per request)', True, post(lambda i: '/books', lambda i: [
+            {'id': book_id, 'available': i % 2 == 0}
+            for book_id in dict.fromkeys(pick(book_ids, i * 100 + n) for n in range(100))], method='PATCH')),
+        ('POST /messages', True, post(lambda i: '/messages',
+                                      lambda i: {'username': f'bench{i % 100}', 'message': f'benchmark {i}'})),
+        ('DELETE /books/id=', True, Victims(1, lambda ids: ('DELETE', f'/books/id={ids[0]}', None, {}))),
+        ('DELETE /books (100 per request)', True, Victims(100, lambda ids: ('DELETE', '/books', *_json({'ids': ids})))),
+    ]
+
+
+# -- groups ------------------------------------------------------------------
+
+def run_micro(work_dir, args):
+    from services.book_service import BookService
+    from services.message_service import MessageService
+    os.chdir(work_dir)
+    results = []
+
+    def record(name, fn, count):
+        latencies, elapsed = _time_calls(fn, count)
+        results.append(_summary('micro', name, latencies, elapsed))
+        _print(results[-1])
+
+    def load(name, service_class):
+        start = time.perf_counter()
+        service = service_class()
+        elapsed = time.perf_counter() - start
+        results.append(_summary('micro', name, [elapsed], elapsed))
+        _print(results[-1])
+        return service
+
+    books = load('BookService() load', BookService)
+    messages = load('MessageService() load', MessageService)
+
+    rng = random.Random(1)
+    book_ids = [rng.randint(1, max(args.books, 1)) for _ in range(1024)]
+    message_ids = [rng.randint(1, max(args.messages, 1)) for _ in range(1024)]
+    message_pages = max(args.messages // 20, 1)
+    n, w = args.requests, args.write_requests
+
+    record('get_book_by_id', lambda i: books.get_book_by_id(book_ids[i % 1024]), n)
+    record('query_books(author, sort=year)',
+           lambda i: books.query_books(author=f'Author {i % 5000}', sort='year', limit=20), n)
+    record('search_books', lambda i: books.search_books(SEARCH_TERMS[i % len(SEARCH_TERMS)]), n)
+    record('get_messages(page=1, limit=20)', lambda i: messages.get_messages(page=1, limit=20), n)
+    record('get_messages(random page, limit=20)',
+           lambda i: messages.get_messages(page=i % message_pages + 1, limit=20), n)
+    record('get_messages_before(id, limit=20)',
+           lambda i: messages.get_messages_before(message_ids[i % 1024], limit=20), n)
+    record('search_messages', lambda i: messages.search_messages(SEARCH_TERMS[i % len(SEARCH_TERMS)]), n)
+    record('create_book', lambda i: books.create_book(
+        {'title': f'Micro {i}', 'author': 'bench', 'year': 2024}), w)
+    record('create_books(100)', lambda i: books.create_books([
+        {'title': f'Micro {i}-{k}', 'author': 'bench', 'year': 2024} for k in range(100)]), w)
+    record('update_books(100)', lambda i: books.update_books([
+        {'id': book_id, 'available': i % 2 == 0}
+        for book_id in dict.fromkeys(book_ids[(i * 100 + k) % 1024] for k in range(100))]), w)
+    record('create_message', lambda i: messages.create_message(
+        {'username': 'bench', 'message': f'micro {i}'}), w)
+    books.backend.close()
+    messages.backend.close()
+    return results
+
+
+def run_client(work_dir, args):
+    os.chdir(work_dir)
+    # Controllers build their services on import, from the current directory
+    from app import app
+    client = app.test_client()
+
+    def send(method, path, body, headers):
+        resp = client.open(path, method=method, data=body, headers=headers)
+        return resp.status_code, resp.get_json()
+
+    results = []
+    for name, is_write, make in routes(args.books, args.messages):
+        if isinstance(make, Victims):
+            make.create(send, args.write_requests)
+        errors = [0]
+
+        def call(i):
+            method, path, body, headers = make(i)
+            resp = client.open(path, method=method, data=body, headers=headers)
+            resp.get_data()
+            if resp.status_code >= 400:
+                errors[0] += 1
+
+        latencies, elapsed = _time_calls(call, args.write_requests if is_write else args.requests)
+        results.append(_summary('client', name, latencies, elapsed, errors[0]))
+        _print(results[-1])
+    return results
+
+
+def run_http(work_dir, args):
+    port = free_port()
+    proc = start_server(args.server, port, work_dir, workers=args.workers)
+
+    def send(method, path, body, headers):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            return resp.status, json.loads(resp.read())
+        finally:
+            conn.close()
+
+    results = []
+    try:
+        for name, _, make in routes(args.books, args.messages):
+            if isinstance(make, Victims):
+                # Deletes stop early once these are gone
+                make.create(send, args.write_requests * args.clients)
+            counter = itertools.count()
+            latencies, errors, elapsed = run_load(port, lambda: make(next(counter)),
+                                                  args.clients, args.duration)
+            results.append(_summary('http', name, latencies, elapsed, errors))
+            _print(results[-1])
+    finally:
+        proc.terminate()
+        proc.wait()
+    return results
+
+
+# -- reporting ---------------------------------------------------------------
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """
+    Print the change against an earlier run; returns the regressions:
+    p50 up or throughput down by more than 'threshold' percent.
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {(r['group'], r['name']): r for r in json.load(f)['results']}
+    regressions = []
+    print(f'\nCompared with {baseline_path} (threshold {threshold:g}%)')
+    for result in results:
+        old = baseline.get((result['group'], result['name']))
+        if old is None or not old['p50_ms'] or not old['rps']:
+            continue
+        p50_change = (result['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100
+        rps_change = (result['rps'] - old['rps']) / old['rps'] * 100
+        regressed = p50_change > threshold or rps_change < -threshold
+        if regressed:
+            regressions.append(result)
+        print(f"  {result['group']:<6} {result['name']:<44} p50 {p50_change:+7.1f}%  "
+              f"rps {rps_change:+7.1f}%{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--books', type=int, default=10000)
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--groups', default=','.join(GROUPS), help='comma-separated subset of ' + ','.join(GROUPS))
+    parser.add_argument('--requests', type=int, default=500, help='calls per read benchmark (micro, client)')
+    parser.add_argument('--write-requests', type=int, default=50,
+                        help='calls per write benchmark (micro, client); http deletes send at most this many per client')
+    parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi', help='server for the http group')
+    parser.add_argument('--workers', type=int, default=1, help='server processes (asgi only)')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent clients (http)')
+    parser.add_argument('--duration', type=float, default=3.0, help='seconds per route (http)')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<time>.json)')
+    parser.add_argument('--compare', help='earlier results file to compare with')
+    parser.add_argument('--threshold', type=float, default=10.0, help='regression threshold in percent')
+    args = parser.parse_args()
+    groups = [g for g in args.groups.split(',') if g]
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"unknown groups: {', '.join(sorted(unknown))}")
+
+    sys.path.insert(0, ROOT)
+    scratch = tempfile.mkdtemp(prefix='bench-suite-')
+    results = []
+    try:
+        pristine = os.path.join(scratch, 'pristine')
+        start = time.perf_counter()
+        generate(pristine, args.books, args.messages)
+        print(f'{args.books} books, {args.messages} messages generated in {time.perf_counter() - start:.1f}s')
+        runners = {'micro': run_micro, 'client': run_client, 'http': run_http}
+        for group in groups:
+            # Each group starts from an untouched copy of the dataset
+            work_dir = os.path.join(scratch, group)
+            shutil.copytree(pristine, work_dir)
+            print(f'[{group}]')
+            results.extend(runners[group](work_dir, args))
+            gc.collect()
+    finally:
+        os.chdir(ROOT)
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'started_at': datetime.utcnow().isoformat() + 'Z',
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'storage': os.environ.get('STORAGE_BACKEND', 'json'),
+            'options': vars(args),
+        },
+        'results': results,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f'\nResults written to {output}')
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f'{len(regressions)} regression(s)')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+# config.py
+import os
+
+# Storage engine for both datasets: 'json' or 'sqlite'
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json')
+
+# In json mode books and messages go through an append-only journal
+# ('journal') or rewrite the whole file on every write ('file')
+BOOK_STORAGE = os.environ.get('BOOK_STORAGE', 'journal')
+MESSAGE_STORAGE = os.environ.get('MESSAGE_STORAGE', 'journal')
+
+# Data files live in DATA_DIR unless given a path of their own
+DATA_DIR = os.environ.get('DATA_DIR', 'data')
+DATA_FILES = {
+    'BOOKS_JSON_PATH': 'books.json',
+    'MESSAGES_JSON_PATH': 'messages.json',
+    'SQLITE_PATH': 'app.db',
+    'RATE_LIMIT_SQLITE_PATH': 'ratelimit.db',
+    'IDEMPOTENCY_SQLITE_PATH': 'idempotency.db',
+    'CHANGE_LOG_PATH': 'changes.log',
+}
+BOOKS_JSON_PATH = os.environ.get('BOOKS_JSON_PATH', os.path.join(DATA_DIR, 'books.json'))
+MESSAGES_JSON_PATH = os.environ.get('MESSAGES_JSON_PATH', os.path.join(DATA_DIR, 'messages.json'))
+SQLITE_PATH = os.environ.get('SQLITE_PATH', os.path.join(DATA_DIR, 'app.db'))
+
+# Multi-worker mode: every write also goes to a change log shared by the
+# workers of the data directory (CHANGE_LOG_PATH), and each worker
+# applies the others' writes from it record by record instead of
+# reloading the whole dataset. Turn it on for all workers or none. Reads
+# look at the log at most every CHANGE_LOG_POLL_SECONDS (0 = every read);
+# a client that sends a write's X-Change-Seq back as X-Min-Change-Seq
+# sees that write regardless. The log is cut to its newest half past
+# CHANGE_LOG_MAX_BYTES.
+CHANGE_LOG = os.environ.get('CHANGE_LOG', '0') == '1'
+CHANGE_LOG_PATH = os.environ.get('CHANGE_LOG_PATH', os.path.join(DATA_DIR, 'changes.log'))
+CHANGE_LOG_POLL_SECONDS = float(os.environ.get('CHANGE_LOG_POLL_SECONDS', 0))
+CHANGE_LOG_MAX_BYTES = int(os.environ.get('CHANGE_LOG_MAX_BYTES', 16 * 1024 * 1024))
+
+# When the services load their data: on first use ('lazy', fastest cold
+# start), while the app is built ('eager'), or in a background thread
+# right after ('background'; early requests wait for it)
+SERVICE_LOADING = os.environ.get('SERVICE_LOADING', 'lazy')
+
+# Message retention: keep at most this many messages (0 = no limit) and
+# none older than this many days (0 = no limit) in the hot store; older
+# ones move to gzip'd NDJSON segments in MESSAGE_ARCHIVE_DIR (default:
+# next to the messages file). Archiving runs once this many are due.
+MESSAGE_RETENTION_COUNT = int(os.environ.get('MESSAGE_RETENTION_COUNT', 0))
+MESSAGE_RETENTION_DAYS = float(os.environ.get('MESSAGE_RETENTION_DAYS', 0))
+MESSAGE_ARCHIVE_DIR = os.environ.get('MESSAGE_ARCHIVE_DIR', '')
+MESSAGE_ARCHIVE_BATCH = int(os.environ.get('MESSAGE_ARCHIVE_BATCH', 1000))
+
+# HTTP caching: Cache-Control max-age for GETs (0 = always revalidate via
+# ETag) and how many serialized responses to keep in memory
+HTTP_CACHE_MAX_AGE = int(os.environ.get('HTTP_CACHE_MAX_AGE', 0))
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 256))
+
+# Response compression (gzip, or br when the brotli package is installed)
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 5))
+
+# Threads for blocking work: file / SQLite I/O and, when served through
+# asgi.py, the Flask handlers themselves
+IO_WORKERS = int(os.environ.get('IO_WORKERS', 16))
+
+# Request / service / storage metrics served at GET /metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+# Settings every app in the process shares, fixed when the modules are
+# imported (the I/O thread pool; the timing wrapped around the service
+# methods): create_app() refuses a different value for these
+PROCESS_SETTINGS = ('IO_WORKERS', 'METRICS_ENABLED')
+# Per-request sampling profiler (?__profile=1 or X-Profile: 1); off by
+# default, and the toggle is ignored unless this is set
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '0') == '1'
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 1))
+
+# Live message stream (GET /messages/stream): events kept for
+# Last-Event-ID resume, per-client queue bound (a client further behind
+# is disconnected), keep-alive interval and connection cap
+STREAM_BUFFER_SIZE = int(os.environ.get('STREAM_BUFFER_SIZE', 1000))
+STREAM_QUEUE_SIZE = int(os.environ.get('STREAM_QUEUE_SIZE', 256))
+STREAM_HEARTBEAT_SECONDS = float(os.environ.get('STREAM_HEARTBEAT_SECONDS', 15))
+STREAM_MAX_CLIENTS = int(os.environ.get('STREAM_MAX_CLIENTS', 256))
+
+# Write admission control. Per-client token bucket: RATE_LIMIT_RATE writes
+# per second with bursts of RATE_LIMIT_BURST (0 = off), one bucket per
+# identity in RATE_LIMIT_KEYS ('ip', 'username'), kept in process memory
+# ('memory') or, to share them between workers, in RATE_LIMIT_SQLITE_PATH
+# ('sqlite').
+RATE_LIMIT_RATE = float(os.environ.get('RATE_LIMIT_RATE', 0))
+RATE_LIMIT_BURST = int(os.environ.get('RATE_LIMIT_BURST', 20))
+RATE_LIMIT_KEYS = tuple(k.strip() for k in os.environ.get('RATE_LIMIT_KEYS', 'ip,username').split(',') if k.strip())
+RATE_LIMIT_STORAGE = os.environ.get('RATE_LIMIT_STORAGE', 'memory')
+RATE_LIMIT_SQLITE_PATH = os.environ.get('RATE_LIMIT_SQLITE_PATH', os.path.join(DATA_DIR, 'ratelimit.db'))
+# Take the client IP from X-Forwarded-For (only behind a trusted proxy)
+TRUST_PROXY = os.environ.get('TRUST_PROXY', '0') == '1'
+# Writes handled at once per process; more are refused with 503 (0 = no cap)
+MAX_INFLIGHT_WRITES = int(os.environ.get('MAX_INFLIGHT_WRITES', 64))
+
+# Idempotency-Key on POST: the response to a keyed request is kept for
+# IDEMPOTENCY_TTL_SECONDS (0 = off) and replayed to retries with the same
+# key. At most IDEMPOTENCY_MAX_KEYS are kept, in IDEMPOTENCY_SQLITE_PATH
+# ('sqlite': survives restarts, shared by workers) or process memory
+# ('memory'), the most recent IDEMPOTENCY_CACHE_SIZE also in memory.
+# Responses held in memory total at most IDEMPOTENCY_CACHE_BYTES (a
+# larger single one is kept alone). A key whose worker died mid-request
+# is free again after the lease.
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', 24 * 3600))
+IDEMPOTENCY_MAX_KEYS = int(os.environ.get('IDEMPOTENCY_MAX_KEYS', 100_000))
+IDEMPOTENCY_CACHE_SIZE = int(os.environ.get('IDEMPOTENCY_CACHE_SIZE', 10_000))
+IDEMPOTENCY_CACHE_BYTES = int(os.environ.get('IDEMPOTENCY_CACHE_BYTES', 64 * 1024 * 1024))
+IDEMPOTENCY_LEASE_SECONDS = float(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', 60))
+IDEMPOTENCY_STORAGE = os.environ.get('IDEMPOTENCY_STORAGE', 'sqlite')
+IDEMPOTENCY_SQLITE_PATH = os.environ.get('IDEMPOTENCY_SQLITE_PATH', os.path.join(DATA_DIR, 'idempotency.db'))
@@ -0,0 +1,108 @@
+# admission.py
+import math
+import weakref
+import threading
+from flask import request
+from metrics import registry
+from controllers.responses import json_response, utc_timestamp
+from services.rate_limit import create_rate_limiter
+
+WRITE_METHODS = frozenset(('POST', 'PUT', 'PATCH', 'DELETE'))
+
+# Live instances, for the in-flight gauge
+_instances = weakref.WeakSet()
+
+RATE_LIMITED = registry.counter(
+    'http_writes_rate_limited_total', 'Writes refused with 429, by limited identity.', ('key',))
+WRITES_SHED = registry.counter(
+    'http_writes_shed_total', 'Writes refused with 503 at the in-flight cap.')
+registry.gauge('http_writes_in_flight', 'Write requests being handled.',
+               lambda: sum(a.in_flight for a in list(_instances)))
+
+
+def _reject(status_code, error_code, message, retry_after):
+    payload = {
+        'success': False,
+        'timestamp': utc_timestamp(),
+        'error_code': error_code,
+        'message': message,
+    }
+    return json_response(payload, status_code, {'Retry-After': str(max(math.ceil(retry_after), 1))})
+
+
+class WriteAdmission:
+    """
+    Admission control for one app's writes: rate-limit them per client
+    (429) and cap the number in flight (503), so a flood of writes is
+    turned away before it queues on the disk and reads keep their
+    latency. admit() is the before_request hook, release() the
+    teardown_request one. The rate limiter is built on the first write.
+    """
+    def __init__(self, settings):
+        self._settings = settings
+        self._keys = settings['RATE_LIMIT_KEYS']
+        self._trust_proxy = settings['TRUST_PROXY']
+        self._limiter = None
+        self._limiter_ready = False
+        self._limiter_lock = threading.Lock()
+        cap = settings['MAX_INFLIGHT_WRITES']
+        self._slots = threading.BoundedSemaphore(cap) if cap > 0 else None
+        self._count_lock = threading.Lock()
+        self.in_flight = 0
+        _instances.add(self)
+
+    def _rate_limiter(self):
+        if not self._limiter_ready:
+            with self._limiter_lock:
+                if not self._limiter_ready:
+                    self._limiter = create_rate_limiter(self._settings)
+                    self._limiter_ready = True
+        return self._limiter
+
+    def _client_ip(self, environ):
+        if self._trust_proxy:
+            forwarded = environ.get('HTTP_X_FORWARDED_FOR')
+            if forwarded:
+                return forwarded.split(',', 1)[0].strip()
+        return environ.get('REMOTE_ADDR', '')
+
+    def _identities(self, environ):
+        keys = []
+        if 'ip' in self._keys:
+            keys.append(('ip', self._client_ip(environ)))
+        if 'username' in self._keys:
+            # Only JSON bodies are looked at; the parse is cached for the view
+            payload = request.get_json(silent=True)
+            if isinstance(payload, dict) and isinstance(payload.get('username'), str):
+                keys.append(('username', payload['username']))
+        return keys
+
+    def admit(self):
+        environ = request.environ
+        if environ['REQUEST_METHOD'] not in WRITE_METHODS:
+            return None
+        limiter = self._rate_limiter()
+        if limiter is not None:
+            keys = self._identities(environ)
+            retry_after = limiter.check(f'{kind}:{value}' for kind, value in keys)
+            if retry_after:
+                RATE_LIMITED.inc(key='+'.join(kind for kind, _ in keys))
+                return _reject(429, 'RATE_LIMITED', 'Too many writes, slow down.', retry_after)
+        if self._slots is not None:
+            if not self._slots.acquire(blocking=False):
+                WRITES_SHED.inc()
+                return _reject(503, 'OVERLOADED', 'Server is busy, try again shortly.', 1)
+            environ['admission.slot'] = True
+        with self._count_lock:
+            self.in_flight += 1
+        environ['admission.write'] = True
+        return None
+
+    def release(self, exc=None):
+        # Also runs when the view raised
+        environ = request.environ
+        if environ.pop('admission.write', False):
+            with self._count_lock:
+                self.in_flight -= 1
+        if environ.pop('admission.slot', False):
+            self._slots.release()
@@ -1,16 +1,24 @@
 # book_controller.py
-from flask import Blueprint, jsonify, request
-from services.book_service import BookService
-from datetime import datetime
+from flask import Blueprint, current_app, request
+from services.book_service import BatchError, ImportAborted, BOOK_FIELDS
+from controllers.http_cache import conditional
+from controllers.responses import json_response, utc_timestamp
+import csv
+import io
+import json
 import logging
+from math import ceil
 
 book_bp = Blueprint('books', __name__, url_prefix='/books')
-service = BookService()
+
+def service():
+    # The app's BookService, built on first use (see services.container)
+    return current_app.extensions['services'].books
 
 def make_response(success, data=None, message=None, status_code=200, error_code=None, headers=None, **extras):
     payload = {
         'success': success,
-        'timestamp': datetime.utcnow().isoformat() + 'Z'
+        'timestamp': utc_timestamp()
     }
     if data is not None:
         payload['data'] = data
@@ -23,16 +31,83 @@ def make_response(success, data=None, message=None, status_code=200, error_code=
         payload['message'] = message
     payload.update(extras)
     # Support custom headers (e.g., Location after creation)
-    if headers:
-        return jsonify(payload), status_code, headers
-    return jsonify(payload), status_code
+    return json_response(payload, status_code, headers)
+
+# Query params understood by GET /books; any of them switches to a paged query
+QUERY_PARAMS = ('page', 'limit', 'after', 'author', 'available',
+                'year_min', 'year_max', 'sort', 'fields')
+
+def _parse_bool(value):
+    value = value.strip().lower()
+    if value in ('1', 'true', 'yes'):
+        return True
+    if value in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f"Invalid boolean: {value}")
+
+def _parse_book_query(args):
+    """
+    Turn GET /books query args into BookService.query_books kwargs.
+    Raises ValueError with a client-facing message.
+    """
+    query = {}
+    try:
+        query['page'] = int(args.get('page', 1))
+        query['limit'] = int(args['limit']) if 'limit' in args else None
+        query['after'] = int(args['after']) if 'after' in args else None
+        query['year_min'] = int(args['year_min']) if 'year_min' in args else None
+        query['year_max'] = int(args['year_max']) if 'year_max' in args else None
+    except ValueError:
+        raise ValueError('Query params page, limit, after, year_min and year_max must be integers.')
+    if query['page'] < 1 or (query['limit'] is not None and query['limit'] < 1):
+        raise ValueError('Query params page and limit must be positive integers.')
+    if query['page'] > 1 and query['limit'] is None:
+        raise ValueError('Query param page requires limit.')
+    if 'available' in args:
+        query['available'] = _parse_bool(args['available'])
+    if 'author' in args:
+        query['author'] = args['author']
+    # sort=year or sort=-year for descending
+    sort = args.get('sort', 'id')
+    query['descending'] = sort.startswith('-')
+    query['sort'] = sort.lstrip('-')
+    if 'fields' in args:
+        fields = [f.strip() for f in args['fields'].split(',') if f.strip()]
+        unknown = [f for f in fields if f not in BOOK_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        query['fields'] = fields
+    return query
 
 @book_bp.route('', methods=['GET'])
+@conditional(lambda: service().collection_etag())
 def get_books():
-    books = service.get_all_books()
-    if not books:
-        return make_response(True, data=books, message='No books available.', status_code=200)
-    return make_response(True, data=books, status_code=200)
+    if not any(param in request.args for param in QUERY_PARAMS):
+        books = service().get_all_books()
+        if not books:
+            return make_response(True, data=books, message='No books available.', status_code=200)
+        return make_response(True, data=books, status_code=200)
+
+    try:
+        query = _parse_book_query(request.args)
+        books, total, next_after = service().query_books(**query)
+    except ValueError as e:
+        return make_response(False, message=str(e), status_code=400, error_code='INVALID_PARAMS')
+    except Exception as e:
+        logging.exception(e)
+        return make_response(False, message='Internal server error', status_code=500, error_code='SERVER_ERROR')
+
+    limit = query['limit']
+    extras = {'total': total, 'limit': limit}
+    if query['after'] is not None:
+        # Cursor mode: hand back the id to continue from
+        extras['has_next'] = next_after is not None
+        extras['next_after'] = next_after
+    else:
+        total_pages = max(ceil(total / limit), 1) if limit else 1
+        extras.update(page=query['page'], total_pages=total_pages,
+                      has_prev=query['page'] > 1, has_next=query['page'] < total_pages)
+    return make_response(True, data=books, status_code=200, **extras)
 
 @book_bp.route('', methods=['POST'])
 def add_book():
@@ -46,7 +121,7 @@ def add_book():
     # Bulk create when payload is a list
     if isinstance(payload, list):
         try:
-            created = service.create_books(payload)
+            created = service().create_books(payload)
             return make_response(
                 True,
                 data=created,
@@ -71,7 +146,7 @@ def add_book():
                              error_code='INVALID_JSON')
 
     try:
-        book = service.create_book(payload)
+        book = service().create_book(payload)
         # Return Location header pointing to the new resource
         location = {'Location': f"{request.url.rstrip('/')}/{book['id']}"}
         return make_response(
@@ -91,10 +166,231 @@ def add_book():
         logging.exception(e)
         return make_response(False, message='Internal server error', status_code=500, error_code='SERVER_ERROR')
 
+def _batch_error_response(e):
+    # 404 only when every failing item is a missing book
+    not_found = all(err['error_code'] == 'NOT_FOUND' for err in e.errors)
+    return make_response(False,
+                         message=str(e),
+                         status_code=404 if not_found else 400,
+                         error_code='NOT_FOUND' if not_found else 'VALIDATION_ERROR',
+                         errors=e.errors)
+
+@book_bp.route('', methods=['PATCH'])
+def update_books():
+    """
+    Batch partial update: body is a list of {"id": n, <fields>...}.
+    All-or-nothing; per-item errors are listed under 'errors'.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, list):
+        return make_response(False,
+                             message='Request body must be a JSON list of updates.',
+                             status_code=400,
+                             error_code='INVALID_JSON')
+    try:
+        updated = service().update_books(payload)
+        return make_response(True,
+                             data=updated,
+                             message=f'{len(updated)} books updated successfully.',
+                             status_code=200)
+    except BatchError as e:
+        return _batch_error_response(e)
+    except ValueError as e:
+        return make_response(False, message=str(e), status_code=400, error_code='VALIDATION_ERROR')
+    except Exception as e:
+        logging.exception(e)
+        return make_response(False, message='Internal server error', status_code=500, error_code='SERVER_ERROR')
+
+# Filters accepted by DELETE /books, with the type each must have
+DELETE_FILTERS = {'author': str, 'available': bool, 'year_min': int, 'year_max': int}
+
+def _parse_delete(payload):
+    """
+    DELETE /books body -> BookService.delete_books kwargs: a list of ids,
+    {"ids": [...]} or {"filter": {"author": ..., "available": ...,
+    "year_min": ..., "year_max": ...}}. Raises ValueError.
+    """
+    if isinstance(payload, list):
+        return {'ids': payload}
+    if not isinstance(payload, dict) or ('ids' in payload) == ('filter' in payload):
+        raise ValueError('Request body must be a list of ids, {"ids": [...]} or {"filter": {...}}.')
+    if 'ids' in payload:
+        return {'ids': payload['ids']}
+    filters = payload['filter']
+    if not isinstance(filters, dict) or not filters:
+        raise ValueError('Field filter must be a non-empty object.')
+    unknown = [k for k in filters if k not in DELETE_FILTERS]
+    if unknown:
+        raise ValueError(f"Unknown filters: {', '.join(unknown)}")
+    for key, value in filters.items():
+        kind = DELETE_FILTERS[key]
+        if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+            raise ValueError(f"Filter {key} must be of type {kind.__name__}.")
+    return dict(filters)
+
+@book_bp.route('', methods=['DELETE'])
+def delete_books():
+    """
+    Batch delete by ids (all-or-nothing) or by filter, in one transaction.
+    """
+    payload = request.get_json(silent=True)
+    try:
+        deleted = service().delete_books(**_parse_delete(payload))
+        return make_response(True,
+                             data={'deleted': len(deleted), 'ids': deleted},
+                             message=f'{len(deleted)} books deleted successfully.',
+                             status_code=200)
+    except BatchError as e:
+        return _batch_error_response(e)
+    except ValueError as e:
+        return make_response(False, message=str(e), status_code=400, error_code='VALIDATION_ERROR')
+    except Exception as e:
+        logging.exception(e)
+        return make_response(False, message='Internal server error', status_code=500, error_code='SERVER_ERROR')
+
+def _decode_lines(stream):
+    # Lines decoded one at a time, so a bad byte sequence fails its own
+    # line instead of the rest of the body
+    if isinstance(stream, io.RawIOBase):
+        # werkzeug's LimitedStream has no readline() of its own and would
+        # be read a byte at a time
+        stream = io.BufferedReader(stream, 64 * 1024)
+    for line_no, raw in enumerate(stream, start=1):
+        try:
+            yield line_no, raw.decode('utf-8')
+        except UnicodeDecodeError as e:
+            yield line_no, ValueError(f"Line is not valid UTF-8: {e}")
+
+def _iter_ndjson(stream):
+    # One JSON object per line; blank lines are ignored
+    for line_no, line in _decode_lines(stream):
+        if isinstance(line, Exception):
+            yield line_no, line
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as e:
+            yield line_no, ValueError(f"Invalid JSON: {e}")
+
+def _parse_csv_value(field, value):
+    if field == 'year':
+        return int(value) if value.strip().lstrip('-').isdigit() else value
+    if field == 'available':
+        return value.strip().lower() in ('1', 'true', 'yes', 'y')
+    return value
+
+def _iter_csv(stream):
+    # Header row names the columns: title,author,year[,available]
+    undecodable = []
+    # Number of the last line handed to the reader, i.e. the one a row
+    # or error ends on; line 1 is the header
+    last = [0]
+
+    def lines():
+        for line_no, line in _decode_lines(stream):
+            last[0] = line_no
+            if isinstance(line, Exception):
+                undecodable.append((line_no, line))
+                # Read as a blank line, which the reader skips
+                line = '\n'
+            yield line
+
+    reader = csv.DictReader(lines())
+    while True:
+        try:
+            row = next(reader)
+        except StopIteration:
+            break
+        except csv.Error as e:
+            # The reader starts afresh on the next line
+            row = ValueError(f"Invalid CSV: {e}")
+        yield from undecodable
+        undecodable.clear()
+        if isinstance(row, Exception):
+            yield last[0], row
+            continue
+        yield last[0], {
+            k: _parse_csv_value(k, v)
+            for k, v in row.items() if k and v is not None and v != ''
+        }
+    yield from undecodable
+
+@book_bp.route('/import', methods=['POST'])
+def import_books():
+    """
+    Streaming bulk import. Body is NDJSON (application/x-ndjson) or CSV
+    (text/csv); rows are validated and persisted in batches and only a
+    summary is returned.
+    """
+    mimetype = request.mimetype
+    if mimetype in ('application/x-ndjson', 'application/jsonl', 'application/json-seq'):
+        rows = _iter_ndjson(request.stream)
+    elif mimetype == 'text/csv':
+        rows = _iter_csv(request.stream)
+    else:
+        return make_response(False,
+                             message='Content-Type must be application/x-ndjson or text/csv.',
+                             status_code=415,
+                             error_code='UNSUPPORTED_MEDIA_TYPE')
+    try:
+        batch_size = int(request.args.get('batch_size', 1000))
+        if batch_size < 1:
+            raise ValueError
+    except ValueError:
+        return make_response(False,
+                             message='Query param batch_size must be a positive integer.',
+                             status_code=400,
+                             error_code='INVALID_PARAMS')
+
+    try:
+        summary = service().import_books(rows, batch_size=batch_size)
+    except ImportAborted as e:
+        # Earlier batches are committed: tell the client which, so a
+        # retry can start after them
+        logging.exception(e)
+        return make_response(False,
+                             data=e.summary,
+                             message=f'{e} Internal server error.',
+                             status_code=500,
+                             error_code='SERVER_ERROR')
+    except Exception as e:
+        logging.exception(e)
+        return make_response(False, message='Internal server error', status_code=500, error_code='SERVER_ERROR')
+    status_code = 201 if summary['created'] else 400
+    return make_response(summary['created'] > 0,
+                         data=summary,
+                         message=f"{summary['created']} books imported, {summary['failed']} failed.",
+                         status_code=status_code,
+                         error_code=None if summary['created'] else 'VALIDATION_ERROR')
+
+@book_bp.route('/search', methods=['GET'])
+@conditional(lambda: service().collection_etag())
+def search_books():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return make_response(False, message='Query param q is required.', status_code=400, error_code='INVALID_PARAMS')
+    try:
+        limit = int(request.args.get('limit', 20))
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return make_response(False, message='Query param limit must be a positive integer.',
+                             status_code=400, error_code='INVALID_PARAMS')
+    try:
+        books, total = service().search_books(q, limit=limit)
+        # 'total' counts all matches, 'data' holds the top 'limit' ranked hits
+        return make_response(True, data=books, status_code=200, total=total, limit=limit)
+    except Exception as e:
+        logging.exception(e)
+        return make_response(False, message='Internal server error', status_code=500, error_code='SERVER_ERROR')
+
 @book_bp.route('/id=<int:book_id>', methods=['GET'])
+@conditional(lambda book_id: service().book_etag(book_id))
 def get_book(book_id):
     try:
-        book = service.get_book_by_id(book_id)
+        book = service().get_book_by_id(book_id)
         if not book:
             return make_response(False,
                                  message=f'Book with id={book_id} not found.',
@@ -115,7 +411,7 @@ def update_book(book_id):
                              error_code='INVALID_JSON')
 
     try:
-        updated = service.update_book(book_id, payload)
+        updated = service().update_book(book_id, payload)
         if not updated:
             return make_response(False,
                                  message=f'Book with id={book_id} not found.',
@@ -132,7 +428,7 @@ def update_book(book_id):
 @book_bp.route('/id=<int:book_id>', methods=['DELETE'])
 def delete_book(book_id):
     try:
-        ok = service.delete_book(book_id)
+        ok = service().delete_book(book_id)
         if not ok:
             return make_response(False,
                                  message=f'Book with id={book_id} not found.',
@@ -0,0 +1,44 @@
+# consistency.py
+from flask import current_app, request
+from controllers.admission import WRITE_METHODS
+from controllers.responses import json_response, utc_timestamp
+
+# Sent with every successful write; a client passes it back as
+# X-Min-Change-Seq to read its own writes on any worker
+CHANGE_SEQ_HEADER = 'X-Change-Seq'
+MIN_CHANGE_SEQ_HEADER = 'X-Min-Change-Seq'
+
+
+def require_change_seq():
+    """
+    before_request hook: with X-Min-Change-Seq, bring this worker up to
+    that change log seq before the view runs.
+    """
+    value = request.headers.get(MIN_CHANGE_SEQ_HEADER)
+    if value is None:
+        return None
+    try:
+        seq = int(value)
+        if seq < 0:
+            raise ValueError
+    except ValueError:
+        payload = {
+            'success': False,
+            'timestamp': utc_timestamp(),
+            'error_code': 'INVALID_HEADER',
+            'message': f'{MIN_CHANGE_SEQ_HEADER} must be a non-negative integer.',
+        }
+        return json_response(payload, 400)
+    current_app.extensions['services'].catch_up(seq)
+    return None
+
+
+def report_change_seq(resp):
+    """
+    after_request hook: tell the writer which change log seq covers its write.
+    """
+    if request.method in WRITE_METHODS and resp.status_code < 400:
+        seq = current_app.extensions['services'].change_seq()
+        if seq:
+            resp.headers[CHANGE_SEQ_HEADER] = str(seq)
+    return resp
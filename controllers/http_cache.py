@@ -0,0 +1,114 @@
+# http_cache.py
+import threading
+import weakref
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, make_response as flask_make_response, Response
+from metrics import registry
+
+# Every app has its own cache (create_app puts it in app.extensions);
+# the metrics add them all up
+_caches = weakref.WeakSet()
+
+
+class ResponseCache:
+    """
+    Bounded LRU of serialized response bodies. Each entry remembers the
+    ETag it was built for; a lookup with a different (newer) ETag misses
+    and drops the entry, so a write invalidates everything built before it.
+    """
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        _caches.add(self)
+
+    def get(self, key, etag):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != etag:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, etag, body):
+        with self._lock:
+            self._entries[key] = (etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _totals():
+    caches = list(_caches)
+    return sum(c.hits for c in caches), sum(c.misses for c in caches), sum(len(c._entries) for c in caches)
+
+
+def _lookups():
+    hits, misses, _ = _totals()
+    return [(('hit',), hits), (('miss',), misses)]
+
+
+def _hit_ratio():
+    hits, misses, _ = _totals()
+    return hits / ((hits + misses) or 1)
+
+
+registry.counter_callback('response_cache_requests_total', 'Response cache lookups by result.',
+                          _lookups, ('result',))
+registry.gauge('response_cache_hit_ratio', 'Share of response cache lookups served from the cache.', _hit_ratio)
+registry.gauge('response_cache_entries', 'Serialized responses currently cached.', lambda: _totals()[2])
+
+
+def _cache_control():
+    max_age = current_app.config['HTTP_CACHE_MAX_AGE']
+    # no-cache: clients may store the response but must revalidate with
+    # If-None-Match, which is answered with a bodiless 304
+    return f'max-age={max_age}' if max_age else 'no-cache'
+
+
+def conditional(etag_for):
+    """
+    Decorator for GET views: adds ETag/Cache-Control headers, answers
+    If-None-Match with 304 and serves repeated requests from the cache
+    of serialized bodies until the resource's ETag changes.
+
+    'etag_for' receives the view's kwargs and returns the current ETag,
+    or None to skip caching (e.g. the resource does not exist).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            etag = etag_for(**kwargs)
+            if etag is None:
+                return view(**kwargs)
+
+            # Weak comparison: compressed variants carry W/ tags of the same value
+            if request.if_none_match.contains_weak(etag):
+                resp = Response(status=304)
+            else:
+                key = (request.path, request.query_string)
+                response_cache = current_app.extensions['response_cache']
+                body = response_cache.get(key, etag)
+                if body is not None:
+                    resp = Response(body, status=200, mimetype='application/json')
+                else:
+                    resp = flask_make_response(view(**kwargs))
+                    if resp.status_code != 200:
+                        return resp
+                    response_cache.put(key, etag, resp.get_data())
+            resp.set_etag(etag)
+            resp.headers['Cache-Control'] = _cache_control()
+            return resp
+        return wrapper
+    return decorator
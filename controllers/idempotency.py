@@ -0,0 +1,121 @@
+# idempotency.py
+import hashlib
+import threading
+from flask import Response, request
+from metrics import registry
+from controllers.responses import json_response, utc_timestamp
+from services.idempotency import create_idempotency_keys, NEW, REPLAY, BUSY
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+# Not part of what a replay sends back: recomputed per response, or
+# specific to the original connection
+_UNSTORED_HEADERS = frozenset(('content-length', 'content-encoding', 'transfer-encoding',
+                               'date', 'server', 'set-cookie', 'vary', 'connection'))
+
+IDEMPOTENT_REQUESTS = registry.counter(
+    'http_idempotent_requests_total', 'POSTs carrying an Idempotency-Key, by outcome.', ('outcome',))
+
+
+def _error(status_code, error_code, message, headers=None):
+    payload = {
+        'success': False,
+        'timestamp': utc_timestamp(),
+        'error_code': error_code,
+        'message': message,
+    }
+    return json_response(payload, status_code, headers)
+
+
+def _fingerprint(environ):
+    # JSON bodies are hashed; a streamed import is identified by its
+    # type and length instead of being buffered here
+    digest = hashlib.sha256()
+    for part in (environ['REQUEST_METHOD'], request.path, environ.get('QUERY_STRING', ''),
+                 request.mimetype, str(request.content_length)):
+        digest.update(part.encode('utf-8', 'surrogateescape') + b'\0')
+    if request.is_json:
+        digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+class Idempotency:
+    """
+    Idempotency-Key support for one app's POSTs. The first request with a
+    key runs as usual and its response is stored; a retry with the same
+    key gets that response back (with 'Idempotent-Replayed: true')
+    without reaching the view or storage, so a retry storm neither
+    repeats the work nor creates duplicates. A retry while the first is
+    still running gets 409, the same key on a different request 422.
+
+    check() is a before_request hook, record() an after_request one
+    registered so it sees the body before compression, release() the
+    teardown_request one. The key store is built on the first keyed POST.
+    """
+    def __init__(self, settings):
+        self._settings = settings
+        self._keys = None
+        self._keys_ready = False
+        self._keys_lock = threading.Lock()
+
+    def _store(self):
+        if not self._keys_ready:
+            with self._keys_lock:
+                if not self._keys_ready:
+                    self._keys = create_idempotency_keys(self._settings)
+                    self._keys_ready = True
+        return self._keys
+
+    def check(self):
+        environ = request.environ
+        if environ['REQUEST_METHOD'] != 'POST':
+            return None
+        key = environ.get('HTTP_IDEMPOTENCY_KEY')
+        if key is None:
+            return None
+        store = self._store()
+        if store is None:
+            return None
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return _error(400, 'INVALID_IDEMPOTENCY_KEY',
+                          f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters.')
+        fingerprint = _fingerprint(environ)
+        outcome, stored = store.begin(key, fingerprint)
+        if outcome == NEW:
+            IDEMPOTENT_REQUESTS.inc(outcome='new')
+            environ['idempotency.key'] = (store, key, fingerprint)
+            return None
+        if outcome == REPLAY:
+            IDEMPOTENT_REQUESTS.inc(outcome='replayed')
+            resp = Response(stored.body, status=stored.status, headers=stored.headers)
+            resp.headers['Idempotent-Replayed'] = 'true'
+            return resp
+        if outcome == BUSY:
+            IDEMPOTENT_REQUESTS.inc(outcome='conflict')
+            return _error(409, 'IDEMPOTENCY_KEY_IN_USE',
+                          f'A request with this {HEADER} is still being processed.',
+                          {'Retry-After': '1'})
+        IDEMPOTENT_REQUESTS.inc(outcome='mismatch')
+        return _error(422, 'IDEMPOTENCY_KEY_REUSED',
+                      f'This {HEADER} was already used for a different request.')
+
+    def record(self, resp):
+        reserved = request.environ.pop('idempotency.key', None)
+        if reserved is None:
+            return resp
+        store, key, fingerprint = reserved
+        # Refusals (429) and server errors are worth retrying: free the key
+        if resp.status_code >= 500 or resp.status_code == 429 or resp.is_streamed:
+            store.abandon(key)
+            return resp
+        headers = [(name, value) for name, value in resp.headers.items()
+                   if name.lower() not in _UNSTORED_HEADERS]
+        store.finish(key, fingerprint, resp.status_code, headers, resp.get_data())
+        return resp
+
+    def release(self, exc=None):
+        # The view raised before record() ran
+        reserved = request.environ.pop('idempotency.key', None)
+        if reserved is not None:
+            reserved[0].abandon(reserved[1])
@@ -1,18 +1,21 @@
 # message_controller.py
-from flask import Blueprint, jsonify, request
-from services.message_service import MessageService
-from datetime import datetime
+from flask import Blueprint, Response, current_app, request
+from controllers.http_cache import conditional
+from controllers.responses import json_response, utc_timestamp
 from math import ceil
 import time
 
 message_bp = Blueprint('messages', __name__, url_prefix='/messages')
-service = MessageService()
+
+def service():
+    # The app's MessageService, built on first use (see services.container)
+    return current_app.extensions['services'].messages
 
 def make_response(success, data=None, message=None, status_code=200, error_code=None, **extras):
     # Build standard response payload
     payload = {
         'success': success,
-        'timestamp': datetime.utcnow().isoformat() + 'Z'
+        'timestamp': utc_timestamp()
     }
     if data is not None:
         payload['data'] = data
@@ -25,6 +28,9 @@ def make_response(success, data=None, message=None, status_code=200, error_code=
                 payload['total_pages'] = extras['total_pages']
                 payload['has_prev'] = extras.get('has_prev', False)
                 payload['has_next'] = extras.get('has_next', False)
+            elif 'has_next' in extras:
+                # Cursor pages have no page count, only a next marker
+                payload['has_next'] = extras['has_next']
     # Attach error code only on failures
     if not success and error_code:
         payload['error_code'] = error_code
@@ -35,7 +41,7 @@ def make_response(success, data=None, message=None, status_code=200, error_code=
         k: v for k, v in extras.items()
         if k not in ('total', 'page', 'limit', 'total_pages', 'has_prev', 'has_next')
     })
-    return jsonify(payload), status_code
+    return json_response(payload, status_code)
 
 @message_bp.route('', methods=['POST'])
 def post_message():
@@ -48,7 +54,7 @@ def post_message():
                              error_code='INVALID_JSON')
     try:
         # Delegate creation and validation to service layer
-        msg = service.create_message(payload)
+        msg = service().create_message(payload)
         return make_response(True,
                              data=msg,
                              message='Message posted successfully.',
@@ -72,8 +78,124 @@ def post_message():
                              status_code=500,
                              error_code='SERVER_ERROR')
 
+@message_bp.route('/stream', methods=['GET'])
+def stream_messages():
+    # Server-Sent Events: a reconnecting EventSource sends the last id it
+    # saw as Last-Event-ID; plain clients may pass ?last_event_id=
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    if last_event_id is not None:
+        if not last_event_id.isdigit():
+            return make_response(False,
+                                 message='Last-Event-ID must be a message id.',
+                                 status_code=400,
+                                 error_code='INVALID_PARAMS')
+        last_event_id = int(last_event_id)
+    if service().subscribers() >= current_app.config['STREAM_MAX_CLIENTS']:
+        return make_response(False,
+                             message='Too many stream clients, try again later.',
+                             status_code=503,
+                             error_code='UNAVAILABLE')
+    sub, complete = service().subscribe(last_event_id)
+    # The generator runs after the request context is gone
+    heartbeat = current_app.config['STREAM_HEARTBEAT_SECONDS']
+
+    def events():
+        try:
+            # Reconnect quickly after the server ends the stream
+            yield b'retry: 1000\n\n'
+            if not complete:
+                # Some events after Last-Event-ID are no longer buffered;
+                # the client should refetch the board
+                yield f'event: gap\ndata: {{"last_event_id":{last_event_id}}}\n\n'.encode()
+            while True:
+                frames = sub.get(heartbeat)
+                if sub.lagged or sub.closed:
+                    # Fell too far behind: end the stream, the client
+                    # resumes from its last id
+                    return
+                yield b''.join(frames) if frames else b': keep-alive\n\n'
+        finally:
+            sub.close()
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@message_bp.route('/search', methods=['GET'])
+@conditional(lambda: service().etag())
+def search_messages():
+    q = request.args.get('q', '').strip()
+    if not q:
+        return make_response(False,
+                             message='Query param q is required.',
+                             status_code=400,
+                             error_code='INVALID_PARAMS')
+    try:
+        limit = int(request.args.get('limit', 20))
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return make_response(False,
+                             message='Query param limit must be a positive integer.',
+                             status_code=400,
+                             error_code='INVALID_PARAMS')
+    try:
+        msgs, total = service().search_messages(q, limit=limit)
+        return make_response(True,
+                             data=msgs,
+                             status_code=200,
+                             total=total,
+                             limit=limit)
+    except Exception as e:
+        return make_response(False,
+                             message=f"Internal server error: {e}",
+                             status_code=500,
+                             error_code='SERVER_ERROR')
+
+def get_messages_before(before):
+    # Cursor pagination: ?before=<id or ISO timestamp>&limit=<n>
+    try:
+        limit = int(request.args.get('limit', 20))
+        if limit < 1:
+            raise ValueError
+    except ValueError:
+        return make_response(False,
+                             message='Query param limit must be a positive integer.',
+                             status_code=400,
+                             error_code='INVALID_PARAMS')
+    cursor = int(before) if before.isdigit() else before
+    try:
+        msgs, total, has_next = service().get_messages_before(cursor, limit=limit)
+    except LookupError as e:
+        return make_response(False,
+                             message=str(e),
+                             status_code=404,
+                             error_code='NOT_FOUND')
+    except ValueError:
+        return make_response(False,
+                             message='Query param before must be a message id or ISO 8601 timestamp.',
+                             status_code=400,
+                             error_code='INVALID_PARAMS')
+    except Exception as e:
+        return make_response(False,
+                             message=f"Internal server error: {e}",
+                             status_code=500,
+                             error_code='SERVER_ERROR')
+    # Hand back the cursor for the next (older) slice
+    return make_response(True,
+                         data=msgs,
+                         status_code=200,
+                         total=total,
+                         limit=limit,
+                         has_next=has_next,
+                         next_before=msgs[-1].id if has_next and msgs else None)
+
 @message_bp.route('', methods=['GET'])
+@conditional(lambda: service().etag())
 def get_messages():
+    before = request.args.get('before')
+    if before is not None:
+        return get_messages_before(before)
+
     # Parse and validate pagination params
     try:
         page = int(request.args.get('page', 1))
@@ -87,7 +209,7 @@ def get_messages():
                              error_code='INVALID_PARAMS')
 
     try:
-        msgs, total = service.get_messages(page=page, limit=limit)
+        msgs, total = service().get_messages(page=page, limit=limit)
         total_pages = ceil(total / limit) if total else 1
 
         # Handle page out-of-range
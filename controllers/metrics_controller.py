@@ -0,0 +1,46 @@
+# metrics_controller.py
+import time
+from flask import Blueprint, Response, request
+from metrics import registry, HTTP_REQUEST_SECONDS, HTTP_REQUEST_BYTES, HTTP_RESPONSE_BYTES
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    # Prometheus text exposition format
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def start_timer():
+    """
+    before_request hook: note when handling started.
+    """
+    request.environ['metrics.started'] = time.perf_counter()
+
+
+def record_request(resp):
+    """
+    after_request hook, registered before any other so it runs last and
+    sees the final (compressed) response. Requests are grouped by route
+    pattern ('/books/id=<int:book_id>'), never by raw path, to keep the
+    number of series bounded.
+    """
+    # Resolve the request proxy once; each access through it costs a lookup
+    req = request._get_current_object()
+    environ = req.environ
+    started = environ.pop('metrics.started', None)
+    if started is None:
+        return resp
+    rule = req.url_rule
+    route = rule.rule if rule is not None else 'unmatched'
+    method = environ['REQUEST_METHOD']
+    HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started,
+                                 method=method, route=route, status=resp.status_code)
+    received = environ.get('CONTENT_LENGTH')
+    if received and received.isdigit():
+        HTTP_REQUEST_BYTES.inc(int(received), method=method, route=route)
+    sent = resp.content_length
+    if sent:
+        HTTP_RESPONSE_BYTES.inc(sent, method=method, route=route)
+    return resp
@@ -0,0 +1,83 @@
+# profiler.py
+import os
+import sys
+import threading
+from collections import Counter
+from flask import Response, current_app, g, request
+
+
+class StackSampler:
+    """
+    Sampling profiler for one thread: a background thread records the
+    target's call stack every 'interval' seconds. Stacks are kept in the
+    folded format ('outer;inner;leaf count') that flamegraph.pl and
+    speedscope read directly.
+    """
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[self._fold(frame)] += 1
+
+    @staticmethod
+    def _fold(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            # Function start line, not the current one, so samples in the
+            # same function merge into one frame
+            names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        names.reverse()
+        return ';'.join(names)
+
+
+def _requested():
+    # Checked on every request while profiling is enabled, so it reads the
+    # raw environ instead of parsing the query string
+    environ = request.environ
+    return (environ.get('HTTP_X_PROFILE') == '1'
+            or '__profile=1' in environ.get('QUERY_STRING', ''))
+
+
+def start_profile():
+    """
+    before_request hook (only installed when PROFILING_ENABLED is set):
+    sample this request if it asks for it.
+    """
+    if _requested():
+        g.profiler = StackSampler(threading.get_ident(), current_app.config['PROFILE_INTERVAL_MS'] / 1000)
+        g.profiler.start()
+
+
+def finish_profile(resp):
+    """
+    after_request hook: replace a profiled request's response with its
+    folded stacks, most frequent first.
+    """
+    sampler = g.pop('profiler', None)
+    if sampler is None:
+        return resp
+    stacks = sampler.stop()
+    body = ''.join(f'{stack} {count}\n' for stack, count in stacks.most_common())
+    return Response(body, mimetype='text/plain', headers={
+        'X-Profile-Samples': str(sum(stacks.values())),
+        'X-Profile-Interval-Ms': f"{current_app.config['PROFILE_INTERVAL_MS']:g}",
+        'X-Profiled-Status': str(resp.status_code),
+        'Cache-Control': 'no-store',
+    })
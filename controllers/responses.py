@@ -0,0 +1,113 @@
+# responses.py
+import json
+import gzip
+import time
+from datetime import datetime
+from flask import Response, current_app, request
+import config
+from metrics import SERIALIZE_SECONDS
+
+# Optional fast encoders; the stdlib is used when they are not installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _default(obj):
+    # orjson calls this for each model as it reaches it, so a list
+    # response never holds a second, fully materialized list of dicts
+    to_dict = getattr(obj, 'to_dict', None)
+    if to_dict is not None:
+        return to_dict()
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+def _materialize(obj):
+    # The stdlib's C encoder is faster on plain dicts than calling back into
+    # a Python default() hook per object, so convert models up front there
+    if isinstance(obj, dict):
+        return {k: _materialize(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_materialize(v) for v in obj]
+    to_dict = getattr(obj, 'to_dict', None)
+    return to_dict() if to_dict is not None else obj
+
+
+_stdlib_encoder = json.JSONEncoder(default=_default, separators=(',', ':'))
+
+
+def dumps(obj):
+    """
+    Encode 'obj' (which may contain model objects) to JSON bytes, with
+    orjson when available.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=_default)
+        except TypeError:
+            # e.g. integers beyond 64 bits; the stdlib handles those
+            pass
+    return _stdlib_encoder.encode(_materialize(obj)).encode('utf-8')
+
+
+def utc_timestamp():
+    # The trailing 'Z' indicates UTC time
+    return datetime.utcnow().isoformat() + 'Z'
+
+
+def json_response(payload, status_code=200, headers=None):
+    """
+    Build a Flask Response from a payload that may contain model objects.
+    """
+    if config.METRICS_ENABLED:
+        start = time.perf_counter()
+        body = dumps(payload)
+        SERIALIZE_SECONDS.observe(time.perf_counter() - start)
+    else:
+        body = dumps(payload)
+    return Response(body, status=status_code, headers=headers, mimetype='application/json')
+
+
+def _negotiate_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_response(resp):
+    """
+    after_request hook: compress JSON bodies larger than
+    COMPRESS_MIN_SIZE with br or gzip, as negotiated via Accept-Encoding.
+    """
+    if (resp.direct_passthrough or resp.is_streamed
+            or resp.status_code < 200 or resp.status_code in (204, 304)
+            or 'Content-Encoding' in resp.headers
+            or resp.mimetype != 'application/json'):
+        return resp
+    resp.vary.add('Accept-Encoding')
+    settings = current_app.config
+    if resp.content_length is None or resp.content_length < settings['COMPRESS_MIN_SIZE']:
+        return resp
+    encoding = _negotiate_encoding()
+    if encoding is None:
+        return resp
+    body = resp.get_data()
+    if encoding == 'br':
+        resp.set_data(brotli.compress(body, quality=settings['COMPRESS_LEVEL']))
+    else:
+        resp.set_data(gzip.compress(body, compresslevel=settings['COMPRESS_LEVEL']))
+    resp.headers['Content-Encoding'] = encoding
+    # The compressed bytes differ from the identity ones: weaken the ETag
+    etag, weak = resp.get_etag()
+    if etag and not weak:
+        resp.set_etag(etag, weak=True)
+    return resp
@@ -0,0 +1,223 @@
+# metrics.py
+"""
+In-process metrics in the Prometheus text format.
+
+Counters and histograms are created once at import time and updated
+from the request hooks, the services and the storage backends; GET
+/metrics renders the registry. Values are per process: with several
+workers, scrape each one (or aggregate in Prometheus).
+
+Set METRICS_ENABLED=0 to skip the instrumentation entirely; the
+registry still renders, just without request and service samples.
+"""
+import time
+import threading
+from bisect import bisect_left
+from functools import wraps
+import config
+
+# Seconds; fine-grained at the low end where in-memory reads sit
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """
+    Monotonic counter, one value per combination of label values.
+    """
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple([labels[name] for name in self.label_names])
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(tuple(labels[name] for name in self.label_names), 0)
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in sorted(items):
+            yield f'{self.name}{_labels(self.label_names, key)} {_number(value)}'
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram (cumulated only when rendered).
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        self._observe(tuple([labels[name] for name in self.label_names]), value)
+
+    def _observe(self, key, value):
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][slot] += 1
+            series[1] += value
+
+    def time(self, **labels):
+        """
+        Decorator observing the wrapped function's duration.
+        """
+        key = tuple(labels[name] for name in self.label_names)
+        observe = self._observe
+        perf_counter = time.perf_counter
+
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                start = perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    observe(key, perf_counter() - start)
+            return wrapper
+        return decorator
+
+    def count(self, **labels):
+        series = self._series.get(tuple(labels[name] for name in self.label_names))
+        return sum(series[0]) if series else 0
+
+    def samples(self):
+        with self._lock:
+            items = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        for key, counts, total in sorted(items):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f'{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}'
+            yield f'{self.name}_sum{_labels(self.label_names, key)} {_number(total)}'
+            yield f'{self.name}_count{_labels(self.label_names, key)} {cumulative}'
+
+
+class CallbackMetric:
+    """
+    Gauge or counter whose value is read from a callback at scrape time,
+    for numbers other objects already keep. The callback returns a
+    number, or a list of (label values, number) pairs.
+    """
+    def __init__(self, name, documentation, callback, labels=(), kind='gauge'):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.callback = callback
+        self.kind = kind
+
+    def samples(self):
+        value = self.callback()
+        if not isinstance(value, list):
+            value = [((), value)]
+        for key, number in value:
+            yield f'{self.name}{_labels(self.label_names, key)} {_number(number)}'
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _add(self, metric):
+        with self._lock:
+            # Re-registering (e.g. a module reloaded) keeps the first one
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labels=()):
+        return self._add(Counter(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, documentation, labels, buckets))
+
+    def gauge(self, name, documentation, callback, labels=()):
+        return self._add(CallbackMetric(name, documentation, callback, labels))
+
+    def counter_callback(self, name, documentation, callback, labels=()):
+        return self._add(CallbackMetric(name, documentation, callback, labels, kind='counter'))
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format (0.0.4).
+        """
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', 'Time spent handling HTTP requests.', ('method', 'route', 'status'))
+HTTP_REQUEST_BYTES = registry.counter(
+    'http_request_bytes_total', 'Request body bytes received.', ('method', 'route'))
+HTTP_RESPONSE_BYTES = registry.counter(
+    'http_response_bytes_total', 'Response body bytes sent (after compression).', ('method', 'route'))
+SERVICE_CALL_SECONDS = registry.histogram(
+    'service_call_duration_seconds', 'Time spent in service methods.', ('service', 'method'))
+SERIALIZE_SECONDS = registry.histogram(
+    'json_serialize_duration_seconds', 'Time spent encoding JSON response bodies.')
+STORAGE_BYTES_READ = registry.counter(
+    'storage_read_bytes_total', 'Bytes read from storage (JSON text length for SQLite).', ('backend', 'store'))
+STORAGE_BYTES_WRITTEN = registry.counter(
+    'storage_written_bytes_total', 'Bytes written to storage (JSON text length for SQLite).', ('backend', 'store'))
+
+
+def instrument(service_name, also=()):
+    """
+    Class decorator: time every public method of a service, plus the
+    private ones named in 'also', into SERVICE_CALL_SECONDS.
+    A no-op when METRICS_ENABLED is off.
+    """
+    def decorator(cls):
+        if not config.METRICS_ENABLED:
+            return cls
+        for name, func in list(vars(cls).items()):
+            if not callable(func) or isinstance(func, type):
+                continue
+            if name.startswith('_') and name not in also:
+                continue
+            setattr(cls, name, SERVICE_CALL_SECONDS.time(service=service_name, method=name)(func))
+        return cls
+    return decorator
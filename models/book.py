@@ -3,6 +3,9 @@ class Book:
     """
     Domain model for a Book.
     """
+    # No per-instance __dict__: keeps each record small
+    __slots__ = ('id', 'title', 'author', 'year', 'available')
+
     def __init__(self, id, title, author, year, available=True):
         self.id = id
         self.title = title
@@ -0,0 +1,395 @@
+# columnar.py
+"""
+Column-oriented in-memory stores for the hot read path.
+
+Instead of one Python object per record, fields are kept in parallel
+columns: packed arrays for integers, floats and flags, and plain lists
+for strings, with repeated strings (authors, usernames) interned. Reads
+hand out small views (two slots: the column set and a row number) that
+behave like Book / Message objects and are only created on demand.
+
+Rows are never changed in place. An update appends a new row and a
+delete just forgets the row; compaction builds a fresh column set. A
+view therefore keeps showing the data it was created for even after the
+store moves on, so a list of views taken under a read lock can safely
+be serialized after the lock is released.
+"""
+import sys
+from array import array
+from datetime import datetime, timedelta
+
+_INT64_MIN = -2 ** 63
+_INT64_MAX = 2 ** 63 - 1
+
+# Rebuild the columns once this many dead rows pile up (and they
+# outnumber the live ones)
+_COMPACT_MIN_DEAD = 1024
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def format_micros(micros):
+    """
+    UTC epoch microseconds -> created_at string in the format Message
+    generates (datetime.utcnow().isoformat() + 'Z').
+    """
+    return (_EPOCH + timedelta(microseconds=micros)).isoformat() + 'Z'
+
+
+class IntColumn:
+    """
+    Packed 64-bit integers. Anything else (None, strings, floats, huge
+    ints) is kept in a side dict keyed by row.
+    """
+    __slots__ = ('values', 'other')
+
+    def __init__(self):
+        self.values = array('q')
+        self.other = {}
+
+    def append(self, value):
+        if type(value) is int and _INT64_MIN <= value <= _INT64_MAX:
+            self.values.append(value)
+        else:
+            self.other[len(self.values)] = value
+            self.values.append(0)
+
+    def __getitem__(self, row):
+        if self.other and row in self.other:
+            return self.other[row]
+        return self.values[row]
+
+
+class FlagColumn:
+    """
+    Booleans packed one byte per row; non-boolean values go to a side dict.
+    """
+    __slots__ = ('values', 'other')
+
+    def __init__(self):
+        self.values = array('b')
+        self.other = {}
+
+    def append(self, value):
+        if value is True or value is False:
+            self.values.append(1 if value else 0)
+        else:
+            self.other[len(self.values)] = value
+            self.values.append(2)
+
+    def __getitem__(self, row):
+        flag = self.values[row]
+        if flag == 2:
+            return self.other[row]
+        return flag == 1
+
+
+class _BookColumns:
+    __slots__ = ('ids', 'titles', 'authors', 'years', 'available')
+
+    def __init__(self):
+        self.ids = array('q')
+        self.titles = []
+        self.authors = []
+        self.years = IntColumn()
+        self.available = FlagColumn()
+
+    def append(self, book):
+        row = len(self.ids)
+        self.ids.append(book.id)
+        self.titles.append(book.title)
+        self.authors.append(_intern(book.author))
+        self.years.append(book.year)
+        self.available.append(book.available)
+        return row
+
+
+class BookView:
+    """
+    Read-only, Book-like view of one row in a BookTable.
+    """
+    __slots__ = ('_cols', '_row')
+
+    def __init__(self, cols, row):
+        self._cols = cols
+        self._row = row
+
+    @property
+    def id(self):
+        return self._cols.ids[self._row]
+
+    @property
+    def title(self):
+        return self._cols.titles[self._row]
+
+    @property
+    def author(self):
+        return self._cols.authors[self._row]
+
+    @property
+    def year(self):
+        return self._cols.years[self._row]
+
+    @property
+    def available(self):
+        return self._cols.available[self._row]
+
+    def to_dict(self):
+        # Column lookups inlined: this runs once per book in list responses
+        cols, row = self._cols, self._row
+        years, flags = cols.years, cols.available
+        flag = flags.values[row]
+        return {
+            'id': cols.ids[row],
+            'title': cols.titles[row],
+            'author': cols.authors[row],
+            'year': years.other[row] if years.other and row in years.other else years.values[row],
+            'available': flags.other[row] if flag == 2 else flag == 1
+        }
+
+
+class BookTable:
+    """
+    id -> book mapping stored column-wise. Supports the dict operations
+    BookService needs; reads return BookView objects, writes take any
+    Book-like object. Iteration follows first insertion of each id.
+    """
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._cols = _BookColumns()
+        self._row_of = {}
+
+    def __len__(self):
+        return len(self._row_of)
+
+    def __contains__(self, book_id):
+        return book_id in self._row_of
+
+    def __iter__(self):
+        return iter(self._row_of)
+
+    def get(self, book_id, default=None):
+        row = self._row_of.get(book_id)
+        if row is None:
+            return default
+        return BookView(self._cols, row)
+
+    def __getitem__(self, book_id):
+        return BookView(self._cols, self._row_of[book_id])
+
+    def __setitem__(self, book_id, book):
+        self._row_of[book_id] = self._cols.append(book)
+        self._maybe_compact()
+
+    def pop(self, book_id, default=None):
+        row = self._row_of.pop(book_id, None)
+        if row is None:
+            return default
+        view = BookView(self._cols, row)
+        self._maybe_compact()
+        return view
+
+    def values(self):
+        cols = self._cols
+        return (BookView(cols, row) for row in self._row_of.values())
+
+    def _maybe_compact(self):
+        dead = len(self._cols.ids) - len(self._row_of)
+        if dead < _COMPACT_MIN_DEAD or dead < len(self._row_of):
+            return
+        # Fresh columns; views handed out earlier keep the old ones alive
+        old = self._cols
+        self._cols = _BookColumns()
+        for book_id, row in self._row_of.items():
+            self._row_of[book_id] = self._cols.append(BookView(old, row))
+
+
+class _MessageColumns:
+    __slots__ = ('ts', 'ids', 'usernames', 'texts', 'created')
+
+    def __init__(self):
+        # ts: created_at as UTC epoch microseconds
+        self.ts = array('q')
+        self.ids = array('q')
+        self.usernames = []
+        self.texts = []
+        # created_at strings that format_micros(ts) would not reproduce
+        # exactly (other offsets or precision); None for the usual case
+        self.created = []
+
+    def append(self, msg, ts):
+        self.ts.append(ts)
+        self.ids.append(msg.id)
+        self.usernames.append(_intern(msg.username))
+        self.texts.append(msg.message)
+        self.created.append(None if format_micros(ts) == msg.created_at else msg.created_at)
+
+    def created_at(self, row):
+        created = self.created[row]
+        return format_micros(self.ts[row]) if created is None else created
+
+    def slice(self, start, end):
+        """
+        New column set holding rows [start, end).
+        """
+        cols = _MessageColumns()
+        cols.ts = self.ts[start:end]
+        cols.ids = self.ids[start:end]
+        cols.usernames = self.usernames[start:end]
+        cols.texts = self.texts[start:end]
+        cols.created = self.created[start:end]
+        return cols
+
+    def extend(self, other):
+        self.ts.extend(other.ts)
+        self.ids.extend(other.ids)
+        self.usernames.extend(other.usernames)
+        self.texts.extend(other.texts)
+        self.created.extend(other.created)
+
+
+class MessageView:
+    """
+    Read-only, Message-like view of one row in a MessageTable.
+    """
+    __slots__ = ('_cols', '_row')
+
+    def __init__(self, cols, row):
+        self._cols = cols
+        self._row = row
+
+    @property
+    def id(self):
+        return self._cols.ids[self._row]
+
+    @property
+    def username(self):
+        return self._cols.usernames[self._row]
+
+    @property
+    def message(self):
+        return self._cols.texts[self._row]
+
+    @property
+    def created_at(self):
+        return self._cols.created_at(self._row)
+
+    def to_dict(self):
+        cols, row = self._cols, self._row
+        return {
+            'id': cols.ids[row],
+            'username': cols.usernames[row],
+            'message': cols.texts[row],
+            'created_at': cols.created_at(row)
+        }
+
+
+class MessageTable:
+    """
+    Messages stored column-wise and kept sorted by (timestamp, id), where
+    the timestamp is the parsed created_at as UTC epoch microseconds.
+    Inserting the newest message is an append; the rare out-of-order
+    insert (clock skew, imported data) rebuilds the columns.
+    """
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._cols = _MessageColumns()
+        self._row_of = {}
+
+    def __len__(self):
+        return len(self._cols.ids)
+
+    def key_at(self, row):
+        return (self._cols.ts[row], self._cols.ids[row])
+
+    def key_of(self, msg_id):
+        """
+        Sort key of a message by id, or None if unknown.
+        """
+        row = self._row_of.get(msg_id)
+        return None if row is None else self.key_at(row)
+
+    def bisect_left(self, key):
+        """
+        Row of the first message whose key is >= 'key'.
+        """
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def bisect_right(self, key):
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if key < self.key_at(mid):
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def insert(self, msg, ts):
+        pos = self.bisect_right((ts, msg.id))
+        if pos == len(self):
+            self._cols.append(msg, ts)
+            self._row_of[msg.id] = pos
+            return
+        # Out of order: rebuild instead of shifting rows under live views
+        cols = self._cols.slice(0, pos)
+        cols.append(msg, ts)
+        cols.extend(self._cols.slice(pos, len(self)))
+        self._cols = cols
+        self._reindex(pos)
+
+    def _reindex(self, start=0):
+        ids = self._cols.ids
+        for row in range(start, len(ids)):
+            self._row_of[ids[row]] = row
+
+    def load(self, rows):
+        """
+        Replace the contents with (ts, msg) pairs, sorted here.
+        """
+        self.clear()
+        for ts, msg in sorted(rows, key=lambda pair: (pair[0], pair[1].id)):
+            self._cols.append(msg, ts)
+        self._reindex()
+
+    def drop_oldest(self, count):
+        """
+        Remove the first 'count' rows. Builds new columns, so views of
+        the dropped rows stay readable.
+        """
+        dropped = self._cols.ids[:count]
+        self._cols = self._cols.slice(count, len(self))
+        for msg_id in dropped:
+            del self._row_of[msg_id]
+        self._reindex()
+
+    def get(self, msg_id):
+        row = self._row_of.get(msg_id)
+        return None if row is None else MessageView(self._cols, row)
+
+    def slice(self, start, end):
+        """
+        Views of rows [start, end), oldest first.
+        """
+        cols = self._cols
+        return [MessageView(cols, row) for row in range(start, min(end, len(cols.ids)))]
+
+    def values(self):
+        cols = self._cols
+        return (MessageView(cols, row) for row in range(len(cols.ids)))
@@ -5,6 +5,9 @@ class Message:
     """
     Domain model for a Message in the message board.
     """
+    # No per-instance __dict__: keeps each record small
+    __slots__ = ('id', 'username', 'message', 'created_at')
+
     def __init__(self, id, username, message, created_at=None):
         self.id = id
         self.username = username
@@ -0,0 +1,34 @@
+# async_service.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import config
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def io_executor():
+    """
+    Process-wide thread pool for blocking work (file and SQLite I/O,
+    request handlers in ASGI mode), sized by config.IO_WORKERS so a burst
+    of requests queues up instead of spawning a thread each.
+    """
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=config.IO_WORKERS,
+                                               thread_name_prefix='io')
+    return _executor
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Await func(*args, **kwargs) run on the I/O executor.
+    """
+    # Only asyncio callers get here; keeps asyncio out of WSGI startup
+    import asyncio
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor(), partial(func, *args, **kwargs))
+
@@ -0,0 +1,270 @@
+# book_index.py
+from bisect import bisect_left, bisect_right, insort
+from itertools import accumulate, chain
+
+
+def _author_key(author):
+    # Author lookups are exact but case-insensitive
+    return str(author).casefold() if author is not None else None
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def sort_value(value):
+    """
+    Sort key that keeps mixed-type columns orderable (e.g. a year sent as
+    a string): numbers first, then other values grouped by type, None last.
+    """
+    if value is None:
+        return (2, '', 0)
+    if _is_number(value):
+        return (0, '', value)
+    return (1, type(value).__name__, value)
+
+
+class SortedBlocks:
+    """
+    Sorted list kept as a list of short sorted blocks, so adding or
+    removing a value shifts one block rather than the tail of the whole
+    list; a batch of k changes costs O(k) block moves whatever the size
+    of the catalog. Supports what the catalog reads from a sorted list:
+    len(), iteration, and indexing and slicing by position (slices are
+    plain lists), so the bisect module works on it as well. islice()
+    walks a range of positions in either direction without copying it.
+    """
+    BLOCK = 1000
+
+    def __init__(self, values=()):
+        values = sorted(values)
+        size = self.BLOCK
+        self._blocks = [values[i:i + size] for i in range(0, len(values), size)]
+        self._maxes = [block[-1] for block in self._blocks]
+        self._len = len(values)
+        # Cumulative block ends, rebuilt on the first positional read after a change
+        self._ends = None
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        return chain.from_iterable(self._blocks)
+
+    def add(self, value):
+        blocks, maxes = self._blocks, self._maxes
+        self._len += 1
+        self._ends = None
+        if not blocks:
+            blocks.append([value])
+            maxes.append(value)
+            return
+        i = bisect_left(maxes, value)
+        if i == len(maxes):
+            i -= 1
+            blocks[i].append(value)
+            maxes[i] = value
+        else:
+            insort(blocks[i], value)
+        block = blocks[i]
+        if len(block) > 2 * self.BLOCK:
+            half = len(block) // 2
+            blocks[i:i + 1] = [block[:half], block[half:]]
+            maxes[i:i + 1] = [block[half - 1], block[-1]]
+
+    def remove(self, value):
+        """
+        Remove 'value' if present.
+        """
+        blocks, maxes = self._blocks, self._maxes
+        i = bisect_left(maxes, value)
+        if i == len(maxes):
+            return
+        block = blocks[i]
+        pos = bisect_left(block, value)
+        if block[pos] != value:
+            return
+        del block[pos]
+        self._len -= 1
+        self._ends = None
+        if not block:
+            del blocks[i]
+            del maxes[i]
+        elif pos == len(block):
+            maxes[i] = block[-1]
+        if 0 < len(block) < self.BLOCK // 4 and i + 1 < len(blocks):
+            # Fold a block emptied by deletes into the next one
+            blocks[i + 1][:0] = block
+            del blocks[i]
+            del maxes[i]
+
+    def _locate(self, index):
+        if self._ends is None:
+            self._ends = list(accumulate(len(block) for block in self._blocks))
+        i = bisect_right(self._ends, index)
+        return i, index - (self._ends[i - 1] if i else 0)
+
+    def islice(self, start=0, stop=None, reverse=False):
+        """
+        Iterate over the values at positions start..stop-1, from the last
+        one down if 'reverse'.
+        """
+        stop = self._len if stop is None else min(stop, self._len)
+        remaining = stop - start
+        if remaining <= 0:
+            return
+        blocks = self._blocks
+        if reverse:
+            i, pos = self._locate(stop - 1)
+            while remaining > 0:
+                lo = max(pos + 1 - remaining, 0)
+                yield from reversed(blocks[i][lo:pos + 1])
+                remaining -= pos + 1 - lo
+                i -= 1
+                pos = len(blocks[i]) - 1
+        else:
+            i, pos = self._locate(start)
+            while remaining > 0:
+                chunk = blocks[i][pos:pos + remaining]
+                yield from chunk
+                remaining -= len(chunk)
+                i, pos = i + 1, 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return list(self)[index]
+            items = []
+            if start >= stop:
+                return items
+            i, pos = self._locate(start)
+            while len(items) < stop - start:
+                items.extend(self._blocks[i][pos:pos + stop - start - len(items)])
+                i, pos = i + 1, 0
+            return items
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError('SortedBlocks index out of range')
+        i, pos = self._locate(index)
+        return self._blocks[i][pos]
+
+
+class BookIndexes:
+    """
+    Secondary indexes over the in-memory catalog, maintained by BookService
+    on every insert, update and delete:
+
+      - ids:          sorted list of all ids (default ordering, id cursors)
+      - by_author:    hash index author -> set of ids
+      - by_available: hash index True/False -> set of ids
+      - by_year:      sorted list of (year, id) for numeric years
+      - no_year:      set of ids whose year is not a number
+
+    The sorted lists are SortedBlocks; load() builds everything from the
+    full catalog with one sort per list.
+
+    query() intersects the matching id sets, smallest first, so the cost
+    follows the size of the result rather than the catalog.
+    """
+    def __init__(self):
+        self.ids = SortedBlocks()
+        self.by_author = {}
+        self.by_available = {True: set(), False: set()}
+        self.by_year = SortedBlocks()
+        self.no_year = set()
+        # id -> (author key, available, year) as currently indexed
+        self._entries = {}
+
+    def clear(self):
+        self.__init__()
+
+    def load(self, books):
+        """
+        Replace the indexes with ones over 'books' (unique ids).
+        """
+        self.clear()
+        entries = self._entries
+        by_author = self.by_author
+        by_available = self.by_available
+        years = []
+        for book in books:
+            entry = (_author_key(book.author), bool(book.available), book.year)
+            entries[book.id] = entry
+            by_author.setdefault(entry[0], set()).add(book.id)
+            by_available[entry[1]].add(book.id)
+            if _is_number(entry[2]):
+                years.append((entry[2], book.id))
+            else:
+                self.no_year.add(book.id)
+        self.ids = SortedBlocks(entries)
+        self.by_year = SortedBlocks(years)
+
+    def add(self, book):
+        if book.id in self._entries:
+            self.remove(book.id)
+        entry = (_author_key(book.author), bool(book.available), book.year)
+        self._entries[book.id] = entry
+        self.ids.add(book.id)
+        self.by_author.setdefault(entry[0], set()).add(book.id)
+        self.by_available[entry[1]].add(book.id)
+        if _is_number(entry[2]):
+            self.by_year.add((entry[2], book.id))
+        else:
+            self.no_year.add(book.id)
+
+    def remove(self, book_id):
+        entry = self._entries.pop(book_id, None)
+        if entry is None:
+            return
+        author, available, year = entry
+        self.ids.remove(book_id)
+        ids = self.by_author.get(author)
+        if ids is not None:
+            ids.discard(book_id)
+            if not ids:
+                del self.by_author[author]
+        self.by_available[available].discard(book_id)
+        if _is_number(year):
+            self.by_year.remove((year, book_id))
+        else:
+            self.no_year.discard(book_id)
+
+    def year_bounds(self, year_min=None, year_max=None):
+        """
+        Positions lo, hi in by_year of the pairs with
+        year_min <= year <= year_max.
+        """
+        lo = 0 if year_min is None else bisect_left(self.by_year, (year_min, float('-inf')))
+        hi = len(self.by_year) if year_max is None else bisect_right(self.by_year, (year_max, float('inf')))
+        return lo, hi
+
+    def year_range(self, year_min=None, year_max=None):
+        """
+        Slice of (year, id) pairs with year_min <= year <= year_max.
+        """
+        lo, hi = self.year_bounds(year_min, year_max)
+        return self.by_year[lo:hi]
+
+    def query(self, author=None, available=None, year_min=None, year_max=None):
+        """
+        Set of ids matching every given filter, or None when no filter
+        was given (meaning: the whole catalog).
+        """
+        candidates = []
+        if author is not None:
+            candidates.append(self.by_author.get(_author_key(author), set()))
+        if available is not None:
+            candidates.append(self.by_available[bool(available)])
+        if year_min is not None or year_max is not None:
+            candidates.append({book_id for _, book_id in self.year_range(year_min, year_max)})
+        if not candidates:
+            return None
+        candidates.sort(key=len)
+        result = set(candidates[0])
+        for ids in candidates[1:]:
+            result &= ids
+            if not result:
+                break
+        return result
@@ -1,34 +1,409 @@
 # book_service.py
-import os
-import json
+import config
+from metrics import instrument
+import heapq
+import secrets
+from contextlib import contextmanager
 from models.book import Book
+from models.columnar import BookTable
+from storage import create_backend
+from storage.group_commit import GroupCommit
+from storage.locks import RWLock, IdAllocator
+from storage.changelog import CHANGES_APPLIED, FULL_RELOADS, UNLOGGED_RELOADS
+from services.book_index import BookIndexes, sort_value
+from services.search_index import InvertedIndex
+from bisect import bisect_left, bisect_right
+from itertools import islice
 
+# Fields that GET /books can sort on and project
+BOOK_FIELDS = ('id', 'title', 'author', 'year', 'available')
+# Fields an update may change
+EDITABLE_FIELDS = ('title', 'author', 'year', 'available')
+
+
+class BatchError(ValueError):
+    """
+    A batch update or delete was rejected as a whole. 'errors' holds one
+    entry per failing item: its 1-based position, id, message and code.
+    """
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} of the items failed; nothing was changed.")
+        self.errors = errors
+
+
+class ImportAborted(Exception):
+    """
+    A streaming import failed partway. Batches before the failure are
+    committed and stay; 'summary' says how far the import got.
+    """
+    def __init__(self, summary):
+        super().__init__(f"Import stopped after {summary['created']} books were committed.")
+        self.summary = summary
+
+
+def _item_error(idx, book_id, message, error_code='VALIDATION_ERROR'):
+    return {'item': idx, 'id': book_id, 'error': message, 'error_code': error_code}
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+@instrument('books', also=('_load',))
 class BookService:
     """
-    Service layer: handles business logic and JSON file persistence,
-    including single and bulk book creation.
+    Service layer: handles business logic and persistence through a
+    storage backend, including single and bulk book creation.
+
+    The catalog is kept in memory in a column-wise table keyed by id and
+    written through to the backend on every change. Reads never touch storage
+    unless it was modified outside this process, in which case it is
+    reloaded once.
+
+    Every write bumps 'version'; each book also remembers the version it
+    last changed at. Together with a per-process epoch these form the
+    ETags used for conditional GETs.
+
+    Concurrency: reads share an in-process RW lock, writes take it
+    exclusively plus the backend's cross-process file lock, reload any
+    changes made by other workers, and only then allocate ids. Single
+    creates, updates and deletes are group-committed: concurrent ones
+    share one lock cycle and one backend commit.
+
+    With a shared ChangeLog ('change_log'), every commit is also appended
+    to it and writes by other workers are applied from it book by book
+    (and only the books they touched get new ETags) instead of reloading
+    the catalog whenever storage changed.
+
+    In json mode books default to the 'journal' backend (BOOK_STORAGE),
+    so a write appends its rows instead of rewriting books.json; see
+    MessageService.
+
+    'settings' maps the config keys above to values, e.g. an app's
+    config; by default they come from the config module.
     """
-    def __init__(self, json_path='data/books.json'):
-        self.json_path = json_path
-        # Ensure storage file exists; create directory and empty list if needed
-        if not os.path.exists(self.json_path):
-            os.makedirs(os.path.dirname(self.json_path), exist_ok=True)
-            with open(self.json_path, 'w', encoding='utf-8') as f:
-                json.dump([], f, indent=4)
-
-    def _read_books(self):
-        with open(self.json_path, 'r', encoding='utf-8') as f:
-            items = json.load(f)
-        # Convert each dict to a Book instance
-        return [Book.from_dict(item) for item in items]
-
-    def _write_books(self, books):
-        with open(self.json_path, 'w', encoding='utf-8') as f:
-            # Serialize each Book via to_dict()
-            json.dump([book.to_dict() for book in books], f, indent=4)
+    def __init__(self, json_path=None, storage=None, backend=None, sqlite_path=None, change_log=None,
+                 settings=None):
+        settings = settings if settings is not None else vars(config)
+        if backend is None:
+            storage = storage or settings['STORAGE_BACKEND']
+            if storage == 'json' and settings['BOOK_STORAGE'] == 'journal':
+                storage = 'journal'
+            backend = create_backend(storage, 'books', json_path or settings['BOOKS_JSON_PATH'], sqlite_path)
+        self.backend = backend
+        self._change_log = change_log
+        # Backend signature() as of the last change log entry applied or written
+        self._signature = None
+        # id -> book, stored column-wise; reads hand out BookView objects
+        self._books = BookTable()
+        self._index = BookIndexes()
+        # Full-text index; titles count double against author matches
+        self._search = InvertedIndex({'title': 2, 'author': 1})
+        self._ids = IdAllocator()
+        self._lock = RWLock()
+        # Versioning for ETags: restarts get a new epoch so old tags never match
+        self._epoch = secrets.token_hex(4)
+        self.version = 0
+        self._loaded_version = 0
+        self._changed_at = {}
+        self._writes = GroupCommit(self._writing, self._commit_changes, name='books')
+        self._load()
+
+    def _load(self):
+        """
+        (Re)build the in-memory index from the backend.
+        """
+        if self._change_log is not None:
+            self._change_log.start()
+            self._signature = self.backend.signature()
+        self._books.clear()
+        self._search.clear()
+        for item in self.backend.load():
+            book = Book.from_dict(item)
+            # A file edited by hand may repeat an id: the last one wins
+            self._search.add(book.id, book, self._books.get(book.id))
+            self._books[book.id] = book
+        self._index.load(self._books.values())
+        self._ids.observe(max(self._books, default=0))
+        self.version += 1
+        self._loaded_version = self.version
+        self._changed_at = {}
+
+    def _put(self, book):
+        # Store 'book' and index it, replacing any book with its id; the
+        # search index needs the old row to find its terms
+        old = self._books.get(book.id)
+        self._books[book.id] = book
+        self._index.add(book)
+        self._search.add(book.id, book, old)
+
+    def _drop(self, book_id):
+        old = self._books.pop(book_id)
+        if old is not None:
+            self._index.remove(book_id)
+            self._search.remove(book_id, old)
+
+    def _stale(self):
+        if self._change_log is not None:
+            return self._change_log.changed()
+        return self.backend.has_changed()
+
+    def _refresh(self):
+        # Caller holds the write lock
+        if self._change_log is None:
+            if self.backend.has_changed():
+                self._load()
+            return
+        entries = self._change_log.read()
+        if entries is None:
+            FULL_RELOADS.inc(store='books')
+            self._load()
+            return
+        entries = [entry for entry in entries if entry['store'] == 'books']
+        if not entries:
+            return
+        # One version for the whole catch-up: readers never see it half done
+        self.version += 1
+        for entry in entries:
+            for item in entry['upserts']:
+                book = Book.from_dict(item)
+                self._put(book)
+                self._changed_at[book.id] = self.version
+            for book_id in entry['deletes']:
+                self._drop(book_id)
+                self._changed_at.pop(book_id, None)
+            self._ids.observe(max((item['id'] for item in entry['upserts']), default=None))
+            self._signature = entry.get('sig')
+        CHANGES_APPLIED.inc(len(entries), store='books')
+
+    def _sync(self):
+        """
+        Catch up with writes made by other processes: from the change
+        log if there is one, else by reloading the catalog if storage was
+        edited from outside. Costs one stat() (or PRAGMA) call when
+        nothing changed.
+        """
+        if self._stale():
+            with self._lock.write():
+                self._refresh()
+
+    def catch_up(self, seq):
+        """
+        Apply the change log at least up to 'seq', whatever the poll
+        interval, so a client reading after its own write made through
+        another worker sees it.
+        """
+        log = self._change_log
+        if log is not None and log.seq < seq and log.changed(force=True):
+            with self._lock.write():
+                self._refresh()
+
+    def change_seq(self):
+        """
+        Change log position this service reflects (0 without a log).
+        """
+        log = self._change_log
+        return 0 if log is None else max(log.seq, log.written)
+
+    @contextmanager
+    def _writing(self):
+        """
+        Exclusive access for a read-modify-write cycle, across threads
+        and worker processes.
+        """
+        with self._lock.write(), self.backend.lock():
+            self._refresh()
+            if self._change_log is not None and self.backend.signature() != self._signature:
+                # Storage changed without a log entry: edited by hand, or
+                # a worker died between its commit and its append
+                UNLOGGED_RELOADS.inc(store='books')
+                self._load()
+            try:
+                yield
+            except BaseException:
+                # Storage failed mid-write: drop half-applied memory changes
+                self._load()
+                raise
+
+    def _flush(self, upserts=(), deletes=()):
+        self.version += 1
+        for book in upserts:
+            self._changed_at[book.id] = self.version
+        for book_id in deletes:
+            self._changed_at.pop(book_id, None)
+        records = [book.to_dict() for book in upserts]
+        self.backend.commit(
+            upserts=records,
+            deletes=deletes,
+            snapshot=lambda: (book.to_dict() for book in self._books.values())
+        )
+        if self._change_log is not None:
+            self._signature = self.backend.signature()
+            self._change_log.append('books', records, deletes, signature=self._signature)
+
+    def _commit_changes(self, changes):
+        # Called by the group commit with the write locks held;
+        # 'changes' maps id -> new book, or None once deleted
+        self._flush(upserts=[book for book in changes.values() if book is not None],
+                    deletes=[book_id for book_id, book in changes.items() if book is None])
 
     def get_all_books(self):
-        return [book.to_dict() for book in self._read_books()]
+        """
+        All books as Book-like views. Stored rows are never mutated in
+        place (updates write a new row), so the caller may serialize the
+        list after the lock is released.
+        """
+        self._sync()
+        with self._lock.read():
+            return list(self._books.values())
+
+    def collection_etag(self):
+        """
+        ETag for any view of the whole catalog; changes on every write.
+        """
+        self._sync()
+        return f'{self._epoch}-{self.version}'
+
+    def book_etag(self, book_id):
+        """
+        ETag for a single book, or None if it does not exist.
+        """
+        self._sync()
+        with self._lock.read():
+            if book_id not in self._books:
+                return None
+            return f'{self._epoch}-{book_id}-{self._changed_at.get(book_id, self._loaded_version)}'
+
+    def query_books(self, author=None, available=None, year_min=None, year_max=None,
+                    sort='id', descending=False, page=1, limit=None, after=None, fields=None):
+        """
+        Filtered, sorted and paginated view of the catalog.
+
+        Filters are answered from the secondary indexes. 'after' is an id
+        cursor and only valid with sort='id'; otherwise 'page'/'limit'
+        select the slice. 'fields' projects each book onto those keys.
+        Items are book views, or dicts when 'fields' is given.
+        Returns (items, total matching, id to pass as 'after' for the
+        next page or None on the last one).
+        """
+        if sort not in BOOK_FIELDS:
+            raise ValueError(f"Cannot sort by '{sort}'.")
+        if after is not None and sort != 'id':
+            raise ValueError("Cursor 'after' requires sort=id.")
+        self._sync()
+        with self._lock.read():
+            index = self._index
+            matched = index.query(author=author, available=available,
+                                  year_min=year_min, year_max=year_max)
+            total = len(index.ids) if matched is None else len(matched)
+            if sort == 'id':
+                # Whole catalog in id order is kept by the index already;
+                # a filtered set sorts fast as plain ints
+                ordered = index.ids if matched is None else sorted(matched)
+
+                # Work out the slice in ascending order, then flip it if
+                # needed, so descending pages never copy the whole ordering
+                if after is not None:
+                    if descending:
+                        end = bisect_left(ordered, after)
+                        start = max(end - limit, 0) if limit else 0
+                    else:
+                        start = bisect_right(ordered, after)
+                        end = start + limit if limit else total
+                else:
+                    skip = (page - 1) * limit if limit else 0
+                    count = limit or total
+                    if descending:
+                        end = max(total - skip, 0)
+                        start = max(end - count, 0)
+                    else:
+                        start = skip
+                        end = start + count
+                selected = ordered[start:end]
+                if descending:
+                    selected.reverse()
+                more = start > 0 if descending else end < total
+            else:
+                skip = (page - 1) * limit if limit else 0
+                count = limit or total
+                selected = self._sorted_page(matched, sort, descending, skip, count, year_min, year_max)
+                more = skip + count < total
+            next_after = selected[-1] if selected and more else None
+
+            if not fields:
+                return [self._books[book_id] for book_id in selected], total, next_after
+            items = []
+            for book_id in selected:
+                data = self._books[book_id].to_dict()
+                items.append({f: data[f] for f in fields if f in data})
+            return items, total, next_after
+
+    def _sorted_page(self, matched, sort, descending, skip, count, year_min=None, year_max=None):
+        """
+        Ids at positions skip..skip+count-1 when the catalog, or the
+        'matched' ids, are ordered by (sort field, id), reversed if
+        'descending'. Year is walked in its index; other fields pick the
+        page with a heap of skip+count entries instead of sorting every
+        match. Caller holds the read lock.
+        """
+        index, books = self._index, self._books
+        if sort == 'year':
+            if matched is None:
+                lo, hi = 0, len(index.by_year)
+            else:
+                lo, hi = index.year_bounds(year_min, year_max)
+            # A few matches among many years sort faster than a walk past them
+            if matched is None or len(matched) * 8 >= hi - lo:
+                return self._year_page(matched, descending, skip, count, lo, hi)
+        ids = index.ids if matched is None else matched
+        key = lambda i: (sort_value(getattr(books[i], sort)), i)
+        end = skip + count
+        if end >= len(ids):
+            page = sorted(ids, key=key, reverse=descending)
+        elif descending:
+            page = heapq.nlargest(end, ids, key=key)
+        else:
+            page = heapq.nsmallest(end, ids, key=key)
+        return page[skip:end]
+
+    def _year_page(self, matched, descending, skip, count, lo, hi):
+        """
+        _sorted_page() for sort='year', walking by_year[lo:hi] in order.
+        Books without a numeric year come after all the numeric ones.
+        """
+        index, books = self._index, self._books
+        others = index.no_year if matched is None else index.no_year & matched
+        others = sorted(others, key=lambda i: (sort_value(books[i].year), i), reverse=descending)
+        numeric = (len(index.ids) if matched is None else len(matched)) - len(others)
+
+        def walk(skip, count):
+            if matched is None:
+                # Every pair is on the page's ordering: start at the position
+                pairs = (index.by_year.islice(lo, hi - skip, reverse=True) if descending
+                         else index.by_year.islice(lo + skip, hi))
+                return [book_id for _, book_id in islice(pairs, count)]
+            pairs = index.by_year.islice(lo, hi, reverse=descending)
+            return list(islice((book_id for _, book_id in pairs if book_id in matched), skip, skip + count))
+
+        if descending:
+            page = others[skip:skip + count]
+            skip = max(skip - len(others), 0)
+            if len(page) < count and skip < numeric:
+                page += walk(skip, count - len(page))
+        else:
+            page = walk(skip, count) if skip < numeric else []
+            skip = max(skip - numeric, 0)
+            page += others[skip:skip + count - len(page)]
+        return page
+
+    def search_books(self, query, limit=20):
+        """
+        Ranked full-text search over titles and authors.
+        Returns (book views, total matching).
+        """
+        self._sync()
+        with self._lock.read():
+            ids, total = self._search.search(query, limit=limit)
+            return [self._books[book_id] for book_id in ids], total
 
     def create_book(self, data):
         """
@@ -41,19 +416,20 @@ class BookService:
             if field not in data:
                 raise KeyError(f"Missing required field: {field}")
 
-        books = self._read_books()
-        # Assign next sequential ID
-        new_id = max((book.id for book in books), default=0) + 1
-        book = Book(
-            id=new_id,
-            title=data['title'],
-            author=data['author'],
-            year=data['year'],
-            available=data.get('available', True)
-        )
-        books.append(book)
-        self._write_books(books)
-        return book.to_dict()
+        def create(changes):
+            # Assign next sequential ID
+            book = Book(
+                id=self._ids.allocate()[0],
+                title=data['title'],
+                author=data['author'],
+                year=data['year'],
+                available=data.get('available', True)
+            )
+            self._put(book)
+            changes[book.id] = book
+            return book
+
+        return self._writes.submit(create).to_dict()
 
     def create_books(self, data_list):
         """
@@ -64,10 +440,7 @@ class BookService:
         if not isinstance(data_list, list) or not data_list:
             raise ValueError("Input must be a non-empty list of book objects.")
 
-        books = self._read_books()
-        next_id = max((book.id for book in books), default=0) + 1
-        created = []
-
+        # Validate every item before mutating the in-memory catalog
         for idx, item in enumerate(data_list, start=1):
             if not isinstance(item, dict):
                 raise ValueError(f"Item #{idx} is not a JSON object.")
@@ -76,45 +449,230 @@ class BookService:
             if missing:
                 raise KeyError(f"Item #{idx} missing fields: {', '.join(missing)}")
 
-            book = Book(
-                id=next_id,
-                title=item['title'],
-                author=item['author'],
-                year=item['year'],
-                available=item.get('available', True)
-            )
-            books.append(book)
-            created.append(book.to_dict())
-            next_id += 1
+        def create(changes):
+            ids = self._ids.allocate(len(data_list))
+            books = []
+            for new_id, item in zip(ids, data_list):
+                book = Book(
+                    id=new_id,
+                    title=item['title'],
+                    author=item['author'],
+                    year=item['year'],
+                    available=item.get('available', True)
+                )
+                self._put(book)
+                changes[book.id] = book
+                books.append(book)
+            return books
+
+        return [book.to_dict() for book in self._writes.submit(create)]
 
-        self._write_books(books)
-        return created
+    def import_books(self, rows, batch_size=1000, max_errors=100):
+        """
+        Streaming bulk import. 'rows' is an iterable of (line_no, item)
+        pairs, where item is a dict or an Exception raised while parsing
+        that line. Valid items are persisted every 'batch_size' rows, each
+        batch in its own write, so memory stays bounded by the batch and
+        readers are only blocked per batch.
+        Invalid lines are skipped and reported; the import is not
+        all-or-nothing.
+        Returns a summary dict instead of the created records; if reading
+        or storing fails partway, ImportAborted carries the summary of
+        what was committed.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be a positive integer.")
+        summary = {
+            'received': 0,
+            'created': 0,
+            'failed': 0,
+            'first_id': None,
+            'last_id': None,
+            'errors': [],
+        }
+
+        def fail(line_no, error):
+            summary['failed'] += 1
+            if len(summary['errors']) < max_errors:
+                summary['errors'].append({'line': line_no, 'error': error})
+
+        def flush(batch):
+            with self._writing():
+                ids = self._ids.allocate(len(batch))
+                books = []
+                for new_id, item in zip(ids, batch):
+                    book = Book(
+                        id=new_id,
+                        title=item['title'],
+                        author=item['author'],
+                        year=item['year'],
+                        available=item.get('available', True)
+                    )
+                    self._put(book)
+                    books.append(book)
+                self._flush(upserts=books)
+            if summary['first_id'] is None:
+                summary['first_id'] = ids[0]
+            summary['last_id'] = ids[-1]
+            summary['created'] += len(batch)
+
+        batch = []
+        try:
+            for line_no, item in rows:
+                summary['received'] += 1
+                if isinstance(item, Exception):
+                    fail(line_no, str(item))
+                    continue
+                if not isinstance(item, dict):
+                    fail(line_no, "Line is not a JSON object.")
+                    continue
+                missing = [f for f in ('title', 'author', 'year') if f not in item]
+                if missing:
+                    fail(line_no, f"Missing fields: {', '.join(missing)}")
+                    continue
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    flush(batch)
+                    batch = []
+            if batch:
+                flush(batch)
+        except Exception as e:
+            summary['errors_truncated'] = summary['failed'] > len(summary['errors'])
+            raise ImportAborted(summary) from e
+
+        summary['errors_truncated'] = summary['failed'] > len(summary['errors'])
+        return summary
 
     def get_book_by_id(self, book_id):
-        for book in self._read_books():
-            if book.id == book_id:
-                return book.to_dict()
-        return None
+        self._sync()
+        with self._lock.read():
+            book = self._books.get(book_id)
+            return book.to_dict() if book else None
+
+    def _apply_update(self, current, data, changes):
+        # Update only provided fields; written as a new row so readers
+        # holding a view of the old one never see a half-applied update
+        book = Book(
+            id=current.id,
+            title=data.get('title', current.title),
+            author=data.get('author', current.author),
+            year=data.get('year', current.year),
+            available=data.get('available', current.available)
+        )
+        self._put(book)
+        changes[book.id] = book
+        return book
+
+    def _remove(self, book_id, changes):
+        self._drop(book_id)
+        changes[book_id] = None
+
+    def _check_ids(self, ids):
+        # Per-item errors for ids that no longer exist; write lock held
+        return [_item_error(idx, book_id, f"Book with id={book_id} not found.", 'NOT_FOUND')
+                for idx, book_id in enumerate(ids, start=1) if book_id not in self._books]
 
     def update_book(self, book_id, data):
-        books = self._read_books()
-        for idx, book in enumerate(books):
-            if book.id == book_id:
-                # Update only provided fields
-                book.title = data.get('title', book.title)
-                book.author = data.get('author', book.author)
-                book.year = data.get('year', book.year)
-                book.available = data.get('available', book.available)
-                books[idx] = book
-                self._write_books(books)
-                return book.to_dict()
-        return None
+        def update(changes):
+            current = self._books.get(book_id)
+            if current is None:
+                return None
+            return self._apply_update(current, data, changes).to_dict()
+
+        return self._writes.submit(update)
+
+    def update_books(self, updates):
+        """
+        Apply partial updates, each a dict with an 'id' and the fields to
+        change, as one transaction with a single persistence flush. Either
+        every item applies or none does: if any item is invalid or names
+        a missing book, BatchError lists the failing items.
+        Returns the updated book dicts, in request order.
+        """
+        if not isinstance(updates, list) or not updates:
+            raise ValueError("Input must be a non-empty list of updates.")
+        errors = []
+        seen = set()
+        for idx, item in enumerate(updates, start=1):
+            if not isinstance(item, dict):
+                errors.append(_item_error(idx, None, "Item is not a JSON object."))
+                continue
+            book_id = item.get('id')
+            if not _is_id(book_id):
+                errors.append(_item_error(idx, book_id, "Field 'id' must be an integer."))
+                continue
+            if book_id in seen:
+                errors.append(_item_error(idx, book_id, f"Duplicate id={book_id} in batch."))
+                continue
+            seen.add(book_id)
+            unknown = [f for f in item if f != 'id' and f not in EDITABLE_FIELDS]
+            if unknown:
+                errors.append(_item_error(idx, book_id, f"Unknown fields: {', '.join(unknown)}"))
+            elif len(item) == 1:
+                errors.append(_item_error(idx, book_id, "No fields to update."))
+        if errors:
+            raise BatchError(errors)
+
+        def update(changes):
+            missing = self._check_ids([item['id'] for item in updates])
+            if missing:
+                raise BatchError(missing)
+            return [self._apply_update(self._books[item['id']], item, changes) for item in updates]
+
+        return [book.to_dict() for book in self._writes.submit(update)]
 
     def delete_book(self, book_id):
-        books = self._read_books()
-        filtered = [book for book in books if book.id != book_id]
-        # Return False if no book was removed
-        if len(filtered) == len(books):
-            return False
-        self._write_books(filtered)
-        return True
+        def delete(changes):
+            # Return False if no book was removed
+            if book_id not in self._books:
+                return False
+            self._remove(book_id, changes)
+            return True
+
+        return self._writes.submit(delete)
+
+    def delete_books(self, ids=None, author=None, available=None, year_min=None, year_max=None):
+        """
+        Delete the books listed in 'ids', or every book matching the
+        filters (same meaning as in query_books()), as one transaction
+        with a single persistence flush. Listed ids are all-or-nothing:
+        if any is invalid or missing, BatchError lists them and nothing
+        is deleted. A filter matching nothing deletes nothing.
+        Returns the deleted ids.
+        """
+        filtered = any(value is not None for value in (author, available, year_min, year_max))
+        if ids is not None and filtered:
+            raise ValueError("Give either ids or filters, not both.")
+        if ids is None and not filtered:
+            # Never wipe the catalog by accident
+            raise ValueError("Give a list of ids or at least one filter.")
+        if ids is not None:
+            if not isinstance(ids, list) or not ids:
+                raise ValueError("Field 'ids' must be a non-empty list of ids.")
+            errors = []
+            seen = set()
+            for idx, book_id in enumerate(ids, start=1):
+                if not _is_id(book_id):
+                    errors.append(_item_error(idx, book_id, "Id must be an integer."))
+                    continue
+                if book_id in seen:
+                    errors.append(_item_error(idx, book_id, f"Duplicate id={book_id} in batch."))
+                    continue
+                seen.add(book_id)
+            if errors:
+                raise BatchError(errors)
+
+        def delete(changes):
+            if ids is not None:
+                missing = self._check_ids(ids)
+                if missing:
+                    raise BatchError(missing)
+                selected = ids
+            else:
+                selected = sorted(self._index.query(author=author, available=available,
+                                                    year_min=year_min, year_max=year_max))
+            for book_id in selected:
+                self._remove(book_id, changes)
+            return list(selected)
+
+        return self._writes.submit(delete)
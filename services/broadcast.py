@@ -0,0 +1,166 @@
+# broadcast.py
+import json
+import threading
+import weakref
+from collections import deque
+from metrics import registry
+
+# Live instances, for the metrics below
+_instances = weakref.WeakSet()
+
+
+class Subscription:
+    """
+    One subscriber's view of a Broadcaster: a bounded queue of encoded
+    events. When it is full the broadcaster does not wait; it cuts the
+    subscriber off ('lagged'), so one slow client never holds up a post
+    or grows memory without bound. The client reconnects with
+    Last-Event-ID and catches up from the ring buffer.
+    """
+    def __init__(self, broadcaster, max_pending):
+        self._broadcaster = broadcaster
+        self._cond = threading.Condition(threading.Lock())
+        self._pending = deque()
+        self._max_pending = max_pending
+        self.lagged = False
+        self.closed = False
+
+    def _push(self, frame):
+        # Called by the broadcaster with its own lock held
+        with self._cond:
+            if self.closed:
+                return True
+            if len(self._pending) >= self._max_pending:
+                self._cut_off()
+                return False
+            self._pending.append(frame)
+            self._cond.notify_all()
+            return True
+
+    def _cut_off(self):
+        # Caller holds self._cond
+        self.lagged = True
+        self._pending.clear()
+        self._cond.notify_all()
+
+    def get(self, timeout):
+        """
+        Wait up to 'timeout' seconds for events. Returns the encoded
+        frames queued so far (possibly none); after a timeout the
+        broadcaster's idle hook runs first, to pick up posts made by
+        other processes.
+        """
+        with self._cond:
+            if not self._pending and not self.lagged and not self.closed:
+                self._cond.wait(timeout)
+            frames = list(self._pending)
+            self._pending.clear()
+        if not frames and not self.lagged and not self.closed:
+            self._broadcaster.idle()
+            with self._cond:
+                frames = list(self._pending)
+                self._pending.clear()
+        return frames
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        self._broadcaster.unsubscribe(self)
+
+
+class Broadcaster:
+    """
+    In-process pub/sub fan-out for new records.
+
+    publish() encodes each event once as a Server-Sent Events frame and
+    hands the same bytes to every subscriber, and keeps the last
+    'buffer_size' frames in a ring buffer so a reconnecting client can
+    resume after the last id it saw. Event ids are the record ids and
+    must be published in increasing order.
+    """
+    def __init__(self, buffer_size=1000, max_pending=256, idle=None, event='message'):
+        self.event = event
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = set()
+        self._max_pending = max_pending
+        self._lock = threading.Lock()
+        self._idle = idle
+        self.last_id = 0
+        self.dropped = 0
+        self.published = 0
+        _instances.add(self)
+
+    def frame(self, event_id, record):
+        data = json.dumps(record, ensure_ascii=False, separators=(',', ':'))
+        return f'id: {event_id}\nevent: {self.event}\ndata: {data}\n\n'.encode('utf-8')
+
+    def publish(self, event_id, record):
+        frame = self.frame(event_id, record)
+        with self._lock:
+            if event_id <= self.last_id:
+                return
+            self.last_id = event_id
+            self._buffer.append((event_id, frame))
+            self.published += 1
+            lagging = [sub for sub in self._subscribers if not sub._push(frame)]
+            for sub in lagging:
+                self._subscribers.discard(sub)
+            self.dropped += len(lagging)
+
+    def publish_many(self, events):
+        """
+        Publish (id, record) pairs, e.g. records another process added.
+        If more arrive at once than the ring buffer holds, subscribers
+        are cut off instead of silently missing the overflow; they
+        reconnect and are told about the gap.
+        """
+        events = [(event_id, record) for event_id, record in events if event_id > self.last_id]
+        events.sort(key=lambda pair: pair[0])
+        if len(events) > self._buffer.maxlen:
+            with self._lock:
+                for sub in self._subscribers:
+                    with sub._cond:
+                        sub._cut_off()
+                self.dropped += len(self._subscribers)
+                self._subscribers.clear()
+            events = events[-self._buffer.maxlen:]
+        for event_id, record in events:
+            self.publish(event_id, record)
+
+    def subscribe(self, last_event_id=None):
+        """
+        Returns (subscription, complete). With 'last_event_id' the
+        buffered events after it are queued first; 'complete' is False
+        when some of them already fell out of the ring buffer.
+        """
+        sub = Subscription(self, self._max_pending)
+        complete = True
+        with self._lock:
+            if last_event_id is not None:
+                complete = not self._buffer or last_event_id >= self._buffer[0][0] - 1
+                backlog = [frame for event_id, frame in self._buffer if event_id > last_event_id]
+                # The backlog may exceed the queue bound: it was sized
+                # for live events, and this is a one-off catch-up
+                sub._pending.extend(backlog)
+            self._subscribers.add(sub)
+        return sub, complete
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def idle(self):
+        if self._idle is not None:
+            self._idle()
+
+    def __len__(self):
+        return len(self._subscribers)
+
+
+registry.gauge('stream_subscribers', 'Connected event stream subscribers.',
+               lambda: sum(len(b) for b in list(_instances)))
+registry.counter_callback('stream_events_published_total', 'Events published to streams.',
+                          lambda: sum(b.published for b in list(_instances)))
+registry.counter_callback('stream_subscribers_dropped_total', 'Subscribers cut off for falling behind.',
+                          lambda: sum(b.dropped for b in list(_instances)))
@@ -0,0 +1,89 @@
+# container.py
+import threading
+from services.book_service import BookService
+from services.message_service import MessageService
+from storage.changelog import ChangeLog
+
+
+class Services:
+    """
+    The services of one app, built from its settings (see config) on
+    first use. Nothing touches the data directory until a request needs
+    a service, so an app is cheap to create; warm() loads everything up
+    front instead.
+    """
+    def __init__(self, settings):
+        self.settings = settings
+        self._built = {}
+        self._locks = {'books': threading.Lock(), 'messages': threading.Lock()}
+
+    def _get(self, name, build):
+        service = self._built.get(name)
+        if service is None:
+            # Concurrent first requests wait for one load instead of each
+            # starting their own
+            with self._locks[name]:
+                service = self._built.get(name)
+                if service is None:
+                    service = self._built[name] = build()
+        return service
+
+    @property
+    def books(self):
+        return self._get('books', lambda: BookService(
+            json_path=self.settings['BOOKS_JSON_PATH'],
+            storage=self.settings['STORAGE_BACKEND'],
+            sqlite_path=self.settings['SQLITE_PATH'],
+            change_log=self._change_log(),
+            settings=self.settings))
+
+    @property
+    def messages(self):
+        return self._get('messages', lambda: MessageService(
+            json_path=self.settings['MESSAGES_JSON_PATH'],
+            storage=self.settings['STORAGE_BACKEND'],
+            sqlite_path=self.settings['SQLITE_PATH'],
+            archive_dir=self.settings['MESSAGE_ARCHIVE_DIR'] or None,
+            change_log=self._change_log(),
+            settings=self.settings))
+
+    def _change_log(self):
+        # One follower per service: each keeps its own place in the log
+        if not self.settings['CHANGE_LOG']:
+            return None
+        return ChangeLog(self.settings['CHANGE_LOG_PATH'], max_bytes=self.settings['CHANGE_LOG_MAX_BYTES'],
+                         poll_interval=self.settings['CHANGE_LOG_POLL_SECONDS'])
+
+    def change_seq(self):
+        """
+        Highest change log seq reflected by the services loaded so far.
+        """
+        return max((service.change_seq() for service in list(self._built.values())), default=0)
+
+    def catch_up(self, seq):
+        """
+        Bring the loaded services up to change log seq 'seq'; the others
+        load current data when first used anyway.
+        """
+        for service in list(self._built.values()):
+            service.catch_up(seq)
+
+    def warm(self):
+        """
+        Load every service now.
+        """
+        self.books
+        self.messages
+
+    def warm_in_background(self):
+        """
+        Load every service in a daemon thread; requests arriving before it
+        is done wait on the same per-service lock.
+        """
+        thread = threading.Thread(target=self.warm, name='warm-services', daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        for service in self._built.values():
+            service.backend.close()
@@ -0,0 +1,200 @@
+# idempotency.py
+import os
+import json
+import time
+import threading
+from collections import OrderedDict, namedtuple
+
+# What begin() found for a key
+NEW = 'new'             # first time: the caller runs the request
+REPLAY = 'replay'       # finished before: send the stored response
+BUSY = 'busy'           # still running elsewhere
+MISMATCH = 'mismatch'   # used before for a different request
+
+StoredResponse = namedtuple('StoredResponse', 'fingerprint status headers body expires')
+
+
+def _size(stored):
+    return len(stored.body) + sum(len(name) + len(value) for name, value in stored.headers)
+
+
+class RecentResponses:
+    """
+    LRU of finished responses by key, dropping them once expired. Bounded
+    both in keys and in bytes of response bodies and headers, so a burst
+    of bulk responses cannot pile up; a single response over 'max_bytes'
+    is kept, but only on its own.
+    """
+    def __init__(self, max_keys, max_bytes):
+        self._items = OrderedDict()
+        self._max_keys = max_keys
+        self._max_bytes = max_bytes
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, now):
+        with self._lock:
+            stored = self._items.get(key)
+            if stored is None:
+                return None
+            if stored.expires <= now:
+                del self._items[key]
+                self.bytes -= _size(stored)
+                return None
+            self._items.move_to_end(key)
+            return stored
+
+    def put(self, key, stored):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.bytes -= _size(old)
+            self._items[key] = stored
+            self.bytes += _size(stored)
+            while len(self._items) > self._max_keys or (self.bytes > self._max_bytes and len(self._items) > 1):
+                _, evicted = self._items.popitem(last=False)
+                self.bytes -= _size(evicted)
+
+    def __len__(self):
+        return len(self._items)
+
+
+def _check(stored, fingerprint):
+    return (REPLAY if stored.fingerprint == fingerprint else MISMATCH), stored
+
+
+class MemoryKeys:
+    """
+    Idempotency keys of one process, lost on restart.
+
+    begin() reserves a key for 'lease' seconds while its request runs;
+    finish() keeps the response for 'ttl' seconds, abandon() frees the
+    key again so the request can be retried.
+    """
+    def __init__(self, ttl, lease, max_keys, max_bytes):
+        self.ttl = ttl
+        self.lease = lease
+        self.recent = RecentResponses(max_keys, max_bytes)
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def begin(self, key, fingerprint, now=None):
+        now = time.time() if now is None else now
+        stored = self.recent.get(key, now)
+        if stored is not None:
+            return _check(stored, fingerprint)
+        with self._lock:
+            running = self._running.get(key)
+            if running is not None and running[1] > now:
+                return (BUSY if running[0] == fingerprint else MISMATCH), None
+            self._running[key] = (fingerprint, now + self.lease)
+        return NEW, None
+
+    def finish(self, key, fingerprint, status, headers, body, now=None):
+        now = time.time() if now is None else now
+        self.recent.put(key, StoredResponse(fingerprint, status, headers, body, now + self.ttl))
+        with self._lock:
+            self._running.pop(key, None)
+
+    def abandon(self, key):
+        with self._lock:
+            self._running.pop(key, None)
+
+
+class SqliteKeys:
+    """
+    Idempotency keys in a SQLite file next to the data, so they survive a
+    restart and are shared by every worker process (a retry reaching
+    another worker is still recognized). A request in flight holds a row
+    without a status; a worker dying mid-request leaves it to expire
+    after 'lease' seconds. The most recent finished responses, up to
+    'cache_size' of them and 'cache_bytes' in total, are also kept in
+    memory, so a replay usually does no I/O at all.
+    """
+    def __init__(self, ttl, lease, max_keys, path, cache_size=10_000, cache_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.lease = lease
+        self.max_keys = max_keys
+        self.path = path
+        self.recent = RecentResponses(cache_size, cache_bytes)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._local = threading.local()
+        self._finished = 0
+        conn = self._conn()
+        conn.execute('CREATE TABLE IF NOT EXISTS idempotency_keys ('
+                     'key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, status INTEGER, '
+                     'headers TEXT, body BLOB, expires REAL NOT NULL)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            import sqlite3
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=5000')
+            self._local.conn = conn
+        return conn
+
+    def begin(self, key, fingerprint, now=None):
+        now = time.time() if now is None else now
+        stored = self.recent.get(key, now)
+        if stored is not None:
+            return _check(stored, fingerprint)
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT fingerprint, status, headers, body, expires '
+                               'FROM idempotency_keys WHERE key = ?', (key,)).fetchone()
+            if row is not None and row[4] > now:
+                if row[1] is None:
+                    return (BUSY if row[0] == fingerprint else MISMATCH), None
+                stored = StoredResponse(row[0], row[1], json.loads(row[2]), row[3], row[4])
+                self.recent.put(key, stored)
+                return _check(stored, fingerprint)
+            conn.execute('INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, expires) '
+                         'VALUES (?, ?, ?)', (key, fingerprint, now + self.lease))
+            return NEW, None
+        finally:
+            conn.execute('COMMIT')
+
+    def finish(self, key, fingerprint, status, headers, body, now=None):
+        now = time.time() if now is None else now
+        stored = StoredResponse(fingerprint, status, headers, body, now + self.ttl)
+        conn = self._conn()
+        conn.execute('UPDATE idempotency_keys SET status = ?, headers = ?, body = ?, expires = ? '
+                     'WHERE key = ?', (status, json.dumps(headers), body, stored.expires, key))
+        self.recent.put(key, stored)
+        self._finished += 1
+        if self._finished % 1000 == 0:
+            self._trim(conn, now)
+
+    def _trim(self, conn, now):
+        conn.execute('DELETE FROM idempotency_keys WHERE expires <= ?', (now,))
+        excess = conn.execute('SELECT COUNT(*) FROM idempotency_keys').fetchone()[0] - self.max_keys
+        if excess > 0:
+            # Those closest to expiring go first
+            conn.execute('DELETE FROM idempotency_keys WHERE key IN ('
+                         'SELECT key FROM idempotency_keys ORDER BY expires LIMIT ?)', (excess,))
+
+    def abandon(self, key):
+        self._conn().execute('DELETE FROM idempotency_keys WHERE key = ? AND status IS NULL', (key,))
+
+
+def create_idempotency_keys(settings):
+    """
+    Key store from an app's settings (see config), or None when
+    Idempotency-Key support is off.
+    """
+    ttl = settings['IDEMPOTENCY_TTL_SECONDS']
+    if ttl <= 0:
+        return None
+    lease = settings['IDEMPOTENCY_LEASE_SECONDS']
+    storage = settings['IDEMPOTENCY_STORAGE']
+    if storage == 'memory':
+        return MemoryKeys(ttl, lease, settings['IDEMPOTENCY_MAX_KEYS'], settings['IDEMPOTENCY_CACHE_BYTES'])
+    if storage == 'sqlite':
+        return SqliteKeys(ttl, lease, settings['IDEMPOTENCY_MAX_KEYS'], settings['IDEMPOTENCY_SQLITE_PATH'],
+                          cache_size=min(settings['IDEMPOTENCY_CACHE_SIZE'], settings['IDEMPOTENCY_MAX_KEYS']),
+                          cache_bytes=settings['IDEMPOTENCY_CACHE_BYTES'])
+    raise ValueError(f"Unknown idempotency storage: {storage}")
@@ -1,32 +1,301 @@
 # message_service.py
+import config
+from metrics import instrument
 import os
-import json
+import time
+import logging
+import secrets
+from contextlib import contextmanager
 from models.message import Message
-from dateutil.parser import isoparse
+from models.columnar import MessageTable
+from storage import create_backend
+from storage.archive import SegmentArchive
+from storage.group_commit import GroupCommit
+from storage.locks import RWLock, IdAllocator
+from storage.changelog import CHANGES_APPLIED, FULL_RELOADS, UNLOGGED_RELOADS
+from services.broadcast import Broadcaster
+from services.search_index import InvertedIndex
+from datetime import datetime, timedelta, timezone
 import math
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _timestamp(value):
+    """
+    ISO 8601 string -> UTC epoch microseconds. Messages are ordered by
+    (timestamp, id); timestamps without an offset are taken as UTC.
+    """
+    try:
+        # Covers what the app itself writes ('...Z', '+00:00')
+        ts = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        # Other ISO 8601 forms (week dates, basic format); dateutil is
+        # imported only when one turns up
+        from dateutil.parser import isoparse
+        ts = isoparse(value)
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return (ts - _EPOCH) // timedelta(microseconds=1)
+
+
+def _sort_key(record):
+    return (_timestamp(record['created_at']), record['id'])
+
+
+@instrument('messages', also=('_load',))
 class MessageService:
     """
-    Service layer: handles business logic and JSON file persistence
-    for message board, including simple pagination.
+    Service layer: handles business logic and persistence through a
+    storage backend for message board, including simple pagination.
+
+    In json mode messages default to the 'journal' backend: each post is
+    one appended JSON line and the JSON array file is a snapshot that is
+    compacted periodically. 'json' rewrites the whole array per post.
+
+    Messages are held in memory ordered by creation time (oldest first),
+    so a page or cursor query is a slice taken from the end of the list.
+    Each timestamp is parsed once, when the message is loaded or created.
+
+    Reads share an in-process RW lock; posts take it exclusively together
+    with the backend's cross-process file lock and are group-committed,
+    so concurrent posts go out in one journal append (see BookService).
+
+    With retention configured (MESSAGE_RETENTION_COUNT / _DAYS), the
+    oldest messages are moved out of the hot store into an archive of
+    compressed segments once MESSAGE_ARCHIVE_BATCH of them are due, so
+    memory and page latency are bounded by the retention window rather
+    than the age of the board. Cursor reads (get_messages_before) go on
+    into the archive; page reads and search cover the hot store only.
+
+    Committed posts are published to a Broadcaster for live subscribers
+    (see subscribe()); posts another process made are published when
+    this one picks them up.
+
+    With a shared ChangeLog ('change_log'), other workers' posts are
+    inserted from it one by one instead of reloading the board; only
+    their archiving (a batch of deletes, once per MESSAGE_ARCHIVE_BATCH)
+    still causes a reload.
+
+    'settings' maps the config keys above (MESSAGE_STORAGE, retention,
+    STREAM_BUFFER_SIZE / _QUEUE_SIZE) to values, e.g. an app's config;
+    by default they come from the config module.
     """
-    def __init__(self, json_path='data/messages.json'):
-        self.json_path = json_path
-        # Ensure data file exists, create directory + empty list if needed
-        if not os.path.exists(self.json_path):
-            os.makedirs(os.path.dirname(self.json_path), exist_ok=True)
-            with open(self.json_path, 'w', encoding='utf-8') as f:
-                json.dump([], f, indent=4)
-
-    def _read_messages(self):
-        with open(self.json_path, 'r', encoding='utf-8') as f:
-            items = json.load(f)
-        # Convert dicts back into Message instances
-        return [Message.from_dict(item) for item in items]
-
-    def _write_messages(self, messages):
-        # Serialize each Message via to_dict()
-        with open(self.json_path, 'w', encoding='utf-8') as f:
-            json.dump([m.to_dict() for m in messages], f, indent=4)
+    def __init__(self, json_path=None, storage=None, backend=None, archive_dir=None, sqlite_path=None,
+                 change_log=None, settings=None):
+        settings = settings if settings is not None else vars(config)
+        json_path = json_path or settings['MESSAGES_JSON_PATH']
+        if backend is None:
+            storage = storage or settings['STORAGE_BACKEND']
+            if storage == 'json' and settings['MESSAGE_STORAGE'] == 'journal':
+                storage = 'journal'
+            backend = create_backend(storage, 'messages', json_path, sqlite_path)
+        self.backend = backend
+        self._change_log = change_log
+        # Backend signature() as of the last change log entry applied or written
+        self._signature = None
+        self._retention_count = settings['MESSAGE_RETENTION_COUNT']
+        self._retention_days = settings['MESSAGE_RETENTION_DAYS']
+        self._archive_batch = settings['MESSAGE_ARCHIVE_BATCH']
+        # Column-wise store kept sorted by (timestamp, id)
+        self._board = MessageTable()
+        self._search = InvertedIndex({'message': 1, 'username': 1})
+        self._ids = IdAllocator()
+        self._lock = RWLock()
+        # Bumped on every post or reload; see etag()
+        self._epoch = secrets.token_hex(4)
+        self.version = 0
+        self._writes = GroupCommit(self._writing, self._persist, name='messages')
+        self._stream_buffer = settings['STREAM_BUFFER_SIZE']
+        self._stream = Broadcaster(self._stream_buffer, settings['STREAM_QUEUE_SIZE'],
+                                   idle=self._sync)
+        self._archive = SegmentArchive(
+            archive_dir or settings['MESSAGE_ARCHIVE_DIR'] or os.path.splitext(json_path)[0] + '-archive',
+            key_of=_sort_key)
+        self._load()
+        if self._expired():
+            # Trim a board that outgrew the retention while we were down
+            with self._writing():
+                self._archive_oldest(self._expired())
+
+    def _load(self):
+        """
+        Load every stored message and order it by creation time.
+        """
+        if self._change_log is not None:
+            self._change_log.start()
+            self._signature = self.backend.signature()
+        self._archive.refresh()
+        messages = [Message.from_dict(item) for item in self.backend.load()]
+        self._board.load((_timestamp(m.created_at), m) for m in messages)
+        self._search.clear()
+        # Keyed by id: a hand-edited file may repeat one
+        for m in {m.id: m for m in messages}.values():
+            self._search.add(m.id, m)
+        # Archived ids count too: a board whose messages have all expired
+        # must not hand their ids out again
+        self._ids.observe(max(max((m.id for m in messages), default=0), self._archive.max_id))
+        self.version += 1
+        # First load seeds the resume buffer; later ones publish what
+        # other processes posted. Only the newest rows can still be
+        # buffered: one more than fit lets publish_many() tell that more
+        # arrived than the buffer holds
+        end = len(self._board)
+        tail = self._board.slice(max(end - self._stream_buffer - 1, 0), end)
+        self._stream.publish_many((m.id, m.to_dict()) for m in tail if m.id > self._stream.last_id)
+
+    def _stale(self):
+        if self._change_log is not None:
+            return self._change_log.changed()
+        return self.backend.has_changed()
+
+    def _refresh(self):
+        # Caller holds the write lock
+        if self._change_log is None:
+            if self.backend.has_changed():
+                self._load()
+            return
+        entries = self._change_log.read()
+        if entries is None or any(entry['deletes'] for entry in entries if entry['store'] == 'messages'):
+            # Behind a trimmed log, or another worker archived: the
+            # archive has new segments too
+            if entries is None:
+                FULL_RELOADS.inc(store='messages')
+            self._load()
+            return
+        entries = [entry for entry in entries if entry['store'] == 'messages']
+        if entries:
+            self._signature = entries[-1].get('sig')
+        posted = [Message.from_dict(item) for entry in entries for item in entry['upserts']]
+        posted = [msg for msg in posted if self._board.get(msg.id) is None]
+        if not posted:
+            return
+        for msg in posted:
+            self._insert(msg)
+        self._ids.observe(max(msg.id for msg in posted))
+        self.version += 1
+        for msg in sorted(posted, key=lambda m: m.id):
+            if msg.id > self._stream.last_id:
+                self._stream.publish(msg.id, msg.to_dict())
+        CHANGES_APPLIED.inc(len(entries), store='messages')
+
+    def _sync(self):
+        """
+        Catch up with posts made by other processes: from the change log
+        if there is one, else by reloading the board if storage changed.
+        """
+        if self._stale():
+            with self._lock.write():
+                self._refresh()
+
+    def catch_up(self, seq):
+        """
+        Apply the change log at least up to 'seq'; see BookService.catch_up().
+        """
+        log = self._change_log
+        if log is not None and log.seq < seq and log.changed(force=True):
+            with self._lock.write():
+                self._refresh()
+
+    def change_seq(self):
+        log = self._change_log
+        return 0 if log is None else max(log.seq, log.written)
+
+    @contextmanager
+    def _writing(self):
+        with self._lock.write(), self.backend.lock():
+            self._refresh()
+            if self._change_log is not None and self.backend.signature() != self._signature:
+                # Storage changed without a log entry; see BookService._writing()
+                UNLOGGED_RELOADS.inc(store='messages')
+                self._load()
+            try:
+                yield
+            except BaseException:
+                # Storage failed mid-write: drop half-applied memory changes
+                self._load()
+                raise
+
+    def _insert(self, msg):
+        # New messages normally land at the end, making this an append
+        self._board.insert(msg, _timestamp(msg.created_at))
+        self._search.add(msg.id, msg)
+
+    def _persist(self, changes):
+        # Called by the group commit with the write locks held
+        self.version += 1
+        records = [msg.to_dict() for msg in changes.values()]
+        self.backend.commit(
+            upserts=records,
+            snapshot=lambda: (m.to_dict() for m in self._board.values())
+        )
+        if self._change_log is not None:
+            self._log_commit(records)
+        # Still under the write lock, so events go out in id order
+        for msg_id in sorted(changes):
+            self._stream.publish(msg_id, changes[msg_id].to_dict())
+        expired = self._expired()
+        if expired >= self._archive_batch:
+            try:
+                self._archive_oldest(expired)
+            except Exception:
+                # The posts are committed already; archiving retries on
+                # the next one
+                logging.exception('Archiving old messages failed')
+                self._load()
+
+    def _expired(self):
+        """
+        Number of oldest messages outside the retention window.
+        """
+        expired = 0
+        if self._retention_count > 0:
+            expired = max(len(self._board) - self._retention_count, 0)
+        if self._retention_days > 0:
+            cutoff = int((time.time() - self._retention_days * 86400) * 1_000_000)
+            expired = max(expired, self._board.bisect_left((cutoff, 0)))
+        return expired
+
+    def _archive_oldest(self, count):
+        """
+        Move the 'count' oldest messages to the archive. Segments are
+        written before the messages are deleted from the backend; rows a
+        crash left in both places are recognised and only deleted.
+        Caller holds the write locks.
+        """
+        newest, archived_max_id = self._archive.newest_key, self._archive.max_id
+        views = self._board.slice(0, count)
+        rows = []
+        for row, view in enumerate(views):
+            key = self._board.key_at(row)
+            if newest is not None and key <= newest and view.id <= archived_max_id:
+                continue
+            rows.append((key, view.to_dict()))
+        if rows:
+            self._archive.write(rows)
+        ids = [view.id for view in views]
+        self._board.drop_oldest(count)
+        for view in views:
+            self._search.remove(view.id, view)
+        self.version += 1
+        self.backend.commit(
+            deletes=ids,
+            snapshot=lambda: (m.to_dict() for m in self._board.values())
+        )
+        if self._change_log is not None:
+            self._log_commit(deletes=ids)
+
+    def _log_commit(self, upserts=(), deletes=()):
+        # Right after a backend commit, with its lock still held
+        self._signature = self.backend.signature()
+        self._change_log.append('messages', upserts, deletes, signature=self._signature)
+
+    def etag(self):
+        """
+        ETag for any view of the board; changes whenever a message is posted.
+        """
+        self._sync()
+        return f'{self._epoch}-{self.version}'
 
     def create_message(self, data):
 
@@ -46,24 +315,90 @@ class MessageService:
         if len(message) > 50:
             raise ValueError("Field 'message' must be at most 50 characters.")
 
-        # Load existing messages to determine next ID
-        messages = self._read_messages()
-        next_id = max((m.id for m in messages), default=0) + 1
-
         # Create new Message and persist
-        msg = Message(id=next_id, username=username, message=message)
-        messages.append(msg)
-        self._write_messages(messages)
-        return msg.to_dict()
+        def post(changes):
+            msg = Message(id=self._ids.allocate()[0], username=username, message=message)
+            self._insert(msg)
+            changes[msg.id] = msg
+            return msg
+
+        return self._writes.submit(post).to_dict()
+
+    def subscribe(self, last_event_id=None):
+        """
+        Subscribe to newly posted messages. Returns (subscription,
+        complete); see Broadcaster.subscribe(). Events after
+        'last_event_id' that are still buffered are delivered first.
+        """
+        self._sync()
+        return self._stream.subscribe(last_event_id)
+
+    def subscribers(self):
+        return len(self._stream)
 
     def get_messages(self, page=1, limit=math.inf):
-        messages = self._read_messages()
-        # Sort by parsed ISO timestamp descending
-        messages.sort(key=lambda m: isoparse(m.created_at), reverse=True)
-        total = len(messages)
-
-        # Compute slice for requested page
-        start = (page - 1) * limit
-        end = start + limit
-        subset = messages[start:end]
-        return [m.to_dict() for m in subset], total
+        """
+        Return one page of message views, newest first, and the total count.
+        Only the requested slice is touched.
+        """
+        self._sync()
+        with self._lock.read():
+            total = len(self._board)
+            if limit == math.inf:
+                limit = total or 1
+
+            # Pages count backwards from the newest message
+            end = total - (page - 1) * limit
+            start = max(end - limit, 0)
+            if end <= 0:
+                return [], total
+            subset = self._board.slice(start, end)
+            return subset[::-1], total
+
+    def get_messages_before(self, before, limit=20):
+        """
+        Keyset pagination: return up to 'limit' messages older than the
+        cursor, newest first, the total count and whether older ones remain.
+        'before' is either a message id (int) or an ISO 8601 timestamp.
+        Once the hot store is exhausted the page continues from the
+        archive, so the cursor can walk back through the whole history.
+        Raises LookupError for an unknown id and ValueError for a bad timestamp.
+        """
+        cursor_key = None
+        if not isinstance(before, int):
+            # Ids start at 1, so (ts, 0) sorts before every message at ts
+            cursor_key = (_timestamp(before), 0)
+        self._sync()
+        archive = self._archive
+        subset, start, oldest = [], 0, None
+        with self._lock.read():
+            if cursor_key is None:
+                cursor_key = self._board.key_of(before)
+            if cursor_key is not None:
+                end = self._board.bisect_left(cursor_key)
+                start = max(end - limit, 0)
+                subset = self._board.slice(start, end)[::-1]
+                oldest = self._board.key_at(0) if len(self._board) else None
+            total = len(self._board) + len(archive)
+        if len(subset) == limit:
+            return subset, total, start > 0 or len(archive) > 0
+        # Archive reads decompress segments: done outside the lock
+        if cursor_key is None:
+            cursor_key = archive.key_of_id(before)
+            if cursor_key is None:
+                raise LookupError(f"Message with id={before} not found.")
+        if oldest is not None:
+            cursor_key = min(cursor_key, oldest)
+        archived, has_next = archive.read_before(cursor_key, limit - len(subset))
+        subset.extend(Message.from_dict(record) for record in archived)
+        return subset, total, has_next
+
+    def search_messages(self, query, limit=20):
+        """
+        Ranked full-text search over message bodies and usernames.
+        Returns (message views, total matching).
+        """
+        self._sync()
+        with self._lock.read():
+            ids, total = self._search.search(query, limit=limit)
+            return [self._board.get(msg_id) for msg_id in ids], total
@@ -0,0 +1,136 @@
+# rate_limit.py
+import os
+import time
+import threading
+from collections import OrderedDict
+
+
+class MemoryBuckets:
+    """
+    Token buckets for one process, stored as a single number per key.
+
+    Each key keeps its "theoretical arrival time" (GCRA): the moment its
+    bucket would be full again. A request adds one interval (1 / rate);
+    it is refused when that would push the time more than 'burst'
+    intervals into the future. That is a token bucket of 'burst' tokens
+    refilled at 'rate' per second, without a timer.
+
+    take() charges all of a request's keys or none: a request refused by
+    one bucket leaves the others alone, so refused requests cannot fill
+    the table with keys either. At most 'max_keys' are kept, least
+    recently charged dropped first; such a key most likely has a full
+    bucket again anyway.
+    """
+    def __init__(self, rate, burst, max_keys=100_000):
+        self._interval = 1.0 / rate
+        self._window = burst * self._interval
+        self._tat = OrderedDict()
+        self._max_keys = max_keys
+        self._lock = threading.Lock()
+
+    def take(self, keys, now=None):
+        """
+        Take a token for every key in 'keys'. Returns 0.0 when allowed,
+        otherwise the seconds until all of them have one; nothing is
+        taken then.
+        """
+        now = time.monotonic() if now is None else now
+        tats = self._tat
+        with self._lock:
+            new_tats = {key: max(tats.get(key, now), now) + self._interval for key in keys}
+            wait = max((new_tat - now for new_tat in new_tats.values()), default=0.0) - self._window
+            if wait > 0:
+                return wait
+            for key, new_tat in new_tats.items():
+                tats[key] = new_tat
+                tats.move_to_end(key)
+            while len(tats) > self._max_keys:
+                tats.popitem(last=False)
+        return 0.0
+
+    def __len__(self):
+        return len(self._tat)
+
+
+class SqliteBuckets:
+    """
+    The same buckets shared by every worker process through a SQLite file.
+    Each check is one short IMMEDIATE transaction, which charges all of
+    the request's keys or none; times are wall-clock, since monotonic
+    clocks differ between processes. Keys whose bucket is full again are
+    deleted every 10,000 charges.
+    """
+    def __init__(self, rate, burst, path):
+        self._interval = 1.0 / rate
+        self._window = burst * self._interval
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._local = threading.local()
+        self._checks = 0
+        with self._conn() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS rate_buckets (key TEXT PRIMARY KEY, tat REAL NOT NULL)')
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            import sqlite3
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            conn.execute('PRAGMA busy_timeout=5000')
+            self._local.conn = conn
+        return conn
+
+    def take(self, keys, now=None):
+        now = time.time() if now is None else now
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            new_tats = {}
+            for key in keys:
+                row = conn.execute('SELECT tat FROM rate_buckets WHERE key = ?', (key,)).fetchone()
+                new_tats[key] = (max(row[0], now) if row else now) + self._interval
+            wait = max((new_tat - now for new_tat in new_tats.values()), default=0.0) - self._window
+            if wait > 0:
+                return wait
+            conn.executemany('INSERT OR REPLACE INTO rate_buckets (key, tat) VALUES (?, ?)', new_tats.items())
+            self._checks += 1
+            if self._checks % 10_000 == 0:
+                conn.execute('DELETE FROM rate_buckets WHERE tat <= ?', (now,))
+            return 0.0
+        finally:
+            conn.execute('COMMIT')
+
+
+class RateLimiter:
+    """
+    Per-client write rate limit: every identity of a request (client IP,
+    username, ...) has its own bucket and all of them must have a token.
+    'storage' is 'memory' (per process) or 'sqlite' (shared by workers).
+    """
+    def __init__(self, rate, burst, storage='memory', path=None):
+        if storage == 'memory':
+            self.buckets = MemoryBuckets(rate, burst)
+        elif storage == 'sqlite':
+            self.buckets = SqliteBuckets(rate, burst, path)
+        else:
+            raise ValueError(f"Unknown rate limit storage: {storage}")
+
+    def check(self, keys, now=None):
+        """
+        Take a token for each key, or none unless every key has one.
+        Returns 0.0 when the request may go ahead, otherwise the seconds
+        to wait before retrying. 'now' defaults to the buckets' clock.
+        """
+        return self.buckets.take(list(keys), now)
+
+
+def create_rate_limiter(settings):
+    """
+    RateLimiter from an app's settings (see config), or None when rate
+    limiting is off.
+    """
+    if settings['RATE_LIMIT_RATE'] <= 0:
+        return None
+    return RateLimiter(settings['RATE_LIMIT_RATE'], settings['RATE_LIMIT_BURST'],
+                       settings['RATE_LIMIT_STORAGE'], settings['RATE_LIMIT_SQLITE_PATH'])
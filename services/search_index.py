@@ -0,0 +1,151 @@
+# search_index.py
+import math
+import re
+import heapq
+import unicodedata
+from collections import Counter
+
+# Runs of CJK ideographs / kana / hangul, or runs of letters and digits
+_TOKEN_RE = re.compile(
+    r'([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+)'
+    r'|([^\W_]+)'
+)
+
+# BM25 parameters
+_K1 = 1.2
+_B = 0.75
+
+
+def _normalize(text):
+    return unicodedata.normalize('NFKC', str(text)).casefold()
+
+
+def tokenize(text, for_query=False):
+    """
+    Split text into index terms.
+
+    Latin text is split into words. CJK text has no spaces, so each run is
+    indexed as single characters plus overlapping bigrams ('红楼梦' ->
+    红, 楼, 梦, 红楼, 楼梦). Queries use the bigrams alone (or the single
+    character for a one-character run), which behaves like a phrase match.
+    """
+    if text is None:
+        return []
+    tokens = []
+    for cjk, word in _TOKEN_RE.findall(_normalize(text)):
+        if word:
+            tokens.append(word)
+            continue
+        bigrams = [cjk[i:i + 2] for i in range(len(cjk) - 1)]
+        if for_query:
+            tokens.extend(bigrams or [cjk])
+        else:
+            tokens.extend(cjk)
+            tokens.extend(bigrams)
+    return tokens
+
+
+class InvertedIndex:
+    """
+    In-process full-text index: term -> {doc id: weighted term frequency}.
+
+    Documents are indexed from several fields with per-field weights and
+    kept up to date incrementally through add()/remove(). Only the
+    postings and each document's length are kept: to remove or re-index
+    a document the caller passes the object as it was indexed, and its
+    terms are worked out again. search() only
+    walks the posting lists of the query terms, starting with the
+    rarest, so its cost follows how many documents match rather than the
+    size of the corpus. Results are ranked with BM25; all query terms
+    must match.
+    """
+    def __init__(self, field_weights):
+        self.field_weights = dict(field_weights)
+        self.postings = {}
+        # doc id -> weighted number of terms, for BM25
+        self._doc_len = {}
+        self._total_len = 0
+
+    def clear(self):
+        self.__init__(self.field_weights)
+
+    def __len__(self):
+        return len(self._doc_len)
+
+    def _terms(self, obj):
+        terms = Counter()
+        for field, weight in self.field_weights.items():
+            for token in tokenize(getattr(obj, field, None)):
+                terms[token] += weight
+        return terms
+
+    def add(self, doc_id, obj, old=None):
+        """
+        Index 'obj', reading the configured fields as attributes. When
+        'doc_id' is indexed already, 'old' must be the object it was
+        indexed from.
+        """
+        if doc_id in self._doc_len:
+            if old is None:
+                raise ValueError(f'Document {doc_id} is indexed already; pass its old version.')
+            self.remove(doc_id, old)
+        terms = self._terms(obj)
+        length = sum(terms.values())
+        self._doc_len[doc_id] = length
+        self._total_len += length
+        for token, tf in terms.items():
+            self.postings.setdefault(token, {})[doc_id] = tf
+
+    def remove(self, doc_id, obj):
+        """
+        Drop 'doc_id', given the object it was indexed from.
+        """
+        length = self._doc_len.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_len -= length
+        for token in self._terms(obj):
+            docs = self.postings.get(token)
+            if docs is not None:
+                docs.pop(doc_id, None)
+                if not docs:
+                    del self.postings[token]
+
+    def search(self, query, limit=20):
+        """
+        Return (ranked doc ids, number of matching docs).
+        """
+        terms = list(dict.fromkeys(tokenize(query, for_query=True)))
+        if not terms:
+            return [], 0
+        lists = []
+        for term in terms:
+            docs = self.postings.get(term)
+            if not docs:
+                return [], 0
+            lists.append((term, docs))
+        # Intersect starting from the rarest term
+        lists.sort(key=lambda pair: len(pair[1]))
+        matches = set(lists[0][1])
+        for _, docs in lists[1:]:
+            matches.intersection_update(docs)
+            if not matches:
+                return [], 0
+
+        n_docs = len(self._doc_len)
+        avg_len = self._total_len / n_docs if n_docs else 1
+        idf = {
+            term: math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in lists
+        }
+
+        def score(doc_id):
+            norm = _K1 * (1 - _B + _B * self._doc_len[doc_id] / avg_len)
+            total = 0.0
+            for term, docs in lists:
+                tf = docs[doc_id]
+                total += idf[term] * tf * (_K1 + 1) / (tf + norm)
+            return total
+
+        ranked = heapq.nlargest(limit, matches, key=lambda doc_id: (score(doc_id), -doc_id))
+        return ranked, len(matches)
@@ -0,0 +1,39 @@
+# storage package
+import config
+from storage.base import StorageBackend
+from storage.json_backend import JsonFileBackend, atomic_write_json
+from storage.journal import Journal, JournalBackend
+
+# SqliteBackend is public too, but loaded on first access (see __getattr__)
+__all__ = ['StorageBackend', 'JsonFileBackend', 'JournalBackend', 'Journal',
+           'atomic_write_json', 'create_backend', 'SQLITE_INDEXES']
+
+# Columns indexed by the SQLite backend, per dataset
+SQLITE_INDEXES = {
+    'books': (),
+    'messages': ('created_at',),
+}
+
+
+def create_backend(kind, dataset, json_path, sqlite_path=None):
+    """
+    Build the storage backend for 'dataset' ('books' or 'messages').
+    'kind' is one of 'json', 'journal' or 'sqlite'.
+    """
+    if kind == 'json':
+        return JsonFileBackend(json_path)
+    if kind == 'journal':
+        return JournalBackend(json_path)
+    if kind == 'sqlite':
+        from storage.sqlite_backend import SqliteBackend
+        return SqliteBackend(sqlite_path or config.SQLITE_PATH, dataset,
+                             indexed=SQLITE_INDEXES.get(dataset, ()))
+    raise ValueError(f"Unknown storage backend: {kind}")
+
+
+def __getattr__(name):
+    # sqlite3 is imported only once the SQLite backend is used
+    if name == 'SqliteBackend':
+        from storage.sqlite_backend import SqliteBackend
+        return SqliteBackend
+    raise AttributeError(f"module 'storage' has no attribute '{name}'")
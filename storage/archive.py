@@ -0,0 +1,193 @@
+# archive.py
+import os
+import gzip
+import json
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from metrics import STORAGE_BYTES_READ, STORAGE_BYTES_WRITTEN
+from storage.json_backend import file_mode
+
+_EPOCH = datetime(1970, 1, 1)
+_SUFFIX = '.ndjson.gz'
+
+
+class Segment:
+    """
+    One immutable archive file. Its key range, id range and record count
+    are encoded in the file name, so listing the directory is enough to
+    plan a read.
+    """
+    __slots__ = ('path', 'min_key', 'max_key', 'min_id', 'max_id', 'count')
+
+    def __init__(self, path, min_key, max_key, min_id, max_id, count):
+        self.path = path
+        self.min_key = min_key
+        self.max_key = max_key
+        self.min_id = min_id
+        self.max_id = max_id
+        self.count = count
+
+    @classmethod
+    def parse(cls, directory, name):
+        # <day>_<first ts>_<first id>_<last ts>_<last id>_<min id>_<max id>_<count>.ndjson.gz
+        try:
+            _, min_ts, first_id, max_ts, last_id, min_id, max_id, count = (
+                name[:-len(_SUFFIX)].split('_'))
+            return cls(os.path.join(directory, name),
+                       (int(min_ts), int(first_id)), (int(max_ts), int(last_id)),
+                       int(min_id), int(max_id), int(count))
+        except ValueError:
+            return None
+
+    def name(self):
+        day = (_EPOCH + timedelta(microseconds=self.min_key[0])).strftime('%Y-%m-%d')
+        return (f'{day}_{self.min_key[0]}_{self.min_key[1]}_{self.max_key[0]}_{self.max_key[1]}'
+                f'_{self.min_id}_{self.max_id}_{self.count}{_SUFFIX}')
+
+
+class SegmentArchive:
+    """
+    Cold storage for records evicted from a hot store: compressed,
+    write-once NDJSON segments, one per UTC day per archiving run.
+
+    Records are ordered by a sort key (ts, id), ts in epoch microseconds
+    as produced by 'key_of(record)'. Reads are planned from the segment
+    names and only open the segments they need; the last few decoded
+    segments are cached, which is safe because segments never change.
+    """
+    def __init__(self, directory, key_of, cache_segments=8):
+        self.directory = directory
+        self._key_of = key_of
+        self._segments = []
+        self._sig = None
+        self._cache = OrderedDict()
+        self._cache_size = cache_segments
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self):
+        """
+        Re-list the directory if segments were added (by any process).
+        """
+        try:
+            st = os.stat(self.directory)
+        except FileNotFoundError:
+            self._segments, self._sig = [], None
+            return
+        sig = (st.st_ino, st.st_mtime_ns)
+        if sig == self._sig:
+            return
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.endswith(_SUFFIX) and not name.startswith('.'):
+                segment = Segment.parse(self.directory, name)
+                if segment is not None:
+                    segments.append(segment)
+        segments.sort(key=lambda s: s.max_key)
+        self._segments, self._sig = segments, sig
+
+    def __len__(self):
+        return sum(s.count for s in self._segments)
+
+    @property
+    def newest_key(self):
+        return self._segments[-1].max_key if self._segments else None
+
+    @property
+    def max_id(self):
+        return max((s.max_id for s in self._segments), default=0)
+
+    def write(self, rows):
+        """
+        Archive (key, record) pairs given in key order, one segment per
+        UTC day. Each file is written to a temp name, fsynced and renamed,
+        so readers never see a partial segment.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        day_of = lambda key: key[0] // 86_400_000_000
+        start = 0
+        while start < len(rows):
+            end = start
+            day = day_of(rows[start][0])
+            while end < len(rows) and day_of(rows[end][0]) == day:
+                end += 1
+            self._write_segment(rows[start:end])
+            start = end
+        self.refresh()
+
+    def _write_segment(self, rows):
+        ids = [record['id'] for _, record in rows]
+        segment = Segment(None, rows[0][0], rows[-1][0], min(ids), max(ids), len(rows))
+        data = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for _, record in rows).encode('utf-8')
+        fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=self.directory)
+        path = os.path.join(self.directory, segment.name())
+        try:
+            os.fchmod(fd, file_mode(path))
+            with os.fdopen(fd, 'wb') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+                    f.write(data)
+                raw.flush()
+                os.fsync(raw.fileno())
+                written = raw.tell()
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        STORAGE_BYTES_WRITTEN.inc(written, backend='archive', store=os.path.basename(self.directory))
+
+    def _read(self, segment):
+        """
+        Decoded segment as parallel (keys, records) lists in key order.
+        """
+        with self._lock:
+            cached = self._cache.get(segment.path)
+            if cached is not None:
+                self._cache.move_to_end(segment.path)
+                return cached
+        with open(segment.path, 'rb') as raw:
+            data = raw.read()
+        STORAGE_BYTES_READ.inc(len(data), backend='archive', store=os.path.basename(self.directory))
+        records = [json.loads(line) for line in gzip.decompress(data).splitlines() if line]
+        decoded = ([self._key_of(record) for record in records], records)
+        with self._lock:
+            self._cache[segment.path] = decoded
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return decoded
+
+    def key_of_id(self, record_id):
+        """
+        Sort key of an archived record by id, or None if not archived.
+        """
+        for segment in reversed(self._segments):
+            if segment.min_id <= record_id <= segment.max_id:
+                keys, records = self._read(segment)
+                for key, record in zip(keys, records):
+                    if record['id'] == record_id:
+                        return key
+        return None
+
+    def read_before(self, key, limit):
+        """
+        Up to 'limit' archived records with a sort key below 'key',
+        newest first, and whether older ones remain.
+        """
+        candidates = []
+        pending = [s for s in self._segments if s.min_key < key]
+        # Newest segment first; stop once no remaining segment can hold
+        # anything newer than what was collected (segments of records
+        # imported out of order may overlap)
+        while pending:
+            segment = pending[-1]
+            if len(candidates) > limit and segment.max_key < candidates[limit][0]:
+                break
+            pending.pop()
+            keys, records = self._read(segment)
+            candidates.extend((k, r) for k, r in zip(keys, records) if k < key)
+            candidates.sort(key=lambda pair: pair[0], reverse=True)
+            del candidates[limit + 1:]
+        has_more = len(candidates) > limit or bool(pending)
+        return [record for _, record in candidates[:limit]], has_more
@@ -0,0 +1,49 @@
+# base.py
+
+
+class StorageBackend:
+    """
+    Persistence interface the services are built on.
+
+    Services keep their dataset in memory and hand every change to the
+    backend through commit(). Records are plain dicts with an integer 'id'.
+    Writers hold lock() around refresh + id allocation + commit so worker
+    processes sharing the same files never hand out the same id.
+    """
+    file_lock = None
+
+    def lock(self):
+        """
+        Cross-process exclusive lock for this dataset.
+        """
+        return self.file_lock
+    def load(self):
+        """
+        Return every stored record as a list of dicts.
+        """
+        raise NotImplementedError
+
+    def has_changed(self):
+        """
+        True when the store was modified outside this backend since the
+        last load() or commit(), meaning the caller should reload.
+        """
+        return False
+
+    def signature(self):
+        """
+        JSON-compatible value that changes with every commit to this
+        dataset, by any process, or None if the backend cannot tell.
+        """
+        return None
+
+    def commit(self, upserts=(), deletes=(), snapshot=None):
+        """
+        Persist one batch of changes: records to insert or replace and
+        ids to delete. 'snapshot' is a callable returning the full current
+        dataset, used by backends that can only rewrite everything.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
@@ -0,0 +1,209 @@
+# changelog.py
+import os
+import json
+import time
+import secrets
+from storage.locks import FileLock
+from metrics import registry, STORAGE_BYTES_READ, STORAGE_BYTES_WRITTEN
+
+CHANGES_APPLIED = registry.counter(
+    'change_log_entries_applied_total', 'Change log entries from other workers applied in memory.', ('store',))
+FULL_RELOADS = registry.counter(
+    'change_log_reloads_total', 'Full reloads after falling behind a trimmed change log.', ('store',))
+UNLOGGED_RELOADS = registry.counter(
+    'change_log_unlogged_reloads_total', 'Full reloads after storage changed without a change log entry.',
+    ('store',))
+
+
+def _last_entry(f, size):
+    """
+    (seq, end offset) of the last complete line of the log, reading
+    backwards from 'size'.
+    """
+    pos, buf = size, b''
+    while pos > 0:
+        step = min(65536, pos)
+        pos -= step
+        f.seek(pos)
+        buf = f.read(step) + buf
+        end = buf.rfind(b'\n')
+        if end == -1:
+            continue
+        start = buf.rfind(b'\n', 0, end)
+        if start != -1 or pos == 0:
+            record = json.loads(buf[start + 1:end])
+            return record.get('seq', record.get('base')), pos + end + 1
+    return 0, 0
+
+
+class ChangeLog:
+    """
+    Change log shared by the worker processes of one data directory: an
+    append-only file with one JSON line per committed batch,
+
+        {"seq": 7, "store": "books", "origin": "...", "upserts": [...], "deletes": [...], "sig": ...}
+
+    where seq grows by one per entry across all stores. A writer appends
+    its batch right after committing it to the backend, with the
+    backend's lock still held, so entries of one store are in commit
+    order; "sig" is the backend's signature() after that commit. Each service follows the log from where it left off and
+    applies the other workers' entries record by record, instead of
+    reloading the whole dataset after every write elsewhere; changed()
+    costs one stat().
+
+    Every service has its own instance ('origin'), and skips its own
+    entries. Once the file outgrows 'max_bytes' the appender cuts it to
+    its newest half, starting with a {"base": seq} line; a reader that
+    was further behind than that gets None from read() and reloads from
+    the backend.
+
+    A worker dying between its backend commit and the append, or a hand
+    edit of the data, changes storage without an entry. The services
+    notice before their next write: with the backend lock held, its
+    signature() no longer matches the last entry's "sig", and they
+    reload from the backend. Reads do not see such a change until then.
+    """
+    def __init__(self, path, max_bytes=16 * 1024 * 1024, poll_interval=0.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.poll_interval = poll_interval
+        self.origin = secrets.token_hex(8)
+        self.file_lock = FileLock(path + '.lock')
+        self._store = os.path.basename(path)
+        # Last seq read (or skipped) and where reading continues
+        self.seq = 0
+        self._ino = None
+        self._offset = 0
+        self._checked = 0.0
+        # Last seq this instance appended
+        self.written = 0
+        # (ino, size) -> seq of the file as last appended to
+        self._tail = (None, 0, 0)
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size
+
+    def start(self):
+        """
+        Skip to the end of the log. Call before loading from the backend:
+        entries committed in between are then read again later, and
+        replaying whole records over data that has them is harmless.
+        """
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            self.seq, self._ino, self._offset = 0, None, 0
+            return
+        with f:
+            st = os.fstat(f.fileno())
+            self.seq, self._offset = _last_entry(f, st.st_size)
+            self._ino = st.st_ino
+        self._checked = time.monotonic()
+
+    def changed(self, force=False):
+        """
+        True when entries were appended (or the log was cut) since the
+        last read. Within 'poll_interval' of the last check this answers
+        False without looking, unless 'force' is given.
+        """
+        if not force and self.poll_interval > 0:
+            now = time.monotonic()
+            if now - self._checked < self.poll_interval:
+                return False
+            self._checked = now
+        st = self._stat()
+        return st is not None and st != (self._ino, self._offset)
+
+    def read(self):
+        """
+        Entries of other instances appended since the last read, oldest
+        first, or None when the log was cut past entries not yet read
+        (the caller must reload and start() again).
+        """
+        self._checked = time.monotonic()
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return []
+        with f:
+            ino = os.fstat(f.fileno()).st_ino
+            if ino != self._ino:
+                # Cut by the appender: its entries are read from the top
+                self._ino, self._offset = ino, 0
+            f.seek(self._offset)
+            data = f.read()
+        # A line still being appended is left for the next read
+        end = data.rfind(b'\n') + 1
+        self._offset += end
+        STORAGE_BYTES_READ.inc(end, backend='changelog', store=self._store)
+        entries = []
+        for line in data[:end].splitlines():
+            record = json.loads(line)
+            if 'base' in record:
+                if record['base'] > self.seq:
+                    return None
+                continue
+            if record['seq'] <= self.seq:
+                continue
+            self.seq = record['seq']
+            if record['origin'] != self.origin:
+                entries.append(record)
+        return entries
+
+    def append(self, store, upserts=(), deletes=(), signature=None):
+        """
+        Append one committed batch, with the backend's signature() after
+        it; returns its seq.
+        """
+        with self.file_lock:
+            st = self._stat()
+            if st is None:
+                last, size = 0, 0
+            elif st == self._tail[:2]:
+                last, size = self._tail[2], st[1]
+            else:
+                with open(self.path, 'rb') as f:
+                    last, size = _last_entry(f, st[1])
+                if size != st[1]:
+                    # Torn line from a crashed appender
+                    with open(self.path, 'r+b') as f:
+                        f.truncate(size)
+            seq = last + 1
+            entry = {'seq': seq, 'store': store, 'origin': self.origin,
+                     'upserts': list(upserts), 'deletes': list(deletes), 'sig': signature}
+            data = (json.dumps(entry, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+            with open(self.path, 'ab') as f:
+                f.write(data)
+                ino = os.fstat(f.fileno()).st_ino
+            STORAGE_BYTES_WRITTEN.inc(len(data), backend='changelog', store=self._store)
+            if (ino, self._offset) == (self._ino, size) and self.seq == last:
+                # Nothing unread before our own entry: no need to read it back
+                self._offset, self.seq = size + len(data), seq
+            self._tail = (ino, size + len(data), seq)
+            self.written = seq
+            if size + len(data) > self.max_bytes:
+                self._cut(size + len(data))
+        return seq
+
+    def _cut(self, size):
+        # Keep the newest half, behind a line saying where it starts
+        with open(self.path, 'rb') as f:
+            f.seek(size // 2)
+            f.readline()
+            rest = f.read()
+        if not rest:
+            return
+        first = json.loads(rest[:rest.index(b'\n')])
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(json.dumps({'base': first['seq'] - 1}).encode('utf-8') + b'\n')
+            f.write(rest)
+            ino, new_size = os.fstat(f.fileno()).st_ino, f.tell()
+        os.replace(tmp_path, self.path)
+        self._tail = (ino, new_size, self.written)
+        if self._offset == size and self.seq == self.written:
+            self._ino, self._offset = ino, new_size
@@ -0,0 +1,107 @@
+# group_commit.py
+import threading
+import weakref
+from metrics import registry
+
+# Live instances, for the metrics below
+_instances = weakref.WeakSet()
+
+
+def _totals(attribute):
+    totals = {}
+    for group in list(_instances):
+        totals[group.name] = totals.get(group.name, 0) + getattr(group, attribute)
+    return [((name,), value) for name, value in sorted(totals.items())]
+
+
+registry.counter_callback('group_commit_batches_total', 'Write batches committed.',
+                          lambda: _totals('batches'), ('store',))
+registry.counter_callback('group_commit_operations_total', 'Write operations committed in batches.',
+                          lambda: _totals('operations'), ('store',))
+
+
+class _Pending:
+    __slots__ = ('op', 'done', 'result', 'error')
+
+    def __init__(self, op):
+        self.op = op
+        self.done = False
+        self.result = None
+        self.error = None
+
+
+class GroupCommit:
+    """
+    Group commit for a service's write path.
+
+    Each writer submits an operation and blocks until it is durable. One
+    of the waiting threads becomes the leader: it takes every operation
+    queued so far, runs them all inside a single transaction() (the
+    service's write lock + file lock) and persists their changes with a
+    single commit(). Writers that arrive while the leader is on disk
+    queue up and go out together in the next batch, so N concurrent
+    POSTs cost one disk write instead of N.
+
+    An operation is called as op(changes), where 'changes' is a dict
+    shared by the batch: it records id -> new record, or id -> None for a
+    delete, and returns the result handed back to its submitter. An
+    operation should validate before it mutates anything; an exception it
+    raises goes to its own submitter only. If the commit itself fails
+    every operation in the batch fails with that error.
+    """
+    def __init__(self, transaction, commit, name='default'):
+        self.name = name
+        self._transaction = transaction
+        self._commit = commit
+        self._cond = threading.Condition(threading.Lock())
+        self._queue = []
+        self._leader = False
+        # Counters for benchmarks and metrics
+        self.batches = 0
+        self.operations = 0
+        _instances.add(self)
+
+    def submit(self, op):
+        pending = _Pending(op)
+        with self._cond:
+            self._queue.append(pending)
+            while self._leader and not pending.done:
+                self._cond.wait()
+            if not pending.done:
+                self._leader = True
+                batch, self._queue = self._queue, []
+        if not pending.done:
+            try:
+                self._run(batch)
+            finally:
+                with self._cond:
+                    self._leader = False
+                    self._cond.notify_all()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def _run(self, batch):
+        try:
+            changes = {}
+            with self._transaction():
+                for pending in batch:
+                    try:
+                        pending.result = pending.op(changes)
+                    except Exception as e:
+                        pending.error = e
+                if changes:
+                    self._commit(changes)
+        except BaseException as e:
+            for pending in batch:
+                if pending.error is None:
+                    pending.error = e
+            if not isinstance(e, Exception):
+                raise
+        finally:
+            self.batches += 1
+            self.operations += len(batch)
+            # Mark done under the lock so no waiter misses the wakeup
+            with self._cond:
+                for pending in batch:
+                    pending.done = True
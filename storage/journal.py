@@ -0,0 +1,180 @@
+# journal.py
+import os
+import json
+from storage.base import StorageBackend
+from storage.json_backend import JsonFileBackend, stat_signature
+from metrics import STORAGE_BYTES_READ, STORAGE_BYTES_WRITTEN
+
+
+class Journal:
+    """
+    Append-only journal with one JSON object per line.
+
+    Records are appended with a single write. replay() may run while
+    another process is appending, so it only reads: an incomplete last
+    line is skipped, never cut. A torn line left by a crash mid-write is
+    cut off by the next append(), which runs under the backend's file
+    lock, so later appends stay aligned.
+    """
+    def __init__(self, path, fsync=False):
+        self.path = path
+        self.fsync = fsync
+        self._file = None
+        self._store = os.path.basename(path)
+        # Number of records currently in the journal
+        self.size = 0
+
+    def replay(self):
+        """
+        Return all complete records in the journal. Safe without the
+        file lock: a line still being written is left out.
+        """
+        records = []
+        if not os.path.exists(self.path):
+            self.size = 0
+            return records
+        read = 0
+        with open(self.path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                read += len(line)
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # Only a journal written before torn tails were cut
+                    # on append can hold one
+                    continue
+        STORAGE_BYTES_READ.inc(read, backend='journal', store=self._store)
+        self.size = len(records)
+        return records
+
+    def _handle(self):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._file = open(self.path, 'a+b')
+        return self._file
+
+    def _cut_torn_tail(self, f):
+        # Caller holds the file lock, so nobody else is mid-append: a last
+        # line without its newline was left by a crash
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return
+        f.seek(size - 1)
+        if f.read(1) == b'\n':
+            return
+        end = size
+        while end > 0:
+            start = max(end - 65536, 0)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b'\n')
+            if newline != -1:
+                end = start + newline + 1
+                break
+            end = start
+        f.truncate(end)
+        f.seek(0, os.SEEK_END)
+
+    def append(self, records):
+        """
+        Append a batch of records with a single write.
+        """
+        data = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records).encode('utf-8')
+        if not data:
+            return
+        f = self._handle()
+        self._cut_torn_tail(f)
+        f.write(data)
+        STORAGE_BYTES_WRITTEN.inc(len(data), backend='journal', store=self._store)
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+        self.size += len(records)
+
+    def truncate(self):
+        """
+        Empty the journal once its records are safely in a snapshot.
+        """
+        f = self._handle()
+        f.truncate(0)
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+        self.size = 0
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class JournalBackend(StorageBackend):
+    """
+    JSON array snapshot plus an append-only journal of changes.
+
+    Each commit appends one line per upserted record ({"_deleted": id} for
+    deletions) with a single write. Once the journal holds 'compact_every'
+    records, or half as many as the snapshot if that is more, the
+    snapshot is rewritten atomically and the journal emptied. Rewrites
+    thus get rarer as the dataset grows: a large import writes about
+    three times its final size in total, however small its batches, and
+    loading replays at most half a snapshot's worth of journal. Loading
+    reads the snapshot and replays the journal on top of it; an existing
+    plain JSON array file therefore imports unchanged.
+    """
+    def __init__(self, path, journal_path=None, compact_every=1000, fsync=False):
+        self.snapshot_file = JsonFileBackend(path)
+        base, _ = os.path.splitext(path)
+        self.journal = Journal(journal_path or base + '.journal', fsync=fsync)
+        self.compact_every = compact_every
+        # Records in the snapshot as of the last load or compaction
+        self._snapshot_size = 0
+        self.file_lock = self.snapshot_file.file_lock
+        self._journal_sig = None
+
+    @property
+    def path(self):
+        return self.snapshot_file.path
+
+    def load(self):
+        records = {item.get('id'): item for item in self.snapshot_file.load()}
+        self._snapshot_size = len(records)
+        for entry in self.journal.replay():
+            if '_deleted' in entry:
+                records.pop(entry['_deleted'], None)
+            else:
+                # Replaces a record already folded into the snapshot by an
+                # interrupted compaction
+                records[entry.get('id')] = entry
+        self._journal_sig = stat_signature(self.journal.path)
+        return list(records.values())
+
+    def has_changed(self):
+        # Another process appended to the journal or compacted it
+        return (self.snapshot_file.has_changed()
+                or stat_signature(self.journal.path) != self._journal_sig)
+
+    def signature(self):
+        journal_sig = stat_signature(self.journal.path)
+        return [self.snapshot_file.signature(), None if journal_sig is None else list(journal_sig)]
+
+    def commit(self, upserts=(), deletes=(), snapshot=None):
+        entries = list(upserts)
+        entries.extend({'_deleted': record_id} for record_id in deletes)
+        self.journal.append(entries)
+        if snapshot is not None and self.journal.size >= max(self.compact_every, self._snapshot_size // 2):
+            self.compact(snapshot)
+        self._journal_sig = stat_signature(self.journal.path)
+
+    def compact(self, snapshot):
+        """
+        Fold the journal into a fresh snapshot and empty the journal.
+        """
+        records = list(snapshot())
+        self.snapshot_file.commit(snapshot=lambda: records)
+        self._snapshot_size = len(records)
+        self.journal.truncate()
+
+    def close(self):
+        self.journal.close()
@@ -0,0 +1,111 @@
+# json_backend.py
+import os
+import json
+import tempfile
+from storage.base import StorageBackend
+from storage.locks import FileLock
+from metrics import STORAGE_BYTES_READ, STORAGE_BYTES_WRITTEN
+
+
+def _umask():
+    # Read without setting it where possible: os.umask() changes it for
+    # every thread in the meantime
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('Umask:'):
+                    return int(line.split()[1], 8)
+    except OSError:
+        pass
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+
+def file_mode(path):
+    """
+    Permission bits a file replacing 'path' should get: those of the
+    existing file, or what open() would give a new one under the umask.
+    Temp files from mkstemp() are 0600 and would otherwise keep that.
+    """
+    try:
+        return os.stat(path).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_umask()
+
+
+def atomic_write_json(path, items):
+    """
+    Write a JSON array to 'path' atomically: dump into a temp file in the
+    same directory, fsync it and rename it over the target, so readers see
+    either the old file or the new one, never a half-written one. The
+    file keeps the permissions of the one it replaces.
+    """
+    directory = os.path.dirname(path) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp-', dir=directory)
+    try:
+        os.fchmod(fd, file_mode(path))
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(list(items), f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def stat_signature(path):
+    """
+    (st_ino, st_mtime_ns, st_size) of 'path', or None if it is missing.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+class JsonFileBackend(StorageBackend):
+    """
+    The original storage format: one JSON array per dataset, rewritten
+    in full on every commit.
+    """
+    def __init__(self, path):
+        self.path = path
+        # Ensure storage file exists; create directory and empty list if needed
+        if not os.path.exists(self.path):
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            # Atomic, so a concurrently starting worker never reads it empty
+            atomic_write_json(self.path, [])
+        self.file_lock = FileLock(self.path + '.lock')
+        self._sig = None
+        self._store = os.path.basename(self.path)
+
+    def _read(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def load(self):
+        self._sig = stat_signature(self.path)
+        records = self._read()
+        if self._sig is not None:
+            STORAGE_BYTES_READ.inc(self._sig[2], backend='json', store=self._store)
+        return records
+
+    def has_changed(self):
+        # One stat() call; catches hand edits and replaced files
+        return stat_signature(self.path) != self._sig
+
+    def signature(self):
+        sig = stat_signature(self.path)
+        return None if sig is None else list(sig)
+
+    def commit(self, upserts=(), deletes=(), snapshot=None):
+        if snapshot is None:
+            raise ValueError("JsonFileBackend needs a snapshot to commit.")
+        atomic_write_json(self.path, snapshot())
+        # Remember our own write so it is not mistaken for an external edit
+        self._sig = stat_signature(self.path)
+        STORAGE_BYTES_WRITTEN.inc(self._sig[2], backend='json', store=self._store)
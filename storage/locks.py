@@ -0,0 +1,129 @@
+# locks.py
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+class RWLock:
+    """
+    In-process readers-writer lock. Any number of readers may hold it at
+    once; a writer gets it alone. Waiting writers block new readers so a
+    steady stream of GETs cannot starve POSTs. Not reentrant.
+    """
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class FileLock:
+    """
+    Exclusive cross-process lock on a side file (e.g. books.json.lock),
+    so several worker processes can share one data directory.
+    """
+    def __init__(self, path):
+        self.path = path
+        self._thread_lock = threading.Lock()
+        self._fd = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        try:
+            if self._fd is None:
+                os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                # LK_LOCK retries for ~10s before raising; keep waiting
+                while True:
+                    try:
+                        msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+        except BaseException:
+            self._thread_lock.release()
+            raise
+
+    def release(self):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            self._thread_lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class IdAllocator:
+    """
+    Hands out increasing integer ids. observe() moves the counter past
+    ids seen in storage (e.g. written by another process); it never moves
+    backwards, so ids of deleted records are not reused.
+    """
+    def __init__(self, start=1):
+        self._next = start
+        self._lock = threading.Lock()
+
+    def observe(self, max_id):
+        with self._lock:
+            if max_id is not None and max_id >= self._next:
+                self._next = max_id + 1
+
+    def allocate(self, count=1):
+        """
+        Reserve 'count' consecutive ids and return them as a range.
+        """
+        with self._lock:
+            first = self._next
+            self._next += count
+        return range(first, first + count)
+
+    def peek(self):
+        return self._next
@@ -0,0 +1,51 @@
+# migrate.py
+"""
+One-shot migration of the JSON data files into the SQLite backend.
+
+    python -m storage.migrate [--db data/app.db]
+
+Both datasets are read through the journal backend, so writes still
+sitting in books.journal / messages.journal are migrated too. Re-running is safe: rows are upserted
+by id.
+"""
+import argparse
+import config
+from storage.journal import JournalBackend
+from storage import create_backend
+
+BATCH_SIZE = 10000
+
+
+def migrate(books_path, messages_path, sqlite_path):
+    """
+    Copy both datasets into 'sqlite_path'. Returns {dataset: row count}.
+    """
+    sources = {
+        'books': JournalBackend(books_path),
+        'messages': JournalBackend(messages_path),
+    }
+    counts = {}
+    for dataset, source in sources.items():
+        records = source.load()
+        target = create_backend('sqlite', dataset, None, sqlite_path=sqlite_path)
+        for start in range(0, len(records), BATCH_SIZE):
+            target.commit(upserts=records[start:start + BATCH_SIZE])
+        target.close()
+        source.close()
+        counts[dataset] = len(records)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Migrate data/*.json into SQLite.')
+    parser.add_argument('--books', default=config.BOOKS_JSON_PATH)
+    parser.add_argument('--messages', default=config.MESSAGES_JSON_PATH)
+    parser.add_argument('--db', default=config.SQLITE_PATH)
+    args = parser.parse_args()
+    counts = migrate(args.books, args.messages, args.db)
+    for dataset, count in counts.items():
+        print(f'{dataset}: {count} rows -> {args.db}')
+
+
+if __name__ == '__main__':
+    main()